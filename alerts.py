@@ -0,0 +1,474 @@
+"""
+Alert rules evaluated against streaming prices and scores.
+
+Users register conditions such as "SBIN.NS score rises to 3 (Strong Buy)",
+"price falls to the trade-plan stop-loss" or "RSI moves 10 points in one
+bar". Rules are indexed by (ticker, field) and kept sorted by threshold,
+so a new value finds the rules it crossed with two bisects. Per-bar cost is
+O(log rules + fired rules), however many rules are registered.
+
+Operators:
+- above:  fires when the value crosses up to the threshold   (prev < t <= new)
+- below:  fires when the value crosses down to the threshold (prev > t >= new)
+- change: fires when |new - prev| >= threshold
+
+The first value seen for a (ticker, field) only sets the baseline. A rule
+whose level has already been passed waits for the next crossing. Each
+source keeps its own previous value: "live" quotes (live.LiveHub), "poll"
+bars (the app's poller over every ticker with a rule) and "session" bars
+(breadth.BreadthEngine) never cross against each other.
+
+    engine = AlertEngine([FileSink("alerts.jsonl")])
+    engine.add("SBIN.NS", "score", "above", 3)
+    engine.add_trade_plan("SBIN.NS", entry=812.5)         # stop and target rules
+    engine.on_values("SBIN.NS", {"price": 796.0, "score": 3})
+"""
+import bisect
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from indicators import compute_indicators, composite_score, latest_values, trade_levels
+
+FIELDS = ("price", "score", "rsi", "ema", "sma_fast", "sma_slow", "macd", "bb_upper", "bb_lower", "volume")
+OPS = ("above", "below", "change")
+ALERTS_PATH = os.environ.get("ALERTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "alerts.db"))
+SYNC_INTERVAL = 5           # seconds between checks for rules changed by other workers
+FIRED_RETENTION = 7 * 86400  # claimed alerts kept this long (dedupe + /alerts/recent)
+
+
+# --- Sinks: send(alert dict) ---
+class FileSink:
+    """Appends one JSON line per alert"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def send(self, alert):
+        line = json.dumps(alert, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class WebhookSink:
+    """POSTs each alert as JSON to a URL"""
+
+    def __init__(self, url, timeout=5, session=None):
+        import requests
+
+        self.url = url
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def send(self, alert):
+        self.session.post(self.url, json=alert, timeout=self.timeout).raise_for_status()
+
+
+class MemorySink:
+    """Keeps the most recent alerts in memory (tests, /alerts/recent)"""
+
+    def __init__(self, maxlen=200):
+        self.alerts = deque(maxlen=maxlen)
+
+    def send(self, alert):
+        self.alerts.append(alert)
+
+    def recent(self, limit=50):
+        return list(self.alerts)[-limit:][::-1]
+
+
+class _Thresholds:
+    """Rules of one op on one (ticker, field), sorted by threshold"""
+
+    __slots__ = ("levels", "ids")
+
+    def __init__(self):
+        self.levels = []
+        self.ids = []
+
+    def add(self, level, rule_id):
+        i = bisect.bisect_right(self.levels, level)
+        self.levels.insert(i, level)
+        self.ids.insert(i, rule_id)
+
+    def remove(self, level, rule_id):
+        i = bisect.bisect_left(self.levels, level)
+        while i < len(self.levels) and self.levels[i] == level:
+            if self.ids[i] == rule_id:
+                del self.levels[i], self.ids[i]
+                return
+            i += 1
+
+    def between(self, lo, hi, right_lo, right_hi):
+        start = (bisect.bisect_right if right_lo else bisect.bisect_left)(self.levels, lo)
+        end = (bisect.bisect_right if right_hi else bisect.bisect_left)(self.levels, hi)
+        return self.ids[start:end]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class AlertEngine:
+    """
+    Rules in memory for evaluation; with a path they live in SQLite, which
+    every worker process shares. SQLite assigns rule ids, each engine
+    reloads when another process changed the table (checked at most every
+    SYNC_INTERVAL seconds), and a fired alert is claimed in the database
+    before it is sent, so several workers watching one ticker send it once.
+    Sinks and database writes run on one dispatcher thread; on_values()
+    itself only touches memory and is safe to call from an event loop.
+    """
+
+    def __init__(self, sinks=(), path=None, history=200):
+        """path: SQLite file that keeps rules across restarts and workers (None: in memory only)"""
+        self.sinks = list(sinks)
+        self.path = path
+        self._rules = {}        # id -> rule dict
+        self._index = {}        # (ticker, field) -> {op: _Thresholds}
+        self._last = {}         # (ticker, field, source) -> last value seen
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._recent = deque(maxlen=history)
+        self._synced = 0.0
+        self._pid = None
+        self._pid_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.stats = {"evaluations": 0, "fired": 0, "sent": 0, "duplicates": 0, "sink_errors": 0, "reloads": 0}
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._check_process()
+        if path:
+            with self._db_lock, self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS rules (id INTEGER PRIMARY KEY AUTOINCREMENT, rule TEXT)")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS fired (rule_id INTEGER, as_of TEXT, fired_at REAL, "
+                                   "alert TEXT, PRIMARY KEY (rule_id, as_of))")
+            self._data_version = None
+            self.sync(force=True)
+
+    def _check_process(self):
+        """
+        Per-process resources: a SQLite connection and the dispatcher thread.
+        Neither survives a fork (gunicorn --preload), so a forked worker opens
+        its own on first use.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._pid_lock:
+            if self._pid == os.getpid():
+                return
+            if self.path:
+                self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._outbox = queue.Queue()
+            threading.Thread(target=self._dispatch_loop, args=(self._outbox,), name="alert-dispatch", daemon=True).start()
+            self._pid = os.getpid()
+
+    @property
+    def _conn(self):
+        self._check_process()
+        return self._connection
+
+    # --- Rules ---
+    def add(self, ticker, field, op, threshold, once=True, user=None, note=None):
+        """Register a rule; returns it with its id. once=False keeps it armed after it fires."""
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field {field!r}; expected one of {', '.join(FIELDS)}")
+        if op not in OPS:
+            raise ValueError(f"Unknown op {op!r}; expected one of {', '.join(OPS)}")
+        threshold = float(threshold)
+        if op == "change" and threshold <= 0:
+            raise ValueError("A change threshold must be positive")
+        rule = {"ticker": ticker, "field": field, "op": op, "threshold": threshold,
+                "once": bool(once), "user": user, "note": note, "created": time.time()}
+        if self.path:
+            with self._db_lock, self._conn:
+                cursor = self._conn.execute("INSERT INTO rules (rule) VALUES (?)", (json.dumps(rule, ensure_ascii=False),))
+                rule["id"] = cursor.lastrowid
+                self._data_version = self._version()
+        with self._lock:
+            if not self.path:
+                rule["id"] = next(self._ids)
+            self._insert(rule)
+        return rule
+
+    def add_trade_plan(self, ticker, entry, user=None):
+        """Stop-loss and target rules at analyze()'s trade-plan levels for an entry price"""
+        stop, target = trade_levels(entry)
+        return [
+            self.add(ticker, "price", "below", stop, user=user, note=f"Stop-loss ₹{stop} (entry ₹{entry})"),
+            self.add(ticker, "price", "above", target, user=user, note=f"Target ₹{target} (entry ₹{entry})"),
+        ]
+
+    def remove(self, rule_id):
+        self.sync()
+        if self.path:
+            with self._db_lock, self._conn:
+                deleted = self._conn.execute("DELETE FROM rules WHERE id = ?", (rule_id,)).rowcount
+                self._data_version = self._version()
+        with self._lock:
+            rule = self._rules.get(rule_id)
+            if rule is not None:
+                self._drop(rule)
+        return bool(deleted) if self.path else rule is not None
+
+    def rules(self, ticker=None, user=None):
+        self.sync()
+        with self._lock:
+            rules = list(self._rules.values())
+        return [r for r in rules if (ticker is None or r["ticker"] == ticker) and (user is None or r["user"] == user)]
+
+    def tickers(self):
+        """Tickers with at least one rule (feeds only need to evaluate these)"""
+        self.sync()
+        with self._lock:
+            return {ticker for ticker, _ in self._index}
+
+    def last(self, ticker, field):
+        """Latest value seen for a field from any source"""
+        values = [v for (t, f, _), v in list(self._last.items()) if t == ticker and f == field]
+        return values[-1] if values else None
+
+    def recent(self, limit=50):
+        """Most recently sent alerts, newest first (from every worker when stored in SQLite)"""
+        if self.path:
+            with self._db_lock:
+                rows = self._conn.execute("SELECT alert FROM fired ORDER BY fired_at DESC LIMIT ?", (limit,)).fetchall()
+            return [json.loads(alert) for alert, in rows]
+        return list(self._recent)[-limit:][::-1]
+
+    # --- Cross-worker sync ---
+    def sync(self, force=False):
+        """Reload the rules if another process changed them since the last look"""
+        if not self.path or (not force and time.monotonic() - self._synced < SYNC_INTERVAL):
+            return False
+        self._synced = time.monotonic()
+        with self._db_lock:
+            version = self._version()
+            if not force and version == self._data_version:
+                return False
+            rows = self._conn.execute("SELECT id, rule FROM rules ORDER BY id").fetchall()
+            self._data_version = version
+        with self._lock:
+            self._rules, self._index = {}, {}
+            for rule_id, text in rows:
+                self._insert(dict(json.loads(text), id=rule_id))
+            self.stats["reloads"] += 1
+        return True
+
+    def _version(self):
+        # data_version moves when another connection commits; our own writes also bump the row count
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        count, top = self._conn.execute("SELECT COUNT(*), MAX(id) FROM rules").fetchone()
+        return version, count, top
+
+    # --- Evaluation ---
+    def on_values(self, ticker, values, as_of=None, source="live"):
+        """
+        Evaluate one new bar / quote: values is {field: value}. Each source
+        (live quotes, polled or session bars) keeps its own previous values,
+        so a daily close is never compared with an intraday price. Only
+        memory is touched; fired alerts are queued for the dispatcher.
+        Returns the alerts fired.
+        """
+        fired = []
+        with self._lock:
+            for field, value in values.items():
+                if value is None or value != value:
+                    continue
+                key = (ticker, field, source)
+                previous = self._last.get(key)
+                self._last[key] = value
+                groups = self._index.get((ticker, field))
+                if groups is None or previous is None:
+                    continue
+                self.stats["evaluations"] += 1
+                for rule_id in self._crossed(groups, previous, value):
+                    rule = self._rules[rule_id]
+                    fired.append({**rule, "value": value, "previous": previous, "source": source,
+                                  "as_of": None if as_of is None else str(as_of), "fired_at": time.time()})
+                    if rule["once"]:
+                        self._drop(rule)
+            self.stats["fired"] += len(fired)
+        self._check_process()
+        for alert in fired:
+            self._outbox.put(alert)
+        return fired
+
+    def flush(self, timeout=5):
+        """Wait until every queued alert has been claimed and sent (tests, shutdown)"""
+        self._check_process()
+        deadline = time.monotonic() + timeout
+        while self._outbox.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._outbox.unfinished_tasks
+
+    def _crossed(self, groups, previous, value):
+        ids = []
+        if "above" in groups and value > previous:
+            ids += groups["above"].between(previous, value, True, True)
+        if "below" in groups and value < previous:
+            ids += groups["below"].between(value, previous, False, False)
+        if "change" in groups:
+            ids += groups["change"].between(float("-inf"), abs(value - previous), True, True)
+        return ids
+
+    # --- Dispatcher thread ---
+    def _dispatch_loop(self, outbox):
+        while True:
+            try:
+                alert = outbox.get(timeout=SYNC_INTERVAL)
+            except queue.Empty:
+                self._sync_quietly()
+                continue
+            try:
+                if self._claim(alert):
+                    self._send(alert)
+                else:
+                    self.stats["duplicates"] += 1
+            except Exception as e:
+                print(f"❌ Alert dispatch failed: {e}")
+            finally:
+                outbox.task_done()
+
+    def _sync_quietly(self):
+        try:
+            self.sync()
+        except Exception as e:
+            print(f"⚠️ Alert rule sync failed: {e}")
+
+    def _claim(self, alert):
+        """True if this process should send the alert: the once-rule row or the (rule, bar) slot was still free"""
+        if not self.path:
+            return True
+        text = json.dumps(alert, ensure_ascii=False)
+        with self._db_lock, self._conn:
+            if alert["once"]:
+                claimed = self._conn.execute("DELETE FROM rules WHERE id = ?", (alert["id"],)).rowcount
+            else:
+                claimed = self._conn.execute("SELECT 1 FROM rules WHERE id = ?", (alert["id"],)).fetchone() is not None
+            if claimed:
+                claimed = self._conn.execute("INSERT OR IGNORE INTO fired (rule_id, as_of, fired_at, alert) VALUES (?, ?, ?, ?)",
+                                             (alert["id"], f"{alert['source']}:{alert['as_of']}", alert["fired_at"], text)).rowcount
+            self._conn.execute("DELETE FROM fired WHERE fired_at < ?", (time.time() - FIRED_RETENTION,))
+            self._data_version = self._version()
+        return bool(claimed)
+
+    def _send(self, alert):
+        self.stats["sent"] += 1
+        self._recent.append(alert)
+        for sink in self.sinks:
+            try:
+                sink.send(alert)
+            except Exception as e:
+                self.stats["sink_errors"] += 1
+                print(f"❌ Alert sink {type(sink).__name__} failed: {e}")
+
+    # --- Index (caller holds the lock) ---
+    def _insert(self, rule):
+        self._rules[rule["id"]] = rule
+        groups = self._index.setdefault((rule["ticker"], rule["field"]), {})
+        groups.setdefault(rule["op"], _Thresholds()).add(rule["threshold"], rule["id"])
+
+    def _drop(self, rule):
+        del self._rules[rule["id"]]
+        key = (rule["ticker"], rule["field"])
+        groups = self._index[key]
+        groups[rule["op"]].remove(rule["threshold"], rule["id"])
+        if not groups[rule["op"]]:
+            del groups[rule["op"]]
+        if not groups:
+            del self._index[key]
+
+    def __len__(self):
+        return len(self._rules)
+
+
+def history_values(histories):
+    """{key: {price, score, rsi, ...}} of the latest bar of each (close, volume) pair, in one stacked pass"""
+    from scanner import stack_histories
+
+    if not histories:
+        return {}
+    keys = list(histories)
+    closes, volumes = stack_histories([histories[k] for k in keys])
+    indicators = compute_indicators(closes, volumes)
+    scores = composite_score(indicators)[:, -1]
+    latest = latest_values(indicators)
+    out = {}
+    for i, key in enumerate(keys):
+        row = {name: float(v[i]) for name, v in latest.items() if name in FIELDS}
+        row["price"] = round(float(latest["close"][i]), 2)
+        row["score"] = int(scores[i])
+        out[key] = row
+    return out
+
+
+def hold_leader_lock(path):
+    """
+    An open file holding an exclusive lock on `path`, or None if another
+    process holds it: one worker per machine runs the alert poller.
+    Where fcntl is missing (Windows) every process is its own leader.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return True
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handle = open(path, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def event_values(event):
+    """{field: value} from a live.LiveHub event"""
+    return {"price": event.get("current_price"), "score": event.get("score")}
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description="Benchmark rule evaluation")
+    parser.add_argument("--rules", type=int, default=10_000)
+    parser.add_argument("--tickers", type=int, default=2_000)
+    parser.add_argument("--bars", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sink = MemorySink(maxlen=1_000_000)
+    engine = AlertEngine([sink])
+    tickers = [f"SYM{i}.NS" for i in range(args.tickers)]
+    prices = {t: rng.uniform(50, 3000) for t in tickers}
+    start = time.perf_counter()
+    for _ in range(args.rules):
+        ticker = rng.choice(tickers)
+        kind = rng.random()
+        if kind < 0.5:
+            engine.add(ticker, "price", rng.choice(("above", "below")), prices[ticker] * rng.uniform(0.9, 1.1), once=False)
+        elif kind < 0.8:
+            engine.add(ticker, "score", "above", rng.choice((3, 4, 5)), once=False)
+        else:
+            engine.add(ticker, "rsi", "change", rng.choice((5, 10, 15)), once=False)
+    print(f"Registered {len(engine)} rules in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    for _ in range(args.bars):
+        for ticker in tickers:
+            prices[ticker] *= 1 + rng.gauss(0, 0.02)
+            engine.on_values(ticker, {"price": prices[ticker], "score": rng.randint(-5, 5), "rsi": rng.uniform(20, 80)})
+    elapsed = time.perf_counter() - start
+    engine.flush(timeout=60)
+    evaluations = args.bars * len(tickers)
+    print(f"{evaluations} ticker bars in {elapsed:.2f}s ({elapsed / evaluations * 1e6:.1f} µs per bar), "
+          f"{len(sink.alerts)} alerts fired")
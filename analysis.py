@@ -0,0 +1,177 @@
+"""
+analyze() result dicts, shared by app.py and the snapshot batch job.
+
+Pure functions of a quote or of close / volume arrays: importing this module
+starts no clients, caches or background threads, so snapshot.py can use it
+from cron without loading the web app.
+"""
+from indicators import compute_indicators, latest_values, score_breakdown, trade_levels
+from metrics import span
+
+
+def build_trade_plan(verdict_msg, score, current_price, stop_loss, target_price):
+    risk_note = "Capital at risk per trade should generally stay below 1-2%."
+    if "Strong Buy" in verdict_msg:
+        action = "Bias: Long"
+        checklist = [
+            "Wait for confirmation candle near support / entry zone.",
+            "Enter in parts instead of full quantity at once.",
+            "Trail stop-loss after target-1 is reached."
+        ]
+    elif "Strong Sell" in verdict_msg:
+        action = "Bias: Defensive / Short setups only"
+        checklist = [
+            "Avoid fresh long positions until trend improves.",
+            "For short setups, wait for pullback rejection.",
+            "Keep strict stop-loss due to sharp reversals."
+        ]
+    else:
+        action = "Bias: Wait & Watch"
+        checklist = [
+            "No aggressive entry until multiple signals align.",
+            "Track breakout above resistance or breakdown below support.",
+            "Preserve capital during low-conviction setups."
+        ]
+
+    return {
+        "Action": action,
+        "ScoreLabel": f"Composite Technical Score: {score}",
+        "CurrentPriceValue": current_price,
+        "StopLossValue": stop_loss,
+        "TargetValue": target_price,
+        "RiskNote": risk_note,
+        "Checklist": checklist,
+    }
+
+
+def nse_analysis(raw_input, nse_data):
+    """analyze() result dict from an NSE quote"""
+    info = nse_data.get("info", {})
+    company_name = info.get("companyName", raw_input)
+    sector = info.get("industry", "N/A")
+    prices = nse_data.get("priceInfo", {})
+    last_price = prices.get("lastPrice", "N/A")
+    prev_close = prices.get("previousClose", "N/A")
+    current_price = last_price
+    day_high = prices.get("intraDayHighLow", {}).get("max", "N/A")
+    day_low = prices.get("intraDayHighLow", {}).get("min", "N/A")
+    day_range = f"📊 Day Range: ₹{day_low} - ₹{day_high}"
+
+    score = 0
+
+             
+    if last_price != "N/A" and prev_close != "N/A":
+        if last_price > prev_close:
+            score += 1
+        elif last_price < prev_close:
+            score -= 1
+
+    # Unified verdicts
+    if score >= 3:
+        verdict_msg = f"🟢 Strong Buy — High confidence. (Score {score})"
+        confidence = "High"
+    elif score in [1,2]:
+        verdict_msg = f"⚠️ Cautious Buy — Mild bullish. (Score {score})"
+        confidence = "Medium"
+    elif score <= -3:
+        verdict_msg = f"🔴 Strong Sell — High confidence bearish. (Score {score})"
+        confidence = "High"
+    elif score in [-1,-2]:
+        verdict_msg = f"⚠️ Cautious Sell — Mild bearish. (Score {score})"
+        confidence = "Medium"
+    else:
+        verdict_msg = f"⚖️ Neutral — No clear momentum. (Score {score})"
+        confidence = "Low"
+
+    stop_loss_value, target_value = trade_levels(last_price) if last_price != "N/A" else ("N/A", "N/A")
+    trade_plan = build_trade_plan(
+        verdict_msg,
+        score,
+        last_price,
+        stop_loss_value,
+        target_value,
+    )
+
+    analysis = {
+        "ticker": raw_input,
+        "Company": company_name,
+        "Sector": sector,
+        "Description": f"📌 {company_name} ka sector {sector} hai.",
+        "CurrentPrice": f"💰 Current Price: ₹{current_price}",
+        "DayRange": day_range,
+        "Trend": f"{verdict_msg} | Confidence: {confidence}",
+        "Entry": "🎯 Suggested Entry Zone: Wait for clearer signals.",
+        "Exit": f"✅ Exit Strategy: Target exit around ₹{target_value}" if last_price!="N/A" else "N/A",
+        "StopLoss": f"🛑 Stop-loss: ₹{stop_loss_value}" if last_price!="N/A" else "N/A",
+        "Verdict": verdict_msg,
+        "Disclaimer": "This analysis is for educational purposes only. Not financial advice.",
+        "Score": score,
+        "TradePlan": trade_plan,
+    }
+    return analysis
+
+
+def history_analysis(raw_input, close, volume, values=None):
+    """analyze() result dict from daily close / volume arrays (values: latest indicators if already computed)"""
+    # ✅ All indicators in one vectorized pass (see indicators.py)
+    if values is None:
+        with span("indicators"):
+            values = latest_values(compute_indicators(close, volume))
+    with span("scoring"):
+        score, details = score_breakdown(values)
+    close_price = round(float(close[-1]), 2)
+
+    # Volume display (scoring uses the 10-bar average inside the engine)
+    avg_volume = round(float(volume[-20:].mean()), 2)
+    latest_volume = round(float(volume[-1]), 2)
+    volume_status = "📊 Volume spike detected" if latest_volume > avg_volume else "📉 Volume normal"
+
+    current_price = close_price if close_price is not None else 0
+
+    # Final verdict
+    if score >= 3:
+        verdict_msg = f"🟢 Strong Buy — All indicators aligned bullish. High-confidence buying opportunity! (Score {score})"
+        entry_zone = f"₹{round(close_price*0.97,2)} – ₹{round(close_price*0.99,2)}" if close_price else "N/A"
+        stop_loss = f"₹{round(close_price*0.95,2)}" if close_price else "N/A"
+    elif score <= -3:
+        verdict_msg = f"🔴 Strong Sell — Indicators show bearish momentum. Avoid buying, shorting may be considered. (Score {score})"
+        entry_zone = f"Sell near ₹{close_price}, target lower levels." if close_price else "N/A"
+        stop_loss = f"₹{round(close_price*1.02,2)}" if close_price else "N/A"
+    elif -2 <= score <= 2:
+        verdict_msg = f"⚖️ Neutral — Signals are mixed. Best to wait for confirmation. (Score {score})"
+        entry_zone = "Wait for clearer signals before entry."
+        stop_loss = "N/A"
+    else:
+        verdict_msg = f"❓ Mixed — Indicators conflict. Trade cautiously. (Score {score})"
+        entry_zone = "No clear entry zone."
+        stop_loss = "N/A"
+
+    stop_loss_value, target_value = trade_levels(close_price) if close_price else ("N/A", "N/A")
+    trade_plan = build_trade_plan(
+        verdict_msg,
+        score,
+        close_price if close_price else "N/A",
+        stop_loss_value,
+        target_value,
+    )
+
+    # ✅ FIXED: Proper volume display
+    volume_display = f"Latest: {latest_volume}, Avg(20d): {avg_volume} → {volume_status}" if latest_volume is not None else "Volume data unavailable"
+
+    analysis = {
+        "ticker": raw_input,
+        "Company": raw_input,
+        "Sector": "N/A",
+        "Description": f"📌 {raw_input} Technical Analysis",
+        "CurrentPrice": f"💰 Current Price: ₹{current_price}" if current_price else "N/A",
+        "Indicators": details,
+        "Volume": volume_display,
+        "Score": score,
+        "Verdict": verdict_msg,
+        "Entry": f"🎯 Suggested Entry Zone: {entry_zone}",
+        "Exit": f"✅ Target Exit: ₹{target_value}" if close_price else "N/A",
+        "StopLoss": f"🛑 Stop-loss: ₹{stop_loss_value}" if close_price else "N/A",
+        "TradePlan": trade_plan,
+        "Disclaimer": "This analysis is for educational purposes only. Not financial advice."
+    }
+    return analysis
@@ -1,66 +1,71 @@
-from flask import Flask, request, render_template
-import requests
-import yfinance as yf
-import numpy as np
-import pandas as pd
-from finta import TA
+import startup  # first, so the start-up clock covers every import below
+from flask import Flask, request, render_template, jsonify, Response, stream_with_context, url_for
 import os
 import time
-from functools import lru_cache
+import asyncio
+import json
+import hashlib
+import datetime
+import threading
+from functools import lru_cache, partial
+from indicators import compute_indicators, latest_values, score_breakdown, frame_to_arrays, trade_levels
+from analysis import build_trade_plan, nse_analysis, history_analysis
+import scanner
+from store import OHLCVStore, frame_columns
+from prices import PriceHistory
+from cache import TTLCache, SQLiteBackend
+from async_fetch import TokenBucket, AsyncSingleFlight, JobRegistry, first_success, run_async
+from symbols import SymbolIndex
+from nse_client import NSEClient
+from snapshot import SnapshotStore, last_closed_session
+from live import LiveHub
+from alerts import AlertEngine, FileSink, WebhookSink, ALERTS_PATH, event_values, history_values, hold_leader_lock
+import portfolio
+from portfolio import PortfolioStore
+import metrics
+from metrics import span
+
+# ✅ Lazy: yfinance (and the pandas it pulls in) and request-only analytics
+# load on first use, not on a cold start (see startup.py)
+yf = startup.lazy("yfinance")
+breadth = startup.lazy("breadth")
+timeframes = startup.lazy("timeframes")
 
 app = Flask(__name__)
 
-# ✅ NEW: Cache to store recently fetched data (avoids duplicate API calls)
-data_cache = {}
+# ✅ Cache to store recently fetched data (avoids duplicate API calls)
+# Bounded LRU with TTL; CACHE_SHARED_PATH=/path/cache.db shares it across workers
 CACHE_DURATION = 300  # Cache for 5 minutes
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 256))
+CACHE_MAX_MB = float(os.environ.get("CACHE_MAX_MB", 64))
+CACHE_SHARED_PATH = os.environ.get("CACHE_SHARED_PATH")
+CACHE_MAX_BYTES = int(CACHE_MAX_MB * 1024 * 1024)
+
+data_cache = TTLCache(
+    maxsize=CACHE_MAX_ENTRIES,
+    ttl=CACHE_DURATION,
+    max_bytes=CACHE_MAX_BYTES,
+    # The shared file is bounded by the same limits (trimmed every few writes)
+    backend=SQLiteBackend(CACHE_SHARED_PATH, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES) if CACHE_SHARED_PATH else None,
+)
+
+# ✅ Upstream rate limit: one token bucket per worker keeps us under Yahoo's
+# limits instead of reacting to them with retry sleeps
+UPSTREAM_RATE = float(os.environ.get("UPSTREAM_RATE", 2))  # requests per second
+UPSTREAM_BURST = float(os.environ.get("UPSTREAM_BURST", 4))
+upstream_limiter = TokenBucket(UPSTREAM_RATE, UPSTREAM_BURST)
 
 def get_cached_data(ticker):
     """Get data from cache if available and not expired"""
-    if ticker in data_cache:
-        cached_time, cached_data = data_cache[ticker]
-        if time.time() - cached_time < CACHE_DURATION:
-            print(f"✅ Using cached data for {ticker}")
-            return cached_data
-    return None
+    cached = data_cache.get(ticker)
+    if cached is not None:
+        print(f"✅ Using cached data for {ticker}")
+    return cached
 
 def set_cached_data(ticker, data):
     """Store data in cache"""
-    data_cache[ticker] = (time.time(), data)
-
-
-def build_trade_plan(verdict_msg, score, current_price, stop_loss, target_price):
-    risk_note = "Capital at risk per trade should generally stay below 1-2%."
-    if "Strong Buy" in verdict_msg:
-        action = "Bias: Long"
-        checklist = [
-            "Wait for confirmation candle near support / entry zone.",
-            "Enter in parts instead of full quantity at once.",
-            "Trail stop-loss after target-1 is reached."
-        ]
-    elif "Strong Sell" in verdict_msg:
-        action = "Bias: Defensive / Short setups only"
-        checklist = [
-            "Avoid fresh long positions until trend improves.",
-            "For short setups, wait for pullback rejection.",
-            "Keep strict stop-loss due to sharp reversals."
-        ]
-    else:
-        action = "Bias: Wait & Watch"
-        checklist = [
-            "No aggressive entry until multiple signals align.",
-            "Track breakout above resistance or breakdown below support.",
-            "Preserve capital during low-conviction setups."
-        ]
+    data_cache.set(ticker, data)
 
-    return {
-        "Action": action,
-        "ScoreLabel": f"Composite Technical Score: {score}",
-        "CurrentPriceValue": current_price,
-        "StopLossValue": stop_loss,
-        "TargetValue": target_price,
-        "RiskNote": risk_note,
-        "Checklist": checklist,
-    }
 
 # --- Helper: sanitize ticker ---
 def sanitize_ticker(raw_input):
@@ -72,38 +77,175 @@ def sanitize_ticker(raw_input):
         raw_input = raw_input[0]
     return str(raw_input).strip().upper().replace(" ", "").replace(",", "")
 
+def ticker_suffix(ticker):
+    """Metric label for a Yahoo ticker: 'NS', 'BO' or 'bare' (keeps label cardinality at three)"""
+    return ticker.rsplit(".", 1)[1] if ticker.endswith((".NS", ".BO")) else "bare"
+
 # --- NSE realtime fetch ---
+# ✅ One pooled, cookie-reusing client per worker (see nse_client.py)
+nse_client = NSEClient()
+
 def fetch_nse_data(symbol):
-    url = f"https://www.nseindia.com/api/quote-equity?symbol={symbol}"
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Accept": "application/json",
-        "Referer": "https://www.nseindia.com/"
-    }
-    try:
-        session = requests.Session()
-        session.get("https://www.nseindia.com", headers=headers, timeout=10)
-        resp = session.get(url, headers=headers, timeout=10)
-        if resp.status_code == 200:
-            return resp.json()
-        else:
-            return None
-    except Exception:
-        return None
+    with span("nse_quote"):
+        return nse_client.quote(symbol)
 
 # --- NSE stock list preload ---
+# ✅ Symbol index (see symbols.py): symbol / ISIN / company name -> one Yahoo ticker
+with startup.phase("symbol_index"):
+    symbol_index = SymbolIndex.load()
+
 def get_nse_stock_list():
-    try:
-        df = pd.read_csv("EQUITY_L.csv")
-        return df['SYMBOL'].dropna().tolist()
-    except Exception:
-        return ["SBIN","TCS","INFY","RELIANCE","HDFCBANK"]
+    return symbol_index.nse_symbols()
 
 STOCK_LIST = get_nse_stock_list()
 
 @app.route('/')
 def home():
-    return render_template('index.html', analysis=None, stock_list=STOCK_LIST)
+    return render_template('index.html', analysis=None)
+
+# ✅ Typeahead: the page asks for matches as the user types instead of
+# embedding all ~2,200 symbols twice in every response
+SEARCH_MAX_LIMIT = 50
+
+@app.route('/symbols/search', methods=["GET"])
+def symbol_search():
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), SEARCH_MAX_LIMIT))
+    results = [
+        {"symbol": e.symbol, "name": e.name, "exchange": e.exchange, "ticker": e.ticker}
+        for e in symbol_index.search(query.strip().upper(), limit)
+    ]
+    response = jsonify({"query": query, "results": results})
+    # The index only changes on deploy, so browsers and proxies may keep answers
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    response.add_etag()
+    return response.make_conditional(request)
+
+# --- Live prices: one shared poller per ticker (see live.py) ---
+# A stream holds a sync worker, so pages only open one on request and each stream
+# ends after LIVE_STREAM_MAX seconds (EventSource reconnects while the tab stays open)
+LIVE_INTERVAL = float(os.environ.get("LIVE_INTERVAL", 15))
+LIVE_KEEPALIVE = 15
+LIVE_STREAM_MAX = float(os.environ.get("LIVE_STREAM_MAX", 300))
+
+def fetch_intraday(ticker):
+    upstream_limiter.acquire()
+    with span("live_poll"):
+        try:
+            data = yf.Ticker(ticker).history(period="1d", interval="1m")
+        except Exception:
+            metrics.upstream_requests.inc(upstream="yahoo_live", outcome="error")
+            raise
+    metrics.upstream_requests.inc(upstream="yahoo_live", outcome="ok" if not data.empty else "empty")
+    # A live poll is one more minute for any multi-timeframe book of this ticker
+    book = intraday_books.get(ticker)
+    if book is not None:
+        book.extend(data)
+    return data
+
+def live_ticker(raw_input):
+    """The Yahoo ticker analyze() resolved the input to: indexed, else the suffix race winner, else as typed"""
+    resolution = symbol_index.resolve(raw_input)
+    if resolution is not None:
+        return resolution.ticker
+    return resolved_tickers.get(raw_input) or raw_input
+
+live_hub = LiveHub(fetch_intraday, lambda ticker: fetch_data_with_retry(ticker), interval=LIVE_INTERVAL)
+
+# --- Alerts (see alerts.py): rules checked on live events, a periodic poll and each breadth session ---
+# ALERT_LOG appends fired alerts as JSON lines; ALERT_WEBHOOK=https://... also POSTs them.
+# Rules live in ALERTS_PATH (SQLite) shared by every worker. Every worker runs alert_poller()
+# once it serves a request; only the holder of ALERTS_PATH.lock polls the tickers with rules
+# each ALERT_POLL_INTERVAL seconds, and the others retry the lock, so a recycled leader is replaced.
+ALERT_LOG = os.environ.get("ALERT_LOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "alerts.jsonl"))
+ALERT_WEBHOOK = os.environ.get("ALERT_WEBHOOK")
+ALERT_POLL_INTERVAL = float(os.environ.get("ALERT_POLL_INTERVAL", 120))
+alert_sinks = [FileSink(ALERT_LOG)] + ([WebhookSink(ALERT_WEBHOOK)] if ALERT_WEBHOOK else [])
+alert_engine = AlertEngine(alert_sinks, path=ALERTS_PATH)
+live_hub.add_listener(lambda event: alert_engine.on_values(event["ticker"], event_values(event), event["as_of"], source="live"))
+
+def breadth_alerts(engine):
+    """Check the rules of every NSE ticker that has some against its new session bar"""
+    symbols = [t[:-3] for t in alert_engine.tickers() if t.endswith(".NS")]
+    for symbol, values in engine.values_for(symbols).items():
+        alert_engine.on_values(symbol + ".NS", values, engine.day, source="session")
+
+def poll_alert_tickers():
+    """Score the latest daily bar of every ticker with a rule (one batch fetch) and evaluate it"""
+    histories = batch_histories(sorted(alert_engine.tickers()))
+    values = history_values({ticker: frame_to_arrays(history) for ticker, history in histories.items()})
+    for ticker, row in values.items():
+        alert_engine.on_values(ticker, row, histories[ticker].last_date, source="poll")
+    return len(values)
+
+async def alert_poller():
+    """Polls while this worker holds the leader lock; until then tries to take it every interval"""
+    leader = None
+    while True:
+        try:
+            if not leader:
+                leader = hold_leader_lock(ALERTS_PATH + ".lock")
+                if leader:
+                    print(f"✅ Alert poller leader: pid {os.getpid()}")
+            if leader and alert_engine.tickers():
+                polled = await asyncio.to_thread(poll_alert_tickers)
+                print(f"✅ Alert poll: {polled} tickers checked")
+        except Exception as e:
+            print(f"❌ Alert poll failed: {e}")
+        await asyncio.sleep(ALERT_POLL_INTERVAL)
+
+alert_poller_state = {"pid": None}
+alert_poller_lock = threading.Lock()
+
+@app.before_request
+def start_alert_poller():
+    """Once per worker process, after any fork (a --preload master never starts it)"""
+    if ALERT_POLL_INTERVAL <= 0 or alert_poller_state["pid"] == os.getpid():
+        return
+    with alert_poller_lock:
+        if alert_poller_state["pid"] != os.getpid():
+            alert_poller_state["pid"] = os.getpid()
+            run_async(alert_poller())
+
+@app.route('/alerts/rules', methods=["GET"])
+def list_alert_rules():
+    ticker = live_ticker(sanitize_ticker(request.args['ticker'])) if request.args.get('ticker') else None
+    rules = alert_engine.rules(ticker=ticker, user=request.args.get('user'))
+    return {"count": len(rules), "rules": rules}
+
+@app.route('/alerts/rules', methods=["POST"])
+def add_alert_rule():
+    """
+    JSON body {ticker, field, op, threshold, once?, user?, note?}, or
+    {ticker, kind: "trade_plan", entry?} for stop-loss and target rules
+    """
+    body = request.get_json(silent=True) or {}
+    if not body.get('ticker'):
+        return {"error": "ticker is required"}, 400
+    ticker = live_ticker(sanitize_ticker(body['ticker']))
+    try:
+        if body.get('kind') == "trade_plan":
+            entry = body.get('entry') or alert_engine.last(ticker, "price")
+            if entry is None:
+                return {"error": "entry is required (no price seen yet for this ticker)"}, 400
+            rules = alert_engine.add_trade_plan(ticker, float(entry), user=body.get('user'))
+        else:
+            rules = [alert_engine.add(ticker, body.get('field'), body.get('op'), body.get('threshold'),
+                                      once=body.get('once', True), user=body.get('user'), note=body.get('note'))]
+    except (TypeError, ValueError) as e:
+        return {"error": str(e)}, 400
+    return {"rules": rules}, 201
+
+@app.route('/alerts/rules/<int:rule_id>', methods=["DELETE"])
+def delete_alert_rule(rule_id):
+    if not alert_engine.remove(rule_id):
+        return {"error": "Unknown rule"}, 404
+    return {"deleted": rule_id}
+
+@app.route('/alerts/recent', methods=["GET"])
+def recent_alert_list():
+    return {"alerts": alert_engine.recent(max(1, min(request.args.get('limit', 50, type=int), 200)))}
 
 # ✅ Naya route yahan add karo
 @app.route('/live_price', methods=["GET"])
@@ -111,344 +253,891 @@ def live_price():
     raw_input = request.args.get('ticker') or "RELIANCE"
     raw_input = sanitize_ticker(raw_input)
 
-    ticker = yf.Ticker(raw_input + ".NS")
-    info = ticker.history(period="1d", interval="1m")
-
-    if info.empty:
-        return {"error": f"No live data found for {raw_input}"}
-
-    current_price = round(info['Close'].iloc[-1], 2)
+    # Polling tabs share the hub's poller instead of downloading per request;
+    # until its first poll lands the caller is told to come back
+    event = live_hub.latest(live_ticker(raw_input), wait=0)
+    if not event:
+        return {"status": "pending", "ticker": raw_input}, 202, {"Retry-After": str(max(1, int(LIVE_INTERVAL)))}
 
     return {
         "ticker": raw_input,
-        "current_price": f"₹{current_price}"
+        "current_price": f"₹{event['current_price']}",
+        "score": event["score"],
+        "as_of": event["as_of"],
     }
 
+@app.route('/live/stream', methods=["GET"])
+def live_stream():
+    """Server-Sent Events: a 'quote' event whenever price or score changes"""
+    raw_input = sanitize_ticker(request.args.get('ticker') or "RELIANCE")
+    subscription = live_hub.subscribe(live_ticker(raw_input))
+
+    def events():
+        deadline = time.monotonic() + LIVE_STREAM_MAX
+        with subscription:
+            yield "retry: 5000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return  # frees the worker; the browser reconnects after `retry`
+                event = subscription.get(timeout=min(LIVE_KEEPALIVE, remaining))
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: quote\ndata: {json.dumps(event)}\n\n"
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # keep nginx from buffering the stream
+    return response
+
+# --- Bulk scanner: ranks the whole universe (or ?symbols=A,B,C) by score ---
+# Source is yahoo by default; SCAN_SOURCE=synthetic or a CSV directory runs offline.
+# Callers may only pick SCAN_SOURCE or a source listed in SCAN_ALLOWED_SOURCES
+# (e.g. SCAN_ALLOWED_SOURCES=synthetic for a demo; nothing extra by default).
+SCAN_SOURCE = os.environ.get("SCAN_SOURCE", "yahoo")
+SCAN_ALLOWED_SOURCES = {SCAN_SOURCE} | {s.strip() for s in os.environ.get("SCAN_ALLOWED_SOURCES", "").split(",") if s.strip()}
+SCAN_MAX_RESULTS = int(os.environ.get("SCAN_MAX_RESULTS", 16))
+scan_results = TTLCache(maxsize=SCAN_MAX_RESULTS, ttl=CACHE_DURATION)  # (source, symbols) -> result
+scan_jobs = {}      # (source, symbols) -> job, running or failed (until a poll reports the failure)
+scan_lock = threading.Lock()
+
+async def run_scan(key, symbols, source_name):
+    """Background job body: the scan runs on a worker thread, not in the request"""
+    result = await asyncio.to_thread(scanner.scan, symbols, scanner.make_source(source_name, limiter=upstream_limiter))
+    with scan_lock:
+        scan_results.set(key, result)
+        scan_jobs.pop(key, None)
+    return {"scored": result["scored"], "failed": result["failed"]}
+
+@app.route('/scan', methods=["GET"])
+def scan():
+    raw_symbols = request.args.get('symbols')
+    if raw_symbols:
+        symbols = [sanitize_ticker(s) for s in raw_symbols.split(",") if s.strip()]
+    else:
+        symbols = STOCK_LIST
+    source_name = request.args.get('source') or SCAN_SOURCE
+    if source_name not in SCAN_ALLOWED_SOURCES:
+        return {"error": f"Unknown source {source_name!r}; expected one of {', '.join(sorted(SCAN_ALLOWED_SOURCES))}"}, 400
+
+    # Pages of the same scan are served from the stored result; a miss starts
+    # (or joins) a background scan and the caller polls this URL again
+    key = (source_name, tuple(symbols))
+    with scan_lock:
+        result = scan_results.get(key)
+        if result is None:
+            job = scan_jobs.get(key)
+            if job is not None and job["status"] == "failed":
+                del scan_jobs[key]  # reported once; the next request starts a new scan
+                return {"error": f"Scan failed: {job['error']}", "job": job["id"]}, 502
+            if job is None:
+                job = fetch_jobs.start(run_scan(key, symbols, source_name), ticker=f"scan:{source_name}")
+                scan_jobs[key] = job
+            return {"status": "pending", "job": job["id"], "symbols": len(symbols), "retry_after": 2}, 202
+
+    rows = scanner.filter_rows(
+        result["rows"],
+        min_score=request.args.get('min_score', type=int),
+        max_score=request.args.get('max_score', type=int),
+        verdict=request.args.get('verdict'),
+    )
+    page = scanner.paginate(rows, request.args.get('page', 1, type=int), request.args.get('per_page', 50, type=int))
+    page.update({
+        "scored": result["scored"],
+        "failed": result["failed"],
+        "seconds": result["seconds"],
+        "symbols_per_sec": result["symbols_per_sec"],
+    })
+    return page
+
+# --- Market breadth (see breadth.py): built once in the background, then one update per session ---
+BREADTH_SOURCE = os.environ.get("BREADTH_SOURCE", SCAN_SOURCE)
+breadth_state = {"engine": None, "job": None, "checked": 0.0}
+breadth_lock = threading.Lock()
+
+def build_breadth():
+    day = last_closed_session()
+    if BREADTH_SOURCE == "yahoo":
+        engine = breadth.BreadthEngine.from_bars(breadth.download_bars(STOCK_LIST, period='6mo', limiter=upstream_limiter), day, breadth.load_sectors())
+    else:
+        histories = scanner.make_source(BREADTH_SOURCE, limiter=upstream_limiter).fetch(STOCK_LIST)
+        engine = breadth.BreadthEngine.from_histories(histories, breadth.load_sectors(), day)
+    breadth_alerts(engine)  # baseline values; later sessions are checked as they are folded in
+    engine.listeners.append(breadth_alerts)
+    print(f"✅ Breadth engine built for {engine.day}: {len(engine.symbols)} symbols")
+    return engine
+
+def refresh_breadth(engine):
+    """Fold in the sessions closed since the engine's last one (only their bars are downloaded)"""
+    day = last_closed_session()
+    start = (datetime.date.fromisoformat(engine.day) + datetime.timedelta(days=1)).isoformat()
+    added = engine.catch_up(breadth.download_bars(engine.symbols, start=start, limiter=upstream_limiter), day)
+    print(f"✅ Breadth engine advanced {added} session(s) to {engine.day}")
+    return engine
+
+def breadth_engine():
+    """The in-memory engine (None while the first build runs); starts a build or refresh when due"""
+    with breadth_lock:
+        engine, job = breadth_state["engine"], breadth_state["job"]
+        if job is not None and job.done():
+            breadth_state["job"] = None
+            try:
+                engine = breadth_state["engine"] = job.result()
+            except Exception as e:
+                print(f"❌ Breadth update failed: {e}")
+        elif job is None and time.time() - breadth_state["checked"] >= CACHE_DURATION:
+            # Holidays leave engine.day behind the last weekday, so retries are spaced out
+            if engine is None:
+                breadth_state["job"] = run_async(asyncio.to_thread(build_breadth))
+                breadth_state["checked"] = time.time()
+            elif BREADTH_SOURCE == "yahoo" and engine.day < last_closed_session():
+                breadth_state["job"] = run_async(asyncio.to_thread(refresh_breadth, engine))
+                breadth_state["checked"] = time.time()
+        return engine
+
+@app.route('/breadth', methods=["GET"])
+def breadth_summary():
+    engine = breadth_engine()
+    if engine is None:
+        return {"status": "building", "symbols": len(STOCK_LIST)}, 202
+    return engine.summary(request.args.get('top', 10, type=int))
+
+@app.route('/cache/stats', methods=["GET"])
+def cache_stats():
+    return data_cache.stats()
+
+# --- Metrics (see metrics.py) ---
+# ✅ Per-stage spans feed /metrics; ?profile=1 adds a Server-Timing header with
+# this request's spans, and PROFILE_DIR=/path also saves a cProfile dump
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+
+@metrics.registry.collector
+def cache_metrics():
+    caches = {"history": data_cache.stats(), "nse_quote": nse_client._quotes.stats()}
+    families = []
+    for name, field in (("cache_hits_total", "hits"), ("cache_misses_total", "misses"),
+                        ("cache_evictions_total", "evictions"), ("cache_expirations_total", "expirations")):
+        families.append((name, "counter", f"Cache {field}", {(("cache", c),): s[field] for c, s in caches.items()}))
+    families.append(("cache_entries", "gauge", "Entries held per cache", {(("cache", c),): s["entries"] for c, s in caches.items()}))
+    families.append(("cache_bytes", "gauge", "Estimated bytes held per cache", {(("cache", c),): s["bytes"] for c, s in caches.items()}))
+    families.append(("live_feeds", "gauge", "Tickers with an active live poller", {(): live_hub.stats()["feeds"]}))
+    families.append(("live_subscribers", "gauge", "Open live stream connections", {(): live_hub.stats()["subscribers"]}))
+    families.append(("nse_client_total", "counter", "NSE client requests, cookie primes and errors",
+                     {(("event", k),): v for k, v in nse_client.stats.items()}))
+    families.append(("alert_rules", "gauge", "Registered alert rules", {(): len(alert_engine)}))
+    families.append(("alerts_total", "counter", "Alert rule evaluations and alerts fired",
+                     {(("event", k),): v for k, v in alert_engine.stats.items()}))
+    report = startup.report()
+    families.append(("startup_import_milliseconds", "gauge", "Time to import app.py",
+                     {(): report["import_ms"] or 0}))
+    families.append(("startup_phase_milliseconds", "gauge", "Start-up phases and deferred imports",
+                     {**{(("phase", k),): v for k, v in report["phases_ms"].items()},
+                      **{(("phase", "lazy:" + k),): v for k, v in report["lazy_imports_ms"].items()}}))
+    return families
+
+@app.before_request
+def start_request_metrics():
+    request.environ["metrics.start"] = time.perf_counter()
+    if request.args.get('profile') == '1':
+        request.environ["metrics.profile"] = metrics.start_profile()
+        if PROFILE_DIR:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            request.environ["metrics.profiler"] = profiler
+
+@app.after_request
+def finish_request_metrics(response):
+    start = request.environ.get("metrics.start")
+    if start is not None:
+        metrics.http_seconds.observe(time.perf_counter() - start, endpoint=request.endpoint or "unknown")
+    token = request.environ.pop("metrics.profile", None)
+    if token is not None:
+        spans = metrics.stop_profile(token)
+        spans.append(("total", time.perf_counter() - start))
+        response.headers["Server-Timing"] = metrics.server_timing(spans)
+        profiler = request.environ.pop("metrics.profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{request.endpoint or 'request'}-{time.time_ns()}.prof")
+            profiler.dump_stats(path)
+            print(f"🧪 Profile written to {path}")
+    return response
+
+@app.teardown_request
+def drop_request_profile(exc):
+    # after_request is skipped when a view raises; don't leak the span list
+    token = request.environ.pop("metrics.profile", None)
+    if token is not None:
+        metrics.stop_profile(token)
+    profiler = request.environ.pop("metrics.profiler", None)
+    if profiler is not None:
+        profiler.disable()
+
+@app.route('/startup', methods=["GET"])
+def startup_report():
+    return startup.report()
+
+@app.route('/metrics', methods=["GET"])
+def metrics_endpoint():
+    return metrics.registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+# ✅ NEW: On-disk OHLCV store (see store.py)
+ohlcv_store = OHLCVStore()
+HISTORY_DAYS = 183  # Same window as period='6mo'
+
+def save_history(ticker, data):
+    """Write downloaded bars to the store; a store failure never fails the request"""
+    try:
+        ohlcv_store.write(ticker, frame_columns(data))
+    except Exception as e:
+        print(f"⚠️ Could not store {ticker}: {e}")
+
+def load_stored_history(ticker):
+    """
+    Last 6 months from the store, after fetching only the bars newer than
+    the last stored date (at most once per CACHE_DURATION). Returns None if
+    the symbol has never been stored.
+    """
+    last_date = ohlcv_store.last_date(ticker)
+    if last_date is None:
+        return None
+
+    checked_at = ohlcv_store.checked_at(ticker)
+    if checked_at is None or time.time() - checked_at >= CACHE_DURATION:
+        # Start at the last stored bar so a still-forming bar gets its final values
+        start = time.strftime("%Y-%m-%d", time.gmtime(last_date))
+        try:
+            upstream_limiter.acquire()
+            print(f"Updating {ticker} from {start}...")
+            with span("yahoo_update", suffix=ticker_suffix(ticker)):
+                data = yf.download(ticker, start=start, interval='1d', progress=False)
+            metrics.upstream_requests.inc(upstream="yahoo", outcome="ok" if not data.empty else "empty")
+            if not data.empty:
+                ohlcv_store.write(ticker, frame_columns(data))
+            else:
+                ohlcv_store.mark_checked(ticker)
+        except Exception as e:
+            print(f"⚠️ Update failed for {ticker}, using stored history: {e}")
+            metrics.upstream_requests.inc(upstream="yahoo", outcome="error")
+
+    history = PriceHistory.from_columns(ohlcv_store.read(ticker, since=time.time() - HISTORY_DAYS * 86400))
+    return None if history.empty else history
+
 # ✅ IMPROVED: Retry function with better delays for rate limiting
 def fetch_data_with_retry(ticker, max_retries=4, initial_wait=3):
     """
     Fetch data with retry mechanism and delays
     initial_wait: Start with longer delay to avoid rate limiting on first request
     """
-    
-    # ✅ Check cache first
-    cached = get_cached_data(ticker)
-    if cached is not None and not cached.empty:
-        return cached
+    # ✅ Cache first; on a miss concurrent requests for one ticker share a single download
+    with span("fetch_history", suffix=ticker_suffix(ticker)):
+        data = data_cache.get_or_load(ticker, lambda: download_history(ticker, max_retries, initial_wait))
+    return data if data is not None else PriceHistory()  # Empty history if all retries fail
+
+def download_history(ticker, max_retries=4, initial_wait=3):
+    """Stored history or a fresh 6-month download as a PriceHistory; None if every attempt fails"""
+    # ✅ Local store: history survives restarts, only newer bars are downloaded
+    stored = load_stored_history(ticker)
+    if stored is not None:
+        return stored
     
     for attempt in range(max_retries):
         try:
+            upstream_limiter.acquire()
             print(f"Attempt {attempt + 1}: Downloading {ticker}...")
-            data = yf.download(ticker, period='6mo', interval='1d', progress=False)
+            with span("yahoo_download", suffix=ticker_suffix(ticker)):
+                data = yf.download(ticker, period='6mo', interval='1d', progress=False)
             
             if not data.empty:
                 print(f"✅ Successfully downloaded {ticker}")
-                set_cached_data(ticker, data)  # ✅ Cache the data
-                return data
+                metrics.upstream_requests.inc(upstream="yahoo", outcome="ok")
+                save_history(ticker, data)
+                return PriceHistory.from_frame(data)
             else:
                 print(f"⚠️ {ticker} returned empty data")
+                metrics.upstream_requests.inc(upstream="yahoo", outcome="empty")
         except Exception as e:
             print(f"❌ Error downloading {ticker}: {e}")
+            metrics.upstream_requests.inc(upstream="yahoo", outcome="error")
         
         # Wait before retry with longer delays for rate limiting
         if attempt < max_retries - 1:
             # First attempt: wait 3 seconds, then exponential backoff
             wait_time = initial_wait + (2 ** attempt)  # 3, 5, 9, 17 seconds
             print(f"⏳ Rate limit protection: Waiting {wait_time} seconds before retry...")
+            metrics.retries.inc(upstream="yahoo")
             time.sleep(wait_time)
     
-    return pd.DataFrame()  # Return empty DataFrame if all retries fail
+    return None
+
+# ✅ NEW: Async data layer (see async_fetch.py)
+history_flights = AsyncSingleFlight()
+fetch_jobs = JobRegistry()
+# raw input -> ticker that returned data ("" = nothing found, kept for a minute)
+resolved_tickers = TTLCache(maxsize=4096, ttl=CACHE_DURATION)
+NOT_FOUND_TTL = 60
+# Longest a request waits on background fetches before answering "pending" instead
+FETCH_WAIT = float(os.environ.get("FETCH_WAIT", 5))
+
+def suffix_candidates(raw_input):
+    """The indexed ticker when known; only unknown inputs race bare / .NS / .BO"""
+    resolution = symbol_index.resolve(raw_input)
+    if resolution is not None:
+        return [resolution.ticker]
+    return [raw_input, raw_input + ".NS", raw_input + ".BO"]
+
+def cached_history(raw_input):
+    """(ticker, data) if already in memory, False if known to have no data, None if it must be fetched"""
+    known = resolved_tickers.get(raw_input)
+    if known == "":
+        return False
+    for ticker in [known] if known else suffix_candidates(raw_input):
+        data = data_cache.get(ticker)
+        if data is not None and not data.empty:
+            return ticker, data
+    return None
+
+async def fetch_history_async(ticker, max_retries=4, initial_wait=3):
+    """
+    Async fetch_data_with_retry(): same cache and store, backoff via
+    asyncio.sleep. The download joins the cache's in-flight entry, so a
+    sync miss and an async miss on one ticker share a single download.
+    """
+    cached = data_cache.get(ticker)
+    if cached is not None:
+        return cached
+    return await history_flights.run(ticker, lambda: data_cache.get_or_load_async(
+        ticker, lambda: download_history_async(ticker, max_retries, initial_wait)))
+
+async def download_history_async(ticker, max_retries=4, initial_wait=3):
+    """download_history() with async backoff; the caller's get_or_load_async() caches the result"""
+    stored = await asyncio.to_thread(load_stored_history, ticker)
+    if stored is not None:
+        return stored
+
+    for attempt in range(max_retries):
+        await upstream_limiter.acquire_async()
+        try:
+            print(f"Attempt {attempt + 1}: Downloading {ticker}...")
+            with span("yahoo_download", suffix=ticker_suffix(ticker)):
+                data = await asyncio.to_thread(yf.download, ticker, period='6mo', interval='1d', progress=False)
+            if not data.empty:
+                print(f"✅ Successfully downloaded {ticker}")
+                metrics.upstream_requests.inc(upstream="yahoo", outcome="ok")
+                save_history(ticker, data)
+                return PriceHistory.from_frame(data)
+            print(f"⚠️ {ticker} returned empty data")
+            metrics.upstream_requests.inc(upstream="yahoo", outcome="empty")
+        except Exception as e:
+            print(f"❌ Error downloading {ticker}: {e}")
+            metrics.upstream_requests.inc(upstream="yahoo", outcome="error")
+
+        if attempt < max_retries - 1:
+            wait_time = initial_wait + (2 ** attempt)  # 3, 5, 9, 17 seconds
+            print(f"⏳ Rate limit protection: Waiting {wait_time} seconds before retry (async)...")
+            metrics.retries.inc(upstream="yahoo")
+            await asyncio.sleep(wait_time)
+    return None
+
+async def resolve_history_async(raw_input):
+    """(ticker, data) for whichever of bare / .NS / .BO returns data first, else None"""
+    known = resolved_tickers.get(raw_input)
+    if known == "":
+        return None
+
+    async def attempt(ticker):
+        with span("fetch_history", suffix=ticker_suffix(ticker)):
+            data = await fetch_history_async(ticker)
+        if data is not None and not data.empty:
+            return ticker, data
+        return None
+
+    candidates = [known] if known else suffix_candidates(raw_input)
+    result = await first_success([lambda t=t: attempt(t) for t in candidates])
+    if result is None and not known:
+        # Last resort, after exact matches and the suffix race: a unique company-name prefix
+        guess = symbol_index.resolve_prefix(raw_input)
+        if guess is not None and guess.ticker not in candidates:
+            result = await attempt(guess.ticker)
+    if result:
+        resolved_tickers.set(raw_input, result[0])
+    else:
+        resolved_tickers.set(raw_input, "", ttl=NOT_FOUND_TTL)
+    return result
+
+async def warm_history(raw_input):
+    """Background job body: fills the cache, returns only the resolved ticker"""
+    result = await resolve_history_async(raw_input)
+    return result[0] if result else None
+
+@app.route('/jobs/analyze', methods=["GET", "POST"])
+def start_analyze_job():
+    raw_input = sanitize_ticker(request.values.get('ticker'))
+    job = fetch_jobs.start(warm_history(raw_input), ticker=raw_input)
+    return job_status(job['id']), 202
+
+@app.route('/jobs/<job_id>', methods=["GET"])
+def job_status(job_id):
+    job = fetch_jobs.get(job_id)
+    if job is None:
+        return {"error": "Unknown job"}, 404
+    status = {"id": job["id"], "ticker": job["ticker"], "status": job["status"]}
+    if job["status"] == "done":
+        status["resolved"] = job["result"]
+        status["redirect"] = url_for("analyze", ticker=job["ticker"])
+    elif job["status"] == "failed":
+        status["error"] = job["error"]
+    return status
+
+# --- Multi-timeframe analysis (see timeframes.py) ---
+# ✅ One 1-minute download per ticker feeds 5m / 15m / 1h; live polls append to it
+# and weekly bars are resampled from the cached daily history
+INTRADAY_PERIOD = "7d"   # Yahoo keeps about a week of 1-minute bars
+INTRADAY_REFRESH = 60    # seconds before analyze() asks Yahoo for newer minutes
+intraday_books = TTLCache(maxsize=256, ttl=3600)
+weekly_bars = TTLCache(maxsize=1024, ttl=CACHE_DURATION)
+
+def download_intraday(ticker, period):
+    upstream_limiter.acquire()
+    with span("yahoo_intraday", suffix=ticker_suffix(ticker)):
+        try:
+            data = yf.download(ticker, period=period, interval='1m', progress=False)
+        except Exception:
+            metrics.upstream_requests.inc(upstream="yahoo_intraday", outcome="error")
+            raise
+    metrics.upstream_requests.inc(upstream="yahoo_intraday", outcome="ok" if not data.empty else "empty")
+    return data
+
+def intraday_book(ticker):
+    """IntradayBook for a ticker: a week of 1m bars on first use, then only the current day's new minutes"""
+    def load():
+        book = timeframes.IntradayBook()
+        book.extend(download_intraday(ticker, INTRADAY_PERIOD))
+        return book
+
+    book = intraday_books.get_or_load(ticker, load)
+    if time.time() - book.updated >= INTRADAY_REFRESH:
+        book.updated = time.time()  # one refresh at a time; others use the book as is
+        try:
+            book.extend(download_intraday(ticker, "1d"))
+        except Exception as e:
+            print(f"⚠️ Intraday refresh failed for {ticker}: {e}")
+    return book
+
+def timeframe_series(ticker, daily):
+    """{timeframe: (close, volume)} from the cached daily history and the intraday book"""
+    series = {"1d": frame_to_arrays(daily)}
+    week = weekly_bars.get_or_load((ticker, daily.last_date, len(daily)), lambda: timeframes.weekly(daily))
+    series["1w"] = frame_to_arrays(week)
+    try:
+        book = intraday_book(ticker)
+    except Exception as e:
+        print(f"⚠️ No intraday bars for {ticker}: {e}")
+        return series
+    for timeframe in timeframes.INTRADAY_MINUTES:
+        series[timeframe] = book.series(timeframe)
+    return series
+
+def timeframe_analysis(raw_input, ticker, daily, timeframe):
+    """history_analysis() on `timeframe` bars plus a score row for every timeframe"""
+    series = timeframe_series(ticker, daily)
+    with span("indicators"):
+        scored = timeframes.score_timeframes(series)
+    if timeframe not in scored:
+        timeframe = "1d"  # intraday bars unavailable: fall back to daily
+    close, volume = series[timeframe]
+    analysis = history_analysis(raw_input, close, volume, values=scored[timeframe]["values"])
+    analysis["Timeframe"] = timeframe
+    analysis["Timeframes"] = [
+        {"timeframe": tf, "bars": scored[tf]["bars"], "price": scored[tf]["price"],
+         "score": scored[tf]["score"], "verdict": scored[tf]["verdict"]}
+        for tf in timeframes.TIMEFRAMES if tf in scored
+    ]
+    return analysis
+
+# ✅ End-of-day snapshot (see snapshot.py): after the close, analyze() is a table lookup
+snapshot_store = SnapshotStore()
 
 @app.route('/analyze', methods=["GET","POST"])
 def analyze():
     raw_input = request.args.get('ticker') or request.form.get('ticker') or request.form.get('search') or "RELIANCE"
     raw_input = sanitize_ticker(raw_input)
 
+    # ✅ Resolve symbol / ISIN / company name before any network call
+    resolution = symbol_index.resolve(raw_input)
+    query = resolution.ticker if resolution else raw_input
+    if resolution:
+        raw_input = resolution.symbol
+
+    # ?timeframe=5m|15m|1h|1d|1w scores every timeframe from history; without it, 1d as before
+    timeframe = request.values.get('timeframe') or None
+    if timeframe is not None and timeframe not in timeframes.TIMEFRAMES:
+        timeframe = "1d"
+
+    # --- Snapshot: nothing changes between the close and the next open (?live=1 skips it) ---
+    if resolution and timeframe is None and request.values.get('live') != '1':
+        with span("snapshot_lookup"):
+            analysis = snapshot_store.serve(resolution.ticker)
+        if analysis is not None:
+            with span("render"):
+                return render_template('index.html', analysis=analysis)
+
     # --- NSE API block ---
-    if raw_input in STOCK_LIST:
+    if resolution and resolution.exchange == "NSE" and timeframe is None:
         nse_data = fetch_nse_data(raw_input)
+        if not nse_data:
+            metrics.nse_fallbacks.inc()
         if nse_data:
-            info = nse_data.get("info", {})
-            company_name = info.get("companyName", raw_input)
-            sector = info.get("industry", "N/A")
-            prices = nse_data.get("priceInfo", {})
-            last_price = prices.get("lastPrice", "N/A")
-            prev_close = prices.get("previousClose", "N/A")
-            current_price = last_price
-            day_high = prices.get("intraDayHighLow", {}).get("max", "N/A")
-            day_low = prices.get("intraDayHighLow", {}).get("min", "N/A")
-            day_range = f"📊 Day Range: ₹{day_low} - ₹{day_high}"
-
-            score = 0
-
-                     
-            if last_price != "N/A" and prev_close != "N/A":
-                if last_price > prev_close:
-                    score += 1
-                elif last_price < prev_close:
-                    score -= 1
-
-            # Unified verdicts
-            if score >= 3:
-                verdict_msg = f"🟢 Strong Buy — High confidence. (Score {score})"
-                confidence = "High"
-            elif score in [1,2]:
-                verdict_msg = f"⚠️ Cautious Buy — Mild bullish. (Score {score})"
-                confidence = "Medium"
-            elif score <= -3:
-                verdict_msg = f"🔴 Strong Sell — High confidence bearish. (Score {score})"
-                confidence = "High"
-            elif score in [-1,-2]:
-                verdict_msg = f"⚠️ Cautious Sell — Mild bearish. (Score {score})"
-                confidence = "Medium"
-            else:
-                verdict_msg = f"⚖️ Neutral — No clear momentum. (Score {score})"
-                confidence = "Low"
-
-            stop_loss_value = round(last_price * 0.98, 2) if last_price != "N/A" else "N/A"
-            target_value = round(last_price * 1.03, 2) if last_price != "N/A" else "N/A"
-            trade_plan = build_trade_plan(
-                verdict_msg,
-                score,
-                last_price,
-                stop_loss_value,
-                target_value,
-            )
-
-            analysis = {
-                "ticker": raw_input,
-                "Company": company_name,
-                "Sector": sector,
-                "Description": f"📌 {company_name} ka sector {sector} hai.",
-                "CurrentPrice": f"💰 Current Price: ₹{current_price}",
-                "DayRange": day_range,
-                "Trend": f"{verdict_msg} | Confidence: {confidence}",
-                "Entry": "🎯 Suggested Entry Zone: Wait for clearer signals.",
-                "Exit": f"✅ Exit Strategy: Target exit around ₹{target_value}" if last_price!="N/A" else "N/A",
-                "StopLoss": f"🛑 Stop-loss: ₹{stop_loss_value}" if last_price!="N/A" else "N/A",
-                "Verdict": verdict_msg,
-                "Disclaimer": "This analysis is for educational purposes only. Not financial advice.",
-                "Score": score,
-                "TradePlan": trade_plan,
-            }
-            return render_template('index.html', analysis=analysis, stock_list=STOCK_LIST)
+            analysis = nse_analysis(raw_input, nse_data)
+            analysis["LiveTicker"] = resolution.ticker
+            # The quote names the industry; breadth's sector table learns it for free
+            if breadth_state["engine"] is not None:
+                breadth_state["engine"].set_sector(raw_input, analysis["Sector"])
+            with span("render"):
+                return render_template('index.html', analysis=analysis)
 
     # --- Yahoo fallback with retry mechanism ---
-    # ✅ IMPROVED: Longer initial delay (3 seconds) to avoid first-request rate limiting
-    print(f"\n🔍 Analyzing {raw_input}...")
-    print("⏳ Starting Yahoo Finance download (with rate limit protection)...\n")
-    
-    # Try without suffix first
-    data = fetch_data_with_retry(raw_input, initial_wait=3)
-    
-    if data.empty:
-        # Try with .NS suffix
-        data = fetch_data_with_retry(raw_input + ".NS", initial_wait=3)
-    
-    if data.empty:
-        # Try with .BO suffix (BSE)
-        data = fetch_data_with_retry(raw_input + ".BO", initial_wait=3)
-    
-    if data.empty:
-        return render_template('index.html', analysis={'error': f'Sorry, no data found for {raw_input}. Please check the ticker symbol. The service may be rate-limited—try again after a minute.'}, stock_list=STOCK_LIST)
-
-    data = data.dropna()
-    data = data.rename(columns={
-        "Open": "open",
-        "High": "high",
-        "Low": "low",
-        "Close": "close",
-        "Volume": "volume"
-    })
-    data = data[['open','high','low','close','volume']]
+    # ✅ Bare / .NS / .BO lookups run concurrently on the background loop. Unless
+    # ?wait=1 is set, an uncached ticker returns a polling page instead of holding
+    # this worker through the retry backoff.
+    resolved = cached_history(query)
+    if resolved is None:
+        job = fetch_jobs.start(warm_history(query), ticker=query)
+        # ?wait=1 holds the worker for at most FETCH_WAIT seconds, then polls like the rest
+        if request.values.get('wait') != '1' or job['id'] not in fetch_jobs.wait([job], FETCH_WAIT):
+            return render_template('index.html', analysis={'pending': job['id'], 'ticker': raw_input, 'timeframe': timeframe})
+        print(f"\n🔍 Analyzing {raw_input}...")
+        resolved = cached_history(query) or None
 
-    def safe_val(series, default=None):
-        """Returns numeric value or None (not "N/A" string)"""
-        try:
-            val = series.iloc[-1]
-            if pd.isna(val):
-                return default
-            return round(float(val), 2)
-        except Exception:
-            return default
+    if not resolved:
+        # Last known snapshot beats an error page; it is marked stale
+        stale = snapshot_store.latest(resolution.ticker) if resolution else None
+        if stale is not None:
+            return render_template('index.html', analysis=stale)
+        return render_template('index.html', analysis={'error': f'Sorry, no data found for {raw_input}. Please check the ticker symbol. The service may be rate-limited—try again after a minute.'})
 
-    # ✅ FIXED: Properly extract indicator values from finta
-    try:
-        sma10_result = TA.SMA(data, 10)
-        data['SMA_10'] = sma10_result if isinstance(sma10_result, pd.Series) else sma10_result.iloc[:, 0]
-    except Exception as e:
-        print(f"SMA_10 error: {e}")
-        data['SMA_10'] = np.nan
+    if timeframe is not None:
+        analysis = timeframe_analysis(raw_input, resolved[0], resolved[1], timeframe)
+    else:
+        close, volume = frame_to_arrays(resolved[1])
+        analysis = history_analysis(raw_input, close, volume)
+    analysis["LiveTicker"] = resolved[0]
 
-    try:
-        sma30_result = TA.SMA(data, 30)
-        data['SMA_30'] = sma30_result if isinstance(sma30_result, pd.Series) else sma30_result.iloc[:, 0]
-    except Exception as e:
-        print(f"SMA_30 error: {e}")
-        data['SMA_30'] = np.nan
+    with span("render"):
+        return render_template('index.html', analysis=analysis)
 
-    try:
-        ema20_result = TA.EMA(data, 20)
-        data['EMA_20'] = ema20_result if isinstance(ema20_result, pd.Series) else ema20_result.iloc[:, 0]
-    except Exception as e:
-        print(f"EMA_20 error: {e}")
-        data['EMA_20'] = np.nan
+# --- JSON API: typed fields, no Jinja, ETags derived from the data version ---
+API_BATCH_MAX = 50
+API_MAX_AGE = 60
+# version key -> result dict; a new bar or a refreshed close is a new key
+api_results = TTLCache(maxsize=4096, ttl=CACHE_DURATION)
 
-    try:
-        rsi_result = TA.RSI(data)
-        data['RSI'] = rsi_result if isinstance(rsi_result, pd.Series) else rsi_result.iloc[:, 0]
-    except Exception as e:
-        print(f"RSI error: {e}")
-        data['RSI'] = np.nan
-
-    try:
-        macd_result = TA.MACD(data)
-        if isinstance(macd_result, pd.DataFrame):
-            data['MACD'] = macd_result['MACD']
+def api_histories(queries, wait=FETCH_WAIT):
+    """
+    ({query: (ticker, data) or None}, {query: job id}). Cached histories are
+    used directly; the rest are fetched as concurrent background jobs, and
+    any still running after `wait` seconds are returned for the caller to poll.
+    """
+    found, missing = {}, []
+    for query in dict.fromkeys(queries):
+        hit = cached_history(query)
+        if hit is None:
+            missing.append(query)
         else:
-            data['MACD'] = macd_result
-    except Exception as e:
-        print(f"MACD error: {e}")
-        data['MACD'] = np.nan
+            found[query] = hit or None
+    pending = {}
+    if missing:
+        jobs = {query: fetch_jobs.start(warm_history(query), ticker=query) for query in missing}
+        finished = fetch_jobs.wait(jobs.values(), wait)
+        for query, job in jobs.items():
+            if job["id"] in finished:
+                found[query] = cached_history(query) or None
+            else:
+                pending[query] = job["id"]
+    return found, pending
 
-    try:
-        bb_result = TA.BBANDS(data)
-        if isinstance(bb_result, pd.DataFrame):
-            data['BB_upper'] = bb_result['BB_UPPER']
-            data['BB_lower'] = bb_result['BB_LOWER']
-        else:
-            data['BB_upper'] = np.nan
-            data['BB_lower'] = np.nan
-    except Exception as e:
-        print(f"BBANDS error: {e}")
-        data['BB_upper'] = np.nan
-        data['BB_lower'] = np.nan
-
-    # ✅ FIXED: Get numeric values (None if unavailable, not "N/A" strings)
-    sma10 = safe_val(data['SMA_10'])
-    sma30 = safe_val(data['SMA_30'])
-    ema20 = safe_val(data['EMA_20'])
-    rsi_val = safe_val(data['RSI'])
-    macd_val = safe_val(data['MACD'])
-    close_price = safe_val(data['close'])
-    bb_upper = safe_val(data['BB_upper'])
-    bb_lower = safe_val(data['BB_lower'])
-    
-    # ✅ FIXED: Volume handling - use .iloc[-1] to get scalar boolean
-    try:
-        latest_volume_val = data['volume'].iloc[-1]
-        avg_10_volume = data['volume'].tail(10).mean()
-        volume_check = bool(latest_volume_val > avg_10_volume)  # ✅ Convert to boolean
-        
-        avg_volume = round(data['volume'].tail(20).mean(), 2)
-        latest_volume = safe_val(data['volume'])
-        if latest_volume is not None and avg_volume is not None:
-            volume_status = "📊 Volume spike detected" if latest_volume > avg_volume else "📉 Volume normal"
-        else:
-            volume_status = "📉 Volume data unavailable"
-    except Exception as e:
-        print(f"Volume error: {e}")
-        volume_check = False
-        avg_volume = None
-        latest_volume = None
-        volume_status = "📉 Volume data unavailable"
-    
-    current_price = close_price if close_price is not None else 0
+def api_version(ticker, close, data):
+    """Identifies the data a result was computed from; doubles as the ETag source"""
+    return f"{ticker}|{data.last_date}|{len(close)}|{float(close[-1])!r}"
 
-    # Scoring
-    score = 0
-    details = []
+def api_result(symbol, ticker, data, close, volume):
+    with span("indicators"):
+        values = latest_values(compute_indicators(close, volume))
+    with span("scoring"):
+        score, _ = score_breakdown(values)
+    price = round(float(close[-1]), 2)
+    verdict = scanner.verdict_label(score)
+    stop_loss, target = trade_levels(price)
+    plan = build_trade_plan(verdict, score, price, stop_loss, target)
+    indicators = {}
+    for name in ("sma_fast", "sma_slow", "ema", "rsi", "macd", "bb_upper", "bb_lower", "volume", "volume_avg"):
+        value = float(values[name])
+        indicators[name] = None if value != value else round(value, 2)
+    return {
+        "symbol": symbol,
+        "ticker": ticker,
+        "as_of": data.last_date,
+        "bars": int(len(close)),
+        "price": price,
+        "indicators": indicators,
+        "score": int(score),
+        "verdict": verdict,
+        "trade_plan": {
+            "action": plan["Action"],
+            "stop_loss": stop_loss,
+            "target": target,
+            "checklist": plan["Checklist"],
+        },
+    }
 
-    if sma10 is not None and sma30 is not None and sma10 > sma30:
-        score += 1
-        details.append("📈 SMA crossover bullish (+1)")
-    else:
-        score -= 1
-        details.append("📉 SMA crossover bearish (-1)")
+def api_analyze_many(raw_inputs):
+    """
+    [(symbol, version, compute)] in input order. Histories are fetched up
+    front, but compute() (indicators + scoring) only runs when a response
+    body is actually needed. A missing symbol gets (symbol, None, error
+    dict); one still being fetched gets (symbol, None, pending dict).
+    """
+    lookups = []
+    for raw_input in raw_inputs:
+        resolution = symbol_index.resolve(raw_input)
+        lookups.append((resolution.symbol if resolution else raw_input, resolution.ticker if resolution else raw_input))
+    histories, pending = api_histories([query for _, query in lookups])
+
+    out = []
+    for symbol, query in lookups:
+        if query in pending:
+            out.append((symbol, None, {"symbol": symbol, "status": "pending", "job": pending[query]}))
+            continue
+        resolved = histories.get(query)
+        if not resolved:
+            out.append((symbol, None, {"symbol": symbol, "error": "No data found"}))
+            continue
+        ticker, data = resolved
+        close, volume = frame_to_arrays(data)
+        version = api_version(ticker, close, data)
+        out.append((symbol, version, partial(api_cached_result, version, symbol, ticker, data, close, volume)))
+    return out
 
-    if ema20 is not None and close_price is not None and close_price > ema20:
-        score += 1
-        details.append("📈 Price above EMA20 (+1)")
+def api_cached_result(version, *args):
+    return api_results.get_or_load(version, lambda: api_result(*args))
+
+def api_response(payload_factory, versions):
+    """JSON response with an ETag over the data versions; If-None-Match hits skip payload_factory"""
+    etag = hashlib.sha1("\n".join(v or "" for v in versions).encode()).hexdigest()[:20]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
     else:
-        score -= 1
-        details.append("📉 Price below EMA20 (-1)")
-
-    if rsi_val is not None:
-        if rsi_val > 55:
-            score += 1
-            details.append(f"💪 RSI {rsi_val} bullish (+1)")
-        elif rsi_val < 45:
-            score -= 1
-            details.append(f"😓 RSI {rsi_val} bearish (-1)")
-
-    if macd_val is not None and macd_val > 0:
-        score += 1
-        details.append("📈 MACD bullish (+1)")
-    elif macd_val is not None:
-        score -= 1
-        details.append("📉 MACD bearish (-1)")
-
-    if close_price is not None and bb_upper is not None and bb_lower is not None:
-        if close_price > bb_upper:
-            score -= 1
-            details.append("📉 Price above Bollinger upper band (overbought)")
-        elif close_price < bb_lower:
-            score += 1
-            details.append("📈 Price below Bollinger lower band (oversold)")
-
-    if volume_check:  # ✅ Now this is a safe boolean
-        score += 1
-        details.append("📊 Volume spike (+1)")
-
-    # Final verdict
-    if score >= 3:
-        verdict_msg = f"🟢 Strong Buy — All indicators aligned bullish. High-confidence buying opportunity! (Score {score})"
-        entry_zone = f"₹{round(close_price*0.97,2)} – ₹{round(close_price*0.99,2)}" if close_price else "N/A"
-        stop_loss = f"₹{round(close_price*0.95,2)}" if close_price else "N/A"
-    elif score <= -3:
-        verdict_msg = f"🔴 Strong Sell — Indicators show bearish momentum. Avoid buying, shorting may be considered. (Score {score})"
-        entry_zone = f"Sell near ₹{close_price}, target lower levels." if close_price else "N/A"
-        stop_loss = f"₹{round(close_price*1.02,2)}" if close_price else "N/A"
-    elif -2 <= score <= 2:
-        verdict_msg = f"⚖️ Neutral — Signals are mixed. Best to wait for confirmation. (Score {score})"
-        entry_zone = "Wait for clearer signals before entry."
-        stop_loss = "N/A"
+        response = jsonify(payload_factory())
+    response.set_etag(etag)
+    response.cache_control.max_age = API_MAX_AGE
+    response.cache_control.public = True
+    return response
+
+@app.route('/api/analyze', methods=["GET"])
+def api_analyze():
+    raw_input = sanitize_ticker(request.args.get('ticker') or request.args.get('symbol'))
+    symbol, version, result = api_analyze_many([raw_input])[0]
+    if version is None:
+        if result.get("status") == "pending":
+            return result, 202, {"Retry-After": "2"}
+        return result, 404
+    return api_response(result, [version])
+
+@app.route('/api/analyze/batch', methods=["GET", "POST"])
+def api_analyze_batch():
+    if request.is_json:
+        raw_symbols = (request.get_json(silent=True) or {}).get("symbols") or []
     else:
-        verdict_msg = f"❓ Mixed — Indicators conflict. Trade cautiously. (Score {score})"
-        entry_zone = "No clear entry zone."
-        stop_loss = "N/A"
-
-    stop_loss_value = round(close_price * 0.98, 2) if close_price else "N/A"
-    target_value = round(close_price * 1.03, 2) if close_price else "N/A"
-    trade_plan = build_trade_plan(
-        verdict_msg,
-        score,
-        close_price if close_price else "N/A",
-        stop_loss_value,
-        target_value,
-    )
+        raw_symbols = (request.values.get('symbols') or "").split(",")
+    symbols = list(dict.fromkeys(sanitize_ticker(s) for s in raw_symbols if str(s).strip()))
+    if not symbols:
+        return {"error": "Pass symbols=A,B,C or a JSON body {\"symbols\": [...]}"}, 400
+    if len(symbols) > API_BATCH_MAX:
+        return {"error": f"At most {API_BATCH_MAX} symbols per batch"}, 400
 
-    # ✅ FIXED: Proper volume display
-    volume_display = f"Latest: {latest_volume}, Avg(20d): {avg_volume} → {volume_status}" if latest_volume is not None else "Volume data unavailable"
+    entries = api_analyze_many(symbols)
+    jobs = {s: r["job"] for s, v, r in entries if v is None and r.get("status") == "pending"}
+    if jobs:
+        # Cached symbols stay cached; polling again returns the whole batch once these land
+        return {"status": "pending", "jobs": jobs, "ready": len(entries) - len(jobs)}, 202, {"Retry-After": "2"}
 
-    analysis = {
-        "ticker": raw_input,
-        "Company": raw_input,
-        "Sector": "N/A",
-        "Description": f"📌 {raw_input} Technical Analysis",
-        "CurrentPrice": f"💰 Current Price: ₹{current_price}" if current_price else "N/A",
-        "Indicators": details,
-        "Volume": volume_display,
-        "Score": score,
-        "Verdict": verdict_msg,
-        "Entry": f"🎯 Suggested Entry Zone: {entry_zone}",
-        "Exit": f"✅ Target Exit: ₹{target_value}" if close_price else "N/A",
-        "StopLoss": f"🛑 Stop-loss: ₹{stop_loss_value}" if close_price else "N/A",
-        "TradePlan": trade_plan,
-        "Disclaimer": "This analysis is for educational purposes only. Not financial advice."
+    def payload():
+        results = [result() if callable(result) else result for _, _, result in entries]
+        return {"count": len(results), "results": results}
+    return api_response(payload, [v or s for s, v, _ in entries])
+
+# --- Watchlists / portfolios: one batched fetch and one indicator pass per request ---
+portfolio_store = PortfolioStore()
+PORTFOLIO_BATCH_SIZE = scanner.BATCH_SIZE
+
+def batch_histories(tickers):
+    """
+    {ticker: PriceHistory} for many tickers: memory cache, then recently
+    checked store entries, then one multi-ticker Yahoo download per
+    PORTFOLIO_BATCH_SIZE for the rest (instead of one download each).
+    """
+    found, missing = {}, []
+    for ticker in dict.fromkeys(tickers):
+        data = data_cache.get(ticker)
+        if data is not None and not data.empty:
+            found[ticker] = data
+            continue
+        checked_at = ohlcv_store.checked_at(ticker)
+        if checked_at is not None and time.time() - checked_at < CACHE_DURATION:
+            history = PriceHistory.from_columns(ohlcv_store.read(ticker, since=time.time() - HISTORY_DAYS * 86400))
+            if not history.empty:
+                set_cached_data(ticker, history)
+                found[ticker] = history
+                continue
+        missing.append(ticker)
+
+    for i in range(0, len(missing), PORTFOLIO_BATCH_SIZE):
+        batch = missing[i:i + PORTFOLIO_BATCH_SIZE]
+        try:
+            upstream_limiter.acquire()
+            print(f"Downloading {len(batch)} tickers in one batch...")
+            with span("yahoo_batch_download"):
+                data = yf.download(batch, period='6mo', interval='1d', group_by='ticker', progress=False)
+            metrics.upstream_requests.inc(upstream="yahoo", outcome="ok" if not data.empty else "empty")
+        except Exception as e:
+            print(f"❌ Batch download failed ({len(batch)} tickers): {e}")
+            metrics.upstream_requests.inc(upstream="yahoo", outcome="error")
+            data = None
+        frames = {}
+        if data is not None and not data.empty:
+            if data.columns.nlevels > 1:
+                frames = {ticker: data[ticker] for ticker in set(data.columns.get_level_values(0))}
+            elif len(batch) == 1:
+                frames = {batch[0]: data}  # some yfinance versions return flat columns for one ticker
+        for ticker in batch:
+            if ticker in frames:
+                frame = frames[ticker].dropna(subset=["Close"])
+                if not frame.empty:
+                    save_history(ticker, frame)
+                    found[ticker] = PriceHistory.from_frame(frame)
+                    set_cached_data(ticker, found[ticker])
+                    continue
+            # Download failed or skipped this ticker: fall back to whatever the store has
+            if ohlcv_store.last_date(ticker) is not None:
+                history = PriceHistory.from_columns(ohlcv_store.read(ticker, since=time.time() - HISTORY_DAYS * 86400))
+                if not history.empty:
+                    found[ticker] = history
+    return found
+
+def portfolio_histories(symbols):
+    """
+    ({symbol: (close, volume)}, {symbol: job id}); indexed symbols share one
+    batch fetch, unknown ones race suffixes in background jobs (see api_histories)
+    """
+    tickers, unknown = {}, []
+    for symbol in symbols:
+        resolution = symbol_index.resolve(symbol)
+        if resolution is None:
+            unknown.append(symbol)
+        else:
+            tickers[symbol] = resolution.ticker
+    histories = batch_histories(list(tickers.values()))
+    arrays = {symbol: frame_to_arrays(histories[ticker]) for symbol, ticker in tickers.items() if ticker in histories}
+    pending = {}
+    if unknown:
+        resolved_unknown, pending = api_histories(unknown)
+        for symbol, resolved in resolved_unknown.items():
+            if resolved:
+                arrays[symbol] = frame_to_arrays(resolved[1])
+    return arrays, pending
+
+def list_from_request(name):
+    """(entry, error) for PUT /portfolios/<name>: {"kind", "holdings" or "symbols", "user"} (or ?user=)"""
+    body = request.get_json(silent=True) or {}
+    try:
+        entry = portfolio_store.save(name, body.get("holdings") or body.get("symbols") or [],
+                                     kind=body.get("kind") or "watchlist", user=body.get("user") or request.args.get('user'))
+    except (TypeError, ValueError) as e:
+        return None, str(e)
+    return entry, None
+
+@app.route('/portfolios', methods=["GET"])
+def list_portfolios():
+    lists = portfolio_store.lists(user=request.args.get('user'))
+    return {"count": len(lists), "lists": lists}
+
+@app.route('/portfolios/<name>', methods=["GET"])
+def get_portfolio(name):
+    entry = portfolio_store.get(name, request.args.get('user'))
+    if entry is None:
+        return {"error": f"No list named {name!r}"}, 404
+    return entry
+
+@app.route('/portfolios/<name>', methods=["PUT"])
+def save_portfolio(name):
+    entry, error = list_from_request(name)
+    if error:
+        return {"error": error}, 400
+    return entry, 201
+
+@app.route('/portfolios/<name>', methods=["DELETE"])
+def delete_portfolio(name):
+    if not portfolio_store.delete(name, request.args.get('user')):
+        return {"error": f"No list named {name!r}"}, 404
+    return {"deleted": name}
+
+@app.route('/portfolios/analyze', methods=["GET", "POST"])
+def analyze_portfolios():
+    """
+    Stored lists (names=a,b of user=...) and/or inline ones (JSON {"lists": [{name, kind,
+    holdings}]}) analyzed together: each symbol is fetched and scored once.
+    """
+    body = request.get_json(silent=True) or {}
+    names = body.get("names") or [n for n in (request.values.get('names') or "").split(",") if n.strip()]
+    if isinstance(names, str):
+        names = [names]
+    if not all(isinstance(name, str) for name in names):
+        return {"error": "names must be a list of list names"}, 400
+    user = body.get("user") or request.values.get('user')
+    entries = []
+    for name in names:
+        entry = portfolio_store.get(name.strip(), user)
+        if entry is None:
+            return {"error": f"No list named {name.strip()!r}"}, 404
+        entries.append(entry)
+    for i, inline in enumerate(body.get("lists") or []):
+        try:
+            kind = inline.get("kind") or "watchlist"
+            if kind not in portfolio.KINDS:
+                raise ValueError(f"Unknown kind {kind!r}")
+            holdings = portfolio.normalize_holdings(inline.get("holdings") or inline.get("symbols"))
+            if kind == "portfolio" and any(h["quantity"] is None for h in holdings):
+                raise ValueError("Every portfolio holding needs a quantity")
+        except (AttributeError, TypeError, ValueError) as e:
+            return {"error": str(e)}, 400
+        entries.append({"name": inline.get("name") or f"inline-{i + 1}", "kind": kind, "holdings": holdings})
+    if not entries:
+        return {"error": "Pass names=a,b or a JSON body {\"lists\": [{\"holdings\": [...]}]}"}, 400
+
+    symbols = list(dict.fromkeys(h["symbol"] for entry in entries for h in entry["holdings"]))
+    if len(symbols) > portfolio.MAX_SYMBOLS:
+        return {"error": f"At most {portfolio.MAX_SYMBOLS} unique symbols per request"}, 400
+    start = time.perf_counter()
+    with span("portfolio_fetch"):
+        histories, pending = portfolio_histories(symbols)
+    with span("portfolio_scoring"):
+        results = portfolio.analyze_lists(entries, histories)
+    payload = {
+        "lists": results,
+        "unique_symbols": len(symbols),
+        "analyzed": len(histories),
+        "seconds": round(time.perf_counter() - start, 3),
     }
+    if pending:
+        # Unindexed symbols still resolving are left out of the aggregates until they land
+        payload.update(status="pending", jobs=pending)
+        return payload, 202, {"Retry-After": "2"}
+    return payload
 
-    return render_template('index.html', analysis=analysis, stock_list=STOCK_LIST)
+startup.ready()
 
 # ✅ Render ke liye mandatory block
 if __name__ == "__main__":
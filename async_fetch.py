@@ -0,0 +1,169 @@
+"""
+asyncio building blocks for the data layer.
+
+- TokenBucket: process-wide upstream rate limiter, usable from threads and coroutines
+- run_async(): runs a coroutine on one background event loop per process,
+  so retry/backoff waits are asyncio.sleep() calls instead of parked Flask workers
+- AsyncSingleFlight: one in-flight download per key on that loop
+- first_success(): races several lookups and keeps the first usable result
+- JobRegistry: background jobs that a polling endpoint can report on, and that
+  a request may wait on for a bounded time
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    `rate` requests per second with bursts of up to `capacity`.
+    Callers reserve a token up front and wait their turn, so concurrent
+    callers are spaced out fairly instead of all retrying at once.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take one token; returns how many seconds the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+# --- Background event loop (started lazily, so each gunicorn worker gets its own after fork) ---
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    global _loop, _loop_pid
+    with _loop_lock:
+        # A loop inherited through fork has no thread running it: start a new one
+        if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="async-fetch", daemon=True).start()
+        return _loop
+
+
+def run_async(coro):
+    """Schedule a coroutine on the background loop; returns a concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+class AsyncSingleFlight:
+    """
+    Concurrent awaiters of the same key share one task. The task is
+    cancelled only when every awaiter has gone (e.g. all lost a race).
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def run(self, key, factory):
+        entry = self._tasks.get(key)
+        if entry is None:
+            entry = [asyncio.ensure_future(factory()), 0]
+            self._tasks[key] = entry
+            entry[0].add_done_callback(lambda _: self._tasks.pop(key, None))
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
+
+
+async def first_success(factories, accept=lambda value: value is not None):
+    """
+    Start every coroutine factory at once and return the first result that
+    passes `accept` (None if none do). The rest are cancelled.
+    """
+    tasks = [asyncio.ensure_future(factory()) for factory in factories]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                value = await next_done
+            except Exception as e:
+                print(f"⚠️ Lookup failed: {e}")
+                continue
+            if accept(value):
+                return value
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class JobRegistry:
+    """Recent background jobs by id: status is pending, done or failed"""
+
+    def __init__(self, maxsize=500):
+        self.maxsize = maxsize
+        self._jobs = OrderedDict()
+        self._futures = {}     # job id -> concurrent.futures.Future while running
+        self._lock = threading.Lock()
+
+    def start(self, coro, **info):
+        job_id = uuid.uuid4().hex
+        job = dict(info, id=job_id, status="pending", created=time.time(), result=None, error=None)
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.maxsize:
+                self._jobs.popitem(last=False)
+
+        def finished(future):
+            try:
+                job["result"] = future.result()
+                job["status"] = "done"
+            except Exception as e:
+                job["error"] = str(e)
+                job["status"] = "failed"
+            job["finished"] = time.time()
+            with self._lock:
+                self._futures.pop(job_id, None)
+
+        future = run_async(coro)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(finished)
+        return job
+
+    def wait(self, jobs, timeout):
+        """Block up to `timeout` seconds for the jobs; returns the ids of those that finished"""
+        with self._lock:
+            futures = {job["id"]: self._futures.get(job["id"]) for job in jobs}
+        running = [f for f in futures.values() if f is not None]
+        if running:
+            concurrent.futures.wait(running, timeout=timeout)
+        return {job_id for job_id, f in futures.items() if f is None or f.done()}
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
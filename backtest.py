@@ -0,0 +1,342 @@
+"""
+Vectorized backtester for the composite score.
+
+Scores every bar of every symbol with the same rules as analyze() (one
+composite_score() call per block of tickers), then simulates the trade plan
+from build_trade_plan() on each scored bar: long at that bar's close with a
+2% stop and a 3% target, exiting at whichever is touched first over the next
+`horizon` bars, or at the close `horizon` bars later. All bars are evaluated
+at once with sliding windows, never in a per-bar Python loop.
+
+Results are grouped by score (and by verdict): trade count, target / stop /
+timeout rates, win rate, average return, average and worst adverse
+excursion, and the max drawdown of the bucket's daily mean-return curve.
+
+Signals overlap (every bar is a trade), so this measures the edge of each
+score level, not the equity of a single account.
+
+CLI:
+    python backtest.py                               # every symbol in the local store
+    python backtest.py --csv-dir data/csv SBIN TCS   # <SYMBOL>.csv files
+    python backtest.py --synthetic 2000 --years 10   # offline timing run
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from indicators import compute_indicators, composite_score, DEFAULT_PARAMS, RSI_BUY, RSI_SELL, STOP_PCT, TARGET_PCT
+from scanner import SyntheticSource, verdict_label
+
+HORIZON = 20         # bars a trade may stay open
+CHUNK_TICKERS = 64   # tickers per vectorized block (bounds the sliding-window memory)
+BARS_PER_YEAR = 252
+OHLCV = ("open", "high", "low", "close", "volume")
+
+
+# --- Loading: {symbol: {"date", "open", "high", "low", "close", "volume"}} ---
+def load_store(symbols=None, root=None):
+    """Histories from the memory-mapped OHLCV store (see store.py)"""
+    from store import OHLCVStore, STORE_DIR
+
+    store = OHLCVStore(root or STORE_DIR)
+    histories = {}
+    for symbol in symbols or store.symbols():
+        columns = store.read(symbol)
+        if columns is not None and len(columns["date"]):
+            histories[symbol] = columns
+    return histories
+
+
+def load_csv_dir(directory, symbols=None):
+    """Histories from <SYMBOL>.csv files (Date,Open,High,Low,Close,Volume)"""
+    import pandas as pd
+
+    if not symbols:
+        symbols = sorted(name[:-4] for name in os.listdir(directory) if name.endswith(".csv"))
+    histories = {}
+    for symbol in symbols:
+        path = os.path.join(directory, f"{symbol}.csv")
+        if not os.path.exists(path):
+            continue
+        frame = pd.read_csv(path, index_col=0, parse_dates=True).dropna(subset=["Close"])
+        if frame.empty:
+            continue
+        columns = {"date": frame.index.values.astype("datetime64[s]").astype(np.int64).astype(np.float64)}
+        for name in OHLCV:
+            key = name.capitalize()
+            columns[name] = frame[key].to_numpy(dtype=np.float64) if key in frame else frame["Close"].to_numpy(dtype=np.float64)
+        histories[symbol] = columns
+    return histories
+
+
+def synthetic_histories(count, years=10, seed=0):
+    """Deterministic OHLCV random walks for `count` made-up symbols"""
+    bars = years * BARS_PER_YEAR
+    source = SyntheticSource(bars=bars, seed=seed)
+    dates = (np.datetime64("2026-01-01") - np.arange(bars)[::-1] * np.timedelta64(1, "D")).astype("datetime64[s]")
+    dates = dates.astype(np.int64).astype(np.float64)
+    histories = {}
+    for i in range(count):
+        symbol = f"SYN{i:04d}"
+        close, volume = source.history(symbol)
+        rng = np.random.default_rng([seed, i, 1])
+        spread = np.abs(rng.normal(0, 0.008, (2, bars)))
+        opens = np.empty_like(close)
+        opens[0] = close[0]
+        opens[1:] = close[:-1] * (1 + rng.normal(0, 0.004, bars - 1))
+        histories[symbol] = {
+            "date": dates, "open": opens, "close": close, "volume": volume,
+            "high": np.maximum(opens, close) * (1 + spread[0]),
+            "low": np.minimum(opens, close) * (1 - spread[1]),
+        }
+    return histories
+
+
+def stack_ohlcv(histories):
+    """Left-pad every column with NaN into tickers x bars matrices; returns (symbols, {column: matrix})"""
+    symbols = list(histories)
+    width = max(len(histories[s]["close"]) for s in symbols)
+    arrays = {}
+    for name in ("date",) + OHLCV:
+        matrix = np.full((len(symbols), width), np.nan)
+        for row, symbol in enumerate(symbols):
+            column = np.asarray(histories[symbol][name], dtype=np.float64)
+            matrix[row, width - len(column):] = column
+        arrays[name] = matrix
+    return symbols, arrays
+
+
+# --- Simulation ---
+def signal_scores(arrays, rsi_buy=RSI_BUY, rsi_sell=RSI_SELL, **params):
+    """Composite score at every bar; bars before every indicator has warmed up are masked out"""
+    ind = compute_indicators(arrays["close"], arrays["volume"], **params)
+    score = composite_score(ind, rsi_buy, rsi_sell)
+    ready = ~np.isnan(ind["sma_slow"]) & ~np.isnan(ind["rsi"]) & ~np.isnan(ind["bb_upper"])
+    # MACD (EMA with adjust=True) is defined from the first bar; wait for the slow span anyway
+    p = dict(DEFAULT_PARAMS, **params)
+    ready &= np.cumsum(~np.isnan(arrays["close"]), axis=-1) >= p["macd_slow"]
+    return score, ready
+
+
+def simulate_trades(arrays, stop_pct=STOP_PCT, target_pct=TARGET_PCT, horizon=HORIZON, cost=0.0):
+    """
+    Long trade from every bar's close with stop / target over the next `horizon`
+    bars. Returns per-signal arrays shaped (tickers, bars - horizon):
+    ret, outcome (0 timeout, 1 target, -1 stop), mae (worst low vs entry) and
+    exit_bars. A bar whose range covers both levels counts as a stop. A gap
+    through a level fills at the open.
+    """
+    close, high, low, opens = arrays["close"], arrays["high"], arrays["low"], arrays["open"]
+    entry = close[:, :-horizon]
+    stop = entry * (1 - stop_pct)
+    target = entry * (1 + target_pct)
+
+    # Window k covers bars k+1 .. k+horizon
+    fut_high = sliding_window_view(high[:, 1:], horizon, axis=-1)
+    fut_low = sliding_window_view(low[:, 1:], horizon, axis=-1)
+    fut_open = sliding_window_view(opens[:, 1:], horizon, axis=-1)
+
+    hit_stop = fut_low <= stop[..., None]
+    hit_target = fut_high >= target[..., None]
+    first_stop = np.where(hit_stop.any(-1), hit_stop.argmax(-1), horizon)
+    first_target = np.where(hit_target.any(-1), hit_target.argmax(-1), horizon)
+
+    stopped = (first_stop < horizon) & (first_stop <= first_target)
+    targeted = (first_target < horizon) & ~stopped
+    exit_index = np.minimum(np.minimum(first_stop, first_target), horizon - 1)
+    exit_open = np.take_along_axis(fut_open, exit_index[..., None], -1)[..., 0]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stop_fill = np.where(exit_open < stop, exit_open, stop)
+        target_fill = np.where(exit_open > target, exit_open, target)
+        exit_price = np.where(stopped, stop_fill, np.where(targeted, target_fill, close[:, horizon:]))
+        ret = exit_price / entry - 1 - cost
+
+        held = np.arange(horizon) <= exit_index[..., None]
+        worst_low = np.min(np.where(held, fut_low, np.inf), axis=-1)
+        mae = np.minimum(worst_low / entry - 1, 0.0)
+
+    outcome = np.where(stopped, -1, np.where(targeted, 1, 0))
+    return {"ret": ret, "outcome": outcome, "mae": mae, "exit_bars": exit_index + 1}
+
+
+class BucketStats:
+    """Running per-score sums, plus per-date return sums for the drawdown curve"""
+
+    def __init__(self, min_score=-6, max_score=6):
+        self.offset = -min_score
+        self.size = max_score - min_score + 1
+        self.count = np.zeros(self.size, dtype=np.int64)
+        self.targets = np.zeros(self.size, dtype=np.int64)
+        self.stops = np.zeros(self.size, dtype=np.int64)
+        self.wins = np.zeros(self.size, dtype=np.int64)
+        self.ret_sum = np.zeros(self.size)
+        self.ret_sq = np.zeros(self.size)
+        self.mae_sum = np.zeros(self.size)
+        self.mae_min = np.zeros(self.size)
+        self.bars_sum = np.zeros(self.size)
+        self.daily = {}  # date -> (per-bucket return sums, per-bucket counts)
+
+    def add(self, score, dates, trades):
+        bucket = np.clip(score, -self.offset, self.size - 1 - self.offset) + self.offset
+        ret, outcome, mae = trades["ret"], trades["outcome"], trades["mae"]
+        n = self.size
+        self.count += np.bincount(bucket, minlength=n)
+        self.targets += np.bincount(bucket, weights=outcome == 1, minlength=n).astype(np.int64)
+        self.stops += np.bincount(bucket, weights=outcome == -1, minlength=n).astype(np.int64)
+        self.wins += np.bincount(bucket, weights=ret > 0, minlength=n).astype(np.int64)
+        self.ret_sum += np.bincount(bucket, weights=ret, minlength=n)
+        self.ret_sq += np.bincount(bucket, weights=ret * ret, minlength=n)
+        self.mae_sum += np.bincount(bucket, weights=mae, minlength=n)
+        self.bars_sum += np.bincount(bucket, weights=trades["exit_bars"], minlength=n)
+        np.minimum.at(self.mae_min, bucket, mae)
+
+        # Per (date, bucket) sums, merged across ticker blocks
+        days, day_index = np.unique(dates, return_inverse=True)
+        cell = day_index * n + bucket
+        sums = np.bincount(cell, weights=ret, minlength=len(days) * n).reshape(len(days), n)
+        counts = np.bincount(cell, minlength=len(days) * n).reshape(len(days), n)
+        for day, s, c in zip(days.tolist(), sums, counts):
+            if day in self.daily:
+                prev_s, prev_c = self.daily[day]
+                self.daily[day] = (prev_s + s, prev_c + c)
+            else:
+                self.daily[day] = (s, c)
+
+    def _daily(self):
+        """(days x buckets) return sums and trade counts, in date order"""
+        if not self.daily:
+            return np.zeros((0, self.size)), np.zeros((0, self.size))
+        days = sorted(self.daily)
+        return np.array([self.daily[d][0] for d in days]), np.array([self.daily[d][1] for d in days])
+
+    def summary(self, min_score=None, max_score=None, daily=None):
+        """Statistics pooled over scores in [min_score, max_score]; None if no trades"""
+        lo = 0 if min_score is None else max(0, min_score + self.offset)
+        hi = self.size if max_score is None else min(self.size, max_score + self.offset + 1)
+        pick = slice(lo, hi)
+        n = int(self.count[pick].sum())
+        if n == 0:
+            return None
+        mean = self.ret_sum[pick].sum() / n
+        targets, stops = int(self.targets[pick].sum()), int(self.stops[pick].sum())
+
+        # Max drawdown of the cumulative daily mean return
+        sums, counts = daily if daily is not None else self._daily()
+        sums, counts = sums[:, pick].sum(axis=1), counts[:, pick].sum(axis=1)
+        daily_mean = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        curve = np.cumsum(daily_mean)
+        drawdown = float((curve - np.maximum.accumulate(np.maximum(curve, 0.0))).min()) if len(curve) else 0.0
+
+        return {
+            "trades": n,
+            "target_rate": round(targets / n, 4),
+            "stop_rate": round(stops / n, 4),
+            "timeout_rate": round((n - targets - stops) / n, 4),
+            "win_rate": round(self.wins[pick].sum() / n, 4),
+            "avg_return": round(mean, 5),
+            "return_std": round(float(np.sqrt(max(self.ret_sq[pick].sum() / n - mean * mean, 0.0))), 5),
+            "avg_bars_held": round(self.bars_sum[pick].sum() / n, 2),
+            "avg_mae": round(self.mae_sum[pick].sum() / n, 5),
+            "worst_mae": round(float(self.mae_min[pick].min()), 5),
+            "max_drawdown": round(drawdown, 5),
+        }
+
+    def rows(self):
+        daily = self._daily()
+        rows = []
+        for b in np.flatnonzero(self.count):
+            score = int(b - self.offset)
+            rows.append(dict({"score": score, "verdict": verdict_label(score)}, **self.summary(score, score, daily)))
+        return rows
+
+    def verdict_rows(self, buy_threshold=3, sell_threshold=-3):
+        """Same statistics pooled into Strong Buy / Neutral / Strong Sell"""
+        daily = self._daily()
+        groups = (("Strong Buy", buy_threshold, None), ("Neutral", sell_threshold + 1, buy_threshold - 1),
+                  ("Strong Sell", None, sell_threshold))
+        rows = []
+        for label, lo, hi in groups:
+            stats = self.summary(lo, hi, daily)
+            if stats:
+                rows.append(dict({"verdict": label}, **stats))
+        return rows
+
+
+def backtest_arrays(arrays, stop_pct=STOP_PCT, target_pct=TARGET_PCT, horizon=HORIZON, cost=0.0,
+                    rsi_buy=RSI_BUY, rsi_sell=RSI_SELL, chunk=CHUNK_TICKERS, **params):
+    """Backtest stacked tickers x bars matrices (see stack_ohlcv); returns a filled BucketStats"""
+    stats = BucketStats()
+    tickers, bars = arrays["close"].shape
+    if bars <= horizon:
+        return stats
+    for start in range(0, tickers, chunk):
+        block = {name: matrix[start:start + chunk] for name, matrix in arrays.items()}
+        score, ready = signal_scores(block, rsi_buy, rsi_sell, **params)
+        trades = simulate_trades(block, stop_pct, target_pct, horizon, cost)
+        valid = ready[:, :-horizon] & ~np.isnan(trades["ret"])
+        stats.add(score[:, :-horizon][valid],
+                  block["date"][:, :-horizon][valid],
+                  {name: values[valid] for name, values in trades.items()})
+    return stats
+
+
+def run(histories, **options):
+    """Backtest a {symbol: columns} dict; returns the result summary"""
+    start = time.perf_counter()
+    symbols, arrays = stack_ohlcv(histories)
+    stats = backtest_arrays(arrays, **options)
+    elapsed = time.perf_counter() - start
+    return {
+        "symbols": len(symbols),
+        "bars": int(np.sum(~np.isnan(arrays["close"]))),
+        "trades": int(stats.count.sum()),
+        "seconds": round(elapsed, 2),
+        "buckets": stats.rows(),
+        "verdicts": stats.verdict_rows(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the composite score and trade plan on local history")
+    parser.add_argument("symbols", nargs="*", help="symbols to test (default: everything available)")
+    parser.add_argument("--store", help="OHLCV store directory (default: OHLCV_STORE_DIR / data/ohlcv)")
+    parser.add_argument("--csv-dir", help="directory of <SYMBOL>.csv files instead of the store")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="use N synthetic symbols instead")
+    parser.add_argument("--years", type=int, default=10, help="history length for --synthetic")
+    parser.add_argument("--horizon", type=int, default=HORIZON)
+    parser.add_argument("--stop", type=float, default=STOP_PCT)
+    parser.add_argument("--target", type=float, default=TARGET_PCT)
+    parser.add_argument("--cost", type=float, default=0.0, help="round-trip cost as a fraction, e.g. 0.001")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    symbols = [s.upper() for s in args.symbols]
+    if args.synthetic:
+        histories = synthetic_histories(args.synthetic, args.years)
+    elif args.csv_dir:
+        histories = load_csv_dir(args.csv_dir, symbols)
+    else:
+        histories = load_store(symbols, args.store)
+    if not histories:
+        raise SystemExit("❌ No history found; run analyze/scan first or pass --csv-dir / --synthetic")
+
+    result = run(histories, stop_pct=args.stop, target_pct=args.target, horizon=args.horizon, cost=args.cost)
+
+    print(f"{'SCORE':>5}  {'VERDICT':<12}{'TRADES':>9}{'TARGET':>8}{'STOP':>8}{'WIN':>8}{'AVG RET':>9}{'AVG MAE':>9}{'MAX DD':>9}")
+    for r in result["buckets"]:
+        print(f"{r['score']:>5}  {r['verdict']:<12}{r['trades']:>9}{r['target_rate']:>8.1%}{r['stop_rate']:>8.1%}"
+              f"{r['win_rate']:>8.1%}{r['avg_return']:>9.2%}{r['avg_mae']:>9.2%}{r['max_drawdown']:>9.1%}")
+    print("-" * 80)
+    for r in result["verdicts"]:
+        print(f"{r['verdict']:<12} {r['trades']:>9} trades  target {r['target_rate']:.1%}  stop {r['stop_rate']:.1%}  "
+              f"win {r['win_rate']:.1%}  avg {r['avg_return']:.2%}")
+    print(f"\n{result['symbols']} symbols, {result['bars']} bars, {result['trades']} trades in {result['seconds']}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,268 @@
+"""
+Offline benchmark for the /analyze pipeline.
+
+Replays OHLCV and NSE quote fixtures (no network) and times each stage of
+/analyze plus /scan-style batch throughput, then writes the numbers to a
+JSON file. Compare against a saved run to catch regressions before deploy.
+
+    python bench.py record SBIN TCS INFY        # capture live fixtures once
+    python bench.py                             # run, writes bench_results.json
+    python bench.py --compare baseline.json     # exit 1 if a stage got >25% slower
+
+Without recorded fixtures, deterministic synthetic ones are generated
+(marked "synthetic" in the results).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_SYMBOLS = ["SBIN", "TCS", "INFY", "RELIANCE", "HDFCBANK", "ICICIBANK", "NATIONALUM", "HINDCOPPER", "IDEA", "YESBANK"]
+BATCH_SIZES = (10, 100, 2000)
+
+
+# --- Fixtures ---
+def record(symbols, fixture_dir=FIXTURE_DIR):
+    """Download live 6-month history and NSE quotes into fixture_dir"""
+    import yfinance as yf
+    from nse_client import NSEClient
+
+    os.makedirs(os.path.join(fixture_dir, "ohlcv"), exist_ok=True)
+    os.makedirs(os.path.join(fixture_dir, "nse"), exist_ok=True)
+    client = NSEClient()
+    for symbol in symbols:
+        data = yf.download(symbol + ".NS", period="6mo", interval="1d", progress=False)
+        if data.empty:
+            print(f"⚠️ No history for {symbol}")
+            continue
+        if data.columns.nlevels > 1:
+            data.columns = data.columns.get_level_values(0)
+        data[["Open", "High", "Low", "Close", "Volume"]].to_csv(os.path.join(fixture_dir, "ohlcv", f"{symbol}.csv"), index_label="Date")
+        quote = client.quote(symbol)
+        if quote:
+            with open(os.path.join(fixture_dir, "nse", f"{symbol}.json"), "w") as f:
+                json.dump(quote, f)
+        print(f"✅ Recorded {symbol}")
+    with open(os.path.join(fixture_dir, "SOURCE"), "w") as f:
+        f.write(f"recorded {time.strftime('%Y-%m-%d')}\n")
+
+
+def synthesize(symbols, fixture_dir):
+    """Deterministic stand-in fixtures with the same layout as recorded ones"""
+    import pandas as pd
+    from fake_nse import sample_quote
+    from scanner import SyntheticSource
+
+    os.makedirs(os.path.join(fixture_dir, "ohlcv"), exist_ok=True)
+    os.makedirs(os.path.join(fixture_dir, "nse"), exist_ok=True)
+    source = SyntheticSource(bars=125)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=125)
+    for symbol in symbols:
+        close, volume = source.history(symbol)
+        frame = pd.DataFrame({"Open": close * 0.995, "High": close * 1.01, "Low": close * 0.99,
+                              "Close": close, "Volume": volume}, index=dates)
+        frame.to_csv(os.path.join(fixture_dir, "ohlcv", f"{symbol}.csv"), index_label="Date")
+        with open(os.path.join(fixture_dir, "nse", f"{symbol}.json"), "w") as f:
+            json.dump(sample_quote(symbol, last_price=round(close[-1], 2), previous_close=round(close[-2], 2)), f)
+    with open(os.path.join(fixture_dir, "SOURCE"), "w") as f:
+        f.write("synthetic\n")
+
+
+def load_fixtures(fixture_dir):
+    import pandas as pd
+
+    frames, quotes = {}, {}
+    for name in sorted(os.listdir(os.path.join(fixture_dir, "ohlcv"))):
+        symbol = name[:-4]
+        frames[symbol] = pd.read_csv(os.path.join(fixture_dir, "ohlcv", name), index_col="Date", parse_dates=True)
+        quote_path = os.path.join(fixture_dir, "nse", f"{symbol}.json")
+        if os.path.exists(quote_path):
+            with open(quote_path) as f:
+                quotes[symbol] = json.load(f)
+    with open(os.path.join(fixture_dir, "SOURCE")) as f:
+        kind = f.read().split()[0]
+    return frames, quotes, kind
+
+
+class ReplaySource:
+    """scanner-compatible source that cycles the fixture histories over any symbol list"""
+
+    def __init__(self, frames):
+        self.histories = [(f["Close"].to_numpy(dtype=np.float64), f["Volume"].to_numpy(dtype=np.float64))
+                          for f in frames.values()]
+
+    def fetch(self, symbols):
+        return {s: self.histories[i % len(self.histories)] for i, s in enumerate(symbols)}
+
+
+# --- Timing ---
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "runs": repeat,
+    }
+
+
+def run(fixture_dir, repeat=50):
+    frames, quotes, kind = load_fixtures(fixture_dir)
+
+    from fake_nse import FakeNSEServer
+
+    server = FakeNSEServer(quotes).start()
+    os.environ["NSE_BASE_URL"] = server.url
+    os.environ["OHLCV_STORE_DIR"] = tempfile.mkdtemp(prefix="bench-store-")
+    os.environ["SNAPSHOT_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench-snapshot-"), "snapshot.db")
+    os.environ["UPSTREAM_RATE"] = "1000000"
+
+    import app
+    import scanner
+    from flask import render_template
+    from indicators import compute_indicators, latest_values, score_breakdown, frame_to_arrays
+
+    # Replay history for any Yahoo ticker: strip the suffix and serve the fixture
+    def replay_download(ticker, **kwargs):
+        return frames.get(ticker.split(".")[0], frames[next(iter(frames))]).copy()
+
+    app.yf.download = replay_download
+    symbol = next(iter(frames))
+    data = frames[symbol].dropna()
+    close, volume = frame_to_arrays(data)
+    indicators = compute_indicators(close, volume)
+    values = latest_values(indicators)
+    score, details = score_breakdown(values)
+    client = app.app.test_client()
+    stages = {}
+
+    stages["sanitize_lookup"] = timed(lambda: app.symbol_index.resolve(app.sanitize_ticker(f" {symbol.lower()} ")), repeat * 20)
+
+    def cold_fetch():
+        app.data_cache.clear()
+        app.fetch_data_with_retry(symbol + ".NS")
+    stages["fetch_cold_store"] = timed(cold_fetch, repeat)
+    stages["fetch_cached"] = timed(lambda: app.fetch_data_with_retry(symbol + ".NS"), repeat * 20)
+
+    def nse_cold():
+        app.nse_client._quotes.clear()
+        app.fetch_nse_data(symbol)
+    stages["nse_quote_cold"] = timed(nse_cold, repeat)
+    stages["nse_quote_cached"] = timed(lambda: app.fetch_nse_data(symbol), repeat * 20)
+
+    stages["indicators"] = timed(lambda: compute_indicators(close, volume), repeat)
+    stages["scoring"] = timed(lambda: score_breakdown(latest_values(indicators)), repeat * 20)
+    stages["build_trade_plan"] = timed(lambda: app.build_trade_plan("🟢 Strong Buy", score, values["close"],
+                                                                    round(values["close"] * 0.98, 2),
+                                                                    round(values["close"] * 1.03, 2)), repeat * 20)
+
+    analysis = {"ticker": symbol, "Company": symbol, "Sector": "N/A", "Description": symbol,
+                "CurrentPrice": "₹1", "Indicators": details, "Volume": "n/a", "Score": score,
+                "Verdict": "⚖️ Neutral", "Entry": "", "Exit": "", "StopLoss": "",
+                "TradePlan": app.build_trade_plan("⚖️ Neutral", score, 1, 1, 1), "Disclaimer": ""}
+    with app.app.test_request_context("/analyze"):
+        stages["template_render"] = timed(lambda: render_template("index.html", analysis=analysis), repeat)
+
+    app.fetch_data_with_retry(symbol + ".BO")
+    stages["analyze_yahoo_path"] = timed(lambda: client.get(f"/analyze?ticker={symbol}.BO&wait=1"), repeat)
+    stages["analyze_nse_path"] = timed(lambda: client.get(f"/analyze?ticker={symbol}&live=1"), repeat)
+
+    from snapshot import last_closed_session
+    app.snapshot_store.put_many(last_closed_session(), {symbol + ".NS": app.history_analysis(symbol, close, volume)})
+    stages["snapshot_lookup"] = timed(lambda: app.snapshot_store.get(symbol + ".NS", last_closed_session()), repeat * 20)
+    if app.snapshot_store.serve(symbol + ".NS") is not None:
+        stages["analyze_snapshot_path"] = timed(lambda: client.get(f"/analyze?ticker={symbol}"), repeat)
+
+    universe = app.STOCK_LIST
+    source = ReplaySource(frames)
+    batches = {}
+    for size in BATCH_SIZES:
+        # Distinct names even if the universe is short (scan() dedupes symbols)
+        symbols = universe[:size] + [f"BENCH{i}" for i in range(size - len(universe[:size]))]
+        result = timed(lambda: scanner.scan(symbols, source), max(3, repeat // 10))
+        result["symbols_per_sec"] = round(size / (result["median_ms"] / 1000), 1)
+        batches[str(size)] = result
+
+    server.stop()
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "fixtures": kind,
+        "fixture_symbols": len(frames),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "commit": _git_commit(),
+        "stages": stages,
+        "scan": batches,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Stages whose median got slower than baseline * tolerance"""
+    slower = []
+    for group in ("stages", "scan"):
+        for name, stats in results[group].items():
+            before = baseline.get(group, {}).get(name)
+            if before and stats["median_ms"] > before["median_ms"] * tolerance:
+                slower.append((f"{group}.{name}", before["median_ms"], stats["median_ms"]))
+    return slower
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the analyze pipeline on replayed fixtures")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "record"])
+    parser.add_argument("symbols", nargs="*")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--compare", help="earlier results file to check against")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record([s.upper() for s in args.symbols] or DEFAULT_SYMBOLS, args.fixtures)
+        sys.exit(0)
+
+    fixture_dir = args.fixtures
+    if not os.path.exists(os.path.join(fixture_dir, "SOURCE")):
+        fixture_dir = tempfile.mkdtemp(prefix="bench-fixtures-")
+        print(f"No recorded fixtures in {args.fixtures}; using synthetic ones")
+        synthesize(DEFAULT_SYMBOLS, fixture_dir)
+
+    results = run(fixture_dir, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'STAGE':<22}{'MEDIAN ms':>12}{'P95 ms':>12}")
+    for name, stats in results["stages"].items():
+        print(f"{name:<22}{stats['median_ms']:>12.3f}{stats['p95_ms']:>12.3f}")
+    for size, stats in results["scan"].items():
+        print(f"scan {size:<17}{stats['median_ms']:>12.3f}{stats['p95_ms']:>12.3f}  {stats['symbols_per_sec']} symbols/sec")
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for name, before, after in slower:
+            print(f"❌ {name}: {before:.3f} ms -> {after:.3f} ms")
+        sys.exit(1 if slower else 0)
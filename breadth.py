@@ -0,0 +1,340 @@
+"""
+Market breadth over the whole NSE universe.
+
+BreadthEngine keeps one streaming.IndicatorState lane per symbol (a stacked
+symbols x bars replay once at start-up), so a new session is one vectorized
+O(symbols) update instead of ~2,000 analyze() calls. Breadth figures are
+computed from the lane values and kept in memory until the next update:
+- % of symbols closing above EMA20
+- advances / declines / unchanged on the latest session
+- average composite score and breadth per sector (industry from NSE quotes)
+- top / bottom N by composite score
+
+    python breadth.py --source synthetic --top 10
+    python breadth.py --sectors        # fetch industries from NSE into data/sectors.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from scanner import BATCH_SIZE, stack_histories, verdict_label
+from streaming import IndicatorState
+
+SECTORS_PATH = os.environ.get("SECTORS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sectors.json"))
+UNKNOWN_SECTOR = "Unknown"
+MAX_TOP = 50
+
+
+# --- Sector map: {symbol: industry} ---
+def load_sectors(path=SECTORS_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_sectors(sectors, path=SECTORS_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(sectors, f, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def fetch_sectors(symbols, client, batch_size=BATCH_SIZE):
+    """{symbol: industry} from NSE quotes, batch by batch over the client's pool"""
+    sectors = {}
+    for i in range(0, len(symbols), batch_size):
+        for symbol, quote in client.quotes(symbols[i:i + batch_size]).items():
+            industry = ((quote or {}).get("info") or {}).get("industry")
+            if industry:
+                sectors[symbol] = industry
+        print(f"⏳ {min(i + batch_size, len(symbols))}/{len(symbols)} sectors fetched")
+    return sectors
+
+
+# --- Dated daily bars: {symbol: (days, close, volume)}, days as 'YYYY-MM-DD' ---
+def download_bars(symbols, suffix=".NS", batch_size=BATCH_SIZE, limiter=None, **kwargs):
+    """
+    Batched yfinance daily downloads that keep each bar's date (kwargs: period= or start=).
+    limiter: a TokenBucket every batch takes a token from (the app's upstream limiter).
+    """
+    import yfinance as yf
+
+    bars = {}
+    for i in range(0, len(symbols), batch_size):
+        batch = symbols[i:i + batch_size]
+        tickers = [s + suffix for s in batch]
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            data = yf.download(tickers, interval="1d", group_by="ticker", threads=False, progress=False, **kwargs)
+        except Exception as e:
+            print(f"❌ Breadth download failed ({len(tickers)} tickers): {e}")
+            continue
+        if data.empty:
+            continue
+        available = set(data.columns.get_level_values(0))
+        for symbol, ticker in zip(batch, tickers):
+            if ticker not in available:
+                continue
+            frame = data[ticker].dropna(subset=["Close"])
+            if not frame.empty:
+                bars[symbol] = (frame.index.strftime("%Y-%m-%d").to_numpy(),
+                                frame["Close"].to_numpy(dtype=np.float64),
+                                frame["Volume"].fillna(0).to_numpy(dtype=np.float64))
+    return bars
+
+
+class BreadthEngine:
+    """Universe-wide indicator lanes plus breadth aggregates, refreshed one session at a time"""
+
+    def __init__(self, symbols, sectors=None, **params):
+        self.symbols = list(symbols)
+        self.day = None                          # last session folded in ('YYYY-MM-DD')
+        self.state = IndicatorState(lanes=len(self.symbols), **params)
+        self._index = {s: i for i, s in enumerate(self.symbols)}
+        self._close = np.full(len(self.symbols), np.nan)
+        self._prev = np.full(len(self.symbols), np.nan)
+        self._fresh = np.zeros(len(self.symbols), dtype=bool)   # traded in session self.day
+        self._sector_names = [UNKNOWN_SECTOR]
+        self._sectors = np.zeros(len(self.symbols), dtype=np.int64)
+        self._lock = threading.Lock()
+        self._summary = None
+        self.updated = None
+        self.listeners = []                      # callback(engine) after each update, e.g. alerts
+        for symbol, sector in (sectors or {}).items():
+            self._set_sector(symbol, sector)
+
+    @classmethod
+    def from_histories(cls, histories, sectors=None, day=None, **params):
+        """Seed from {symbol: (close, volume)} whose last bar is session `day` for every symbol"""
+        symbols = list(histories)
+        engine = cls(symbols, sectors, **params)
+        if symbols:
+            closes, volumes = stack_histories([histories[s] for s in symbols])
+            engine.state = IndicatorState.from_history(closes, volumes, **params)
+            engine._close = closes[:, -1].copy()
+            engine._prev = closes[:, -2].copy() if closes.shape[1] > 1 else np.full(len(symbols), np.nan)
+            engine._fresh[:] = True
+        engine.day = day
+        engine.updated = time.time()
+        return engine
+
+    @classmethod
+    def from_bars(cls, bars, until, sectors=None, **params):
+        """Seed from dated bars, using only sessions up to and including `until`"""
+        histories, fresh = {}, set()
+        for symbol, (days, close, volume) in bars.items():
+            end = int(np.searchsorted(days, until, side="right"))
+            if end:
+                histories[symbol] = (close[:end], volume[:end])
+                if days[end - 1] == until:
+                    fresh.add(symbol)
+        engine = cls.from_histories(histories, sectors, day=until, **params)
+        engine._fresh = np.array([s in fresh for s in engine.symbols], dtype=bool)
+        return engine
+
+    # --- Updates ---
+    def update(self, bars, day):
+        """
+        Append session `day`: bars is {symbol: (close, volume)}. Symbols without
+        a bar keep their state and count as not traded. Returns False if `day`
+        is not newer than the last session.
+        """
+        if self.day is not None and day <= self.day:
+            return False
+        close = np.full(len(self.symbols), np.nan)
+        volume = np.full(len(self.symbols), np.nan)
+        for symbol, (c, v) in bars.items():
+            i = self._index.get(symbol)
+            if i is not None:
+                close[i], volume[i] = c, v
+        with self._lock:
+            self.state.update((close, volume))
+            traded = ~np.isnan(close)
+            self._prev[traded] = self._close[traded]
+            self._close[traded] = close[traded]
+            self._fresh = traded
+            self.day = day
+            self.updated = time.time()
+            self._summary = None
+        for callback in self.listeners:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"❌ Breadth listener failed: {e}")
+        return True
+
+    def catch_up(self, bars, until):
+        """Fold in every session after self.day up to `until` from dated bars; returns the session count"""
+        days = sorted({d for ds, _, _ in bars.values() for d in ds if (self.day is None or d > self.day) and d <= until})
+        for day in days:
+            session = {}
+            for symbol, (ds, close, volume) in bars.items():
+                i = int(np.searchsorted(ds, day))
+                if i < len(ds) and ds[i] == day:
+                    session[symbol] = (close[i], volume[i])
+            self.update(session, day)
+        return len(days)
+
+    def set_sector(self, symbol, sector):
+        with self._lock:
+            if self._set_sector(symbol, sector):
+                self._summary = None
+
+    def _set_sector(self, symbol, sector):
+        i = self._index.get(symbol)
+        if i is None or not sector or sector == "N/A":
+            return False
+        if sector not in self._sector_names:
+            self._sector_names.append(sector)
+        code = self._sector_names.index(sector)
+        changed = self._sectors[i] != code
+        self._sectors[i] = code
+        return changed
+
+    # --- Reads ---
+    def values_for(self, symbols):
+        """{symbol: {price, score, rsi, ...}} of the latest bar for the given symbols (others skipped)"""
+        with self._lock:
+            values = self.state.values()
+            score = self.state.score()
+            bars = self.state.bars
+        out = {}
+        for symbol in symbols:
+            i = self._index.get(symbol)
+            if i is None or not bars[i]:
+                continue
+            row = {name: float(v[i]) for name, v in values.items() if name not in ("close", "volume_avg")}
+            row["price"] = round(float(values["close"][i]), 2)
+            row["score"] = int(score[i])
+            out[symbol] = row
+        return out
+
+    def summary(self, top=10):
+        """Breadth figures plus the top / bottom `top` symbols (at most MAX_TOP), served from memory"""
+        with self._lock:
+            if self._summary is None:
+                self._summary = self._compute()
+            summary = self._summary
+        top = max(0, min(top, MAX_TOP))
+        return dict(summary, top=summary["top"][:top], bottom=summary["bottom"][:top])
+
+    def _compute(self):
+        start = time.perf_counter()
+        values = self.state.values()
+        score = self.state.score()
+        ready = self.state.bars > 0
+        # Same 2-decimal comparison as the composite score's EMA rule
+        close, ema = np.round(values["close"], 2), np.round(values["ema"], 2)
+        has_ema = ready & ~np.isnan(ema)
+        above = has_ema & (close > ema)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            change = np.where(self._fresh, (self._close - self._prev) / self._prev, np.nan)
+        advances, declines = ready & (change > 0), ready & (change < 0)
+        unchanged = ready & (change == 0)
+
+        sectors = []
+        k = len(self._sector_names)
+        codes = self._sectors[ready]
+        counts = np.bincount(codes, minlength=k)
+        score_sums = np.bincount(codes, weights=score[ready], minlength=k)
+        above_counts = np.bincount(self._sectors[above], minlength=k)
+        ema_counts = np.bincount(self._sectors[has_ema], minlength=k)
+        adv_counts = np.bincount(self._sectors[advances], minlength=k)
+        dec_counts = np.bincount(self._sectors[declines], minlength=k)
+        for code in np.flatnonzero(counts):
+            sectors.append({
+                "sector": self._sector_names[code],
+                "symbols": int(counts[code]),
+                "avg_score": round(float(score_sums[code] / counts[code]), 2),
+                "above_ema20_pct": _pct(above_counts[code], ema_counts[code]),
+                "advances": int(adv_counts[code]),
+                "declines": int(dec_counts[code]),
+            })
+        sectors.sort(key=lambda s: (-s["avg_score"], s["sector"]))
+
+        # Best score first, then the bigger move; ties broken by symbol order
+        lanes = np.flatnonzero(ready)
+        order = lanes[np.lexsort((-np.nan_to_num(change[lanes], nan=-np.inf), -score[lanes]))]
+        worst = lanes[np.lexsort((np.nan_to_num(change[lanes], nan=np.inf), score[lanes]))]
+
+        def rows(indexes):
+            return [{
+                "symbol": self.symbols[i],
+                "sector": self._sector_names[self._sectors[i]],
+                "close": round(float(values["close"][i]), 2),
+                "change_pct": None if np.isnan(change[i]) else round(float(change[i]) * 100, 2),
+                "score": int(score[i]),
+                "verdict": verdict_label(int(score[i])),
+            } for i in indexes[:MAX_TOP]]
+
+        return {
+            "session": self.day,
+            "symbols": int(ready.sum()),
+            "above_ema20": int(above.sum()),
+            "above_ema20_pct": _pct(above.sum(), has_ema.sum()),
+            "advances": int(advances.sum()),
+            "declines": int(declines.sum()),
+            "unchanged": int(unchanged.sum()),
+            "ad_ratio": round(float(advances.sum() / declines.sum()), 2) if declines.any() else None,
+            "avg_score": round(float(score[ready].mean()), 2) if ready.any() else None,
+            "sectors": sectors,
+            "top": rows(order),
+            "bottom": rows(worst),
+            "updated": self.updated,
+            "compute_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+
+def _pct(part, whole):
+    return round(float(part) * 100 / float(whole), 1) if whole else None
+
+
+if __name__ == "__main__":
+    import scanner
+    from snapshot import last_closed_session
+    from symbols import nse_symbol_list
+
+    parser = argparse.ArgumentParser(description="Market breadth across the NSE universe")
+    parser.add_argument("symbols", nargs="*", help="symbols to include (default: all of EQUITY_L.csv)")
+    parser.add_argument("--source", default="yahoo", help="yahoo, synthetic or a directory of CSV files")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--sectors", action="store_true", help="fetch industries from NSE quotes and save them first")
+    args = parser.parse_args()
+
+    symbols = [s.upper() for s in args.symbols] or nse_symbol_list()
+    sectors = load_sectors()
+    if args.sectors:
+        from nse_client import NSEClient
+
+        sectors.update(fetch_sectors(symbols, NSEClient()))
+        save_sectors(sectors)
+        print(f"✅ {len(sectors)} sectors saved to {SECTORS_PATH}")
+
+    start = time.perf_counter()
+    day = last_closed_session()
+    if args.source == "yahoo":
+        engine = BreadthEngine.from_bars(download_bars(symbols, period="6mo"), day, sectors)
+    else:
+        engine = BreadthEngine.from_histories(scanner.make_source(args.source).fetch(symbols), sectors, day)
+    built = time.perf_counter() - start
+    summary = engine.summary(args.top)
+
+    print(f"Session {summary['session']}: {summary['symbols']} symbols, built in {built:.2f}s, "
+          f"summary in {summary['compute_ms']} ms")
+    print(f"Above EMA20: {summary['above_ema20']} ({summary['above_ema20_pct']}%)  "
+          f"A/D: {summary['advances']}/{summary['declines']} ({summary['unchanged']} unchanged)")
+    print(f"\n{'SECTOR':<40}{'SYMBOLS':>8}{'AVG SCORE':>11}{'>EMA20':>9}")
+    for s in summary["sectors"][:args.top]:
+        print(f"{s['sector'][:39]:<40}{s['symbols']:>8}{s['avg_score']:>11}{str(s['above_ema20_pct']):>8}%")
+    for title, rows in (("TOP", summary["top"]), ("BOTTOM", summary["bottom"])):
+        print(f"\n{title:<14}{'CLOSE':>10}{'CHG %':>8}{'SCORE':>7}")
+        for r in rows:
+            print(f"{r['symbol']:<14}{r['close']:>10}{str(r['change_pct']):>8}{r['score']:>7}")
@@ -0,0 +1,318 @@
+"""
+Bounded, thread-safe TTL cache.
+
+TTLCache replaces the old module-level data_cache dict:
+- LRU eviction by entry count and (optionally) by estimated size in bytes
+- a TTL per entry (defaults to the cache-wide TTL)
+- single-flight get_or_load() / get_or_load_async(): concurrent misses for one
+  key run one loader, whether the callers are threads or coroutines
+- hit / miss / eviction / expiry counters via stats()
+- an optional SQLiteBackend shared by every worker process on the machine
+"""
+import asyncio
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """Rough size in bytes: DataFrames and arrays report their buffers"""
+    try:
+        if hasattr(value, "memory_usage"):
+            usage = value.memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+        if hasattr(value, "nbytes"):
+            return int(value.nbytes)
+    except Exception:
+        pass
+    return sys.getsizeof(value)
+
+
+class SQLiteBackend:
+    """
+    Pickled entries in one SQLite file, so all gunicorn workers share downloads.
+    Every purge_every writes, expired rows are dropped and then the rows
+    expiring soonest until the file is within max_entries / max_bytes
+    (pickled size).
+    """
+
+    def __init__(self, path, max_entries=None, max_bytes=None, purge_every=50):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.purge_every = purge_every
+        self._writes = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires REAL, value BLOB)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """(value, expires) or None if missing/expired"""
+        row = self._connect().execute("SELECT expires, value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] <= time.time():
+            return None
+        return pickle.loads(row[1]), row[0]
+
+    def set(self, key, value, expires):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO cache (key, expires, value) VALUES (?, ?, ?)",
+                         (key, expires, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge(self):
+        """Drop expired rows, then the soonest-expiring ones while over max_entries / max_bytes; returns rows dropped"""
+        with self._connect() as conn:
+            dropped = conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),)).rowcount
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache").fetchone()
+            extra_entries = count - self.max_entries if self.max_entries is not None else 0
+            extra_bytes = size - self.max_bytes if self.max_bytes is not None else 0
+            if extra_entries <= 0 and extra_bytes <= 0:
+                return dropped
+            victims = []
+            for key, length in conn.execute("SELECT key, LENGTH(value) FROM cache ORDER BY expires"):
+                if extra_entries <= 0 and extra_bytes <= 0:
+                    break
+                victims.append((key,))
+                extra_entries -= 1
+                extra_bytes -= length
+            conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+        return dropped + len(victims)
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache")
+
+
+class _Flight:
+    """One in-progress load; threads wait on done, coroutines on wait_async()"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.abandoned = False     # the loading coroutine was cancelled: waiters load again
+        self._wakeups = []
+        self._lock = threading.Lock()
+
+    def finish(self):
+        with self._lock:
+            self.done.set()
+            wakeups, self._wakeups = self._wakeups, []
+        for wake in wakeups:
+            wake()
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: waiter.done() or waiter.set_result(None))
+
+        with self._lock:
+            if self.done.is_set():
+                return
+            self._wakeups.append(wake)
+        await waiter
+
+
+class TTLCache:
+    """LRU + TTL cache with single-flight loading and an optional shared backend"""
+
+    def __init__(self, maxsize=256, ttl=300, max_bytes=None, backend=None, sizeof=estimate_size):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.sizeof = sizeof
+        self._data = OrderedDict()  # key -> (expires, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+                       "loads": 0, "shared_hits": 0}
+
+    def get(self, key):
+        """Cached value or None; shared backend hits are copied into this process"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._data.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[2]
+                self._remove(key)
+                self._stats["expirations"] += 1
+
+        if self.backend is not None:
+            try:
+                shared = self.backend.get(key)
+            except Exception as e:
+                print(f"⚠️ Shared cache read failed: {e}")
+                shared = None
+            if shared is not None:
+                value, expires = shared
+                with self._lock:
+                    self._stats["hits"] += 1
+                    self._stats["shared_hits"] += 1
+                    self._store(key, value, expires)
+                return value
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, expires)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, expires)
+            except Exception as e:
+                print(f"⚠️ Shared cache write failed: {e}")
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Cached value, or the result of loader() run once for all concurrent
+        callers of the same key. A None result is returned but not cached.
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            flight, leader = self._join(key)
+            if leader:
+                break
+            flight.done.wait()
+            if not flight.abandoned:
+                return self._result(flight)
+
+        try:
+            flight.value = loader()
+            self._loaded(key, flight.value, ttl)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    async def get_or_load_async(self, key, loader, ttl=None):
+        """get_or_load() for coroutines: loader is a coroutine factory, and the
+        flight is shared with synchronous callers of the same key"""
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            flight, leader = self._join(key)
+            if leader:
+                break
+            await flight.wait_async()
+            if not flight.abandoned:
+                return self._result(flight)
+
+        try:
+            flight.value = await loader()
+            self._loaded(key, flight.value, ttl)
+            return flight.value
+        except asyncio.CancelledError:
+            flight.abandoned = True
+            raise
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def _join(self, key):
+        """(flight, True if the caller must run the loader)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _result(self, flight):
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _loaded(self, key, value, ttl):
+        with self._lock:
+            self._stats["loads"] += 1
+        if value is not None:
+            self.set(key, value, ttl)
+
+    def _land(self, key, flight):
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.finish()
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.time()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._data), bytes=self._bytes, maxsize=self.maxsize,
+                         max_bytes=self.max_bytes, shared=self.backend is not None)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+    # --- Internals (caller holds the lock) ---
+    def _store(self, key, value, expires):
+        self._remove(key)
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        self._data[key] = (expires, size, value)
+        self._bytes += size
+        self._evict()
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.maxsize or
+                              (self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1)):
+            _, (_, size, _) = self._data.popitem(last=False)
+            self._bytes -= size
+            self._stats["evictions"] += 1
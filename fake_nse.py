@@ -0,0 +1,139 @@
+"""
+Local stand-in for nseindia.com.
+
+Serves the two endpoints NSEClient uses: the homepage (sets a session cookie)
+and /api/quote-equity?symbol=..., which answers 401 without that cookie,
+like the real site. Request counts are kept so callers can check how many
+round trips a code path made.
+
+    python fake_nse.py --port 8765      # then NSE_BASE_URL=http://127.0.0.1:8765
+"""
+import argparse
+import json
+import secrets
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+COOKIE_NAME = "nsit"
+
+
+def sample_quote(symbol, last_price=None, previous_close=None, industry="Miscellaneous"):
+    """Quote JSON with the fields analyze() reads; prices are derived from the symbol if not given"""
+    base = 50 + zlib.crc32(symbol.encode()) % 3000
+    last_price = float(last_price if last_price is not None else base)
+    previous_close = float(previous_close if previous_close is not None else round(base * 0.99, 2))
+    return {
+        "info": {"symbol": symbol, "companyName": f"{symbol} Limited", "industry": industry},
+        "priceInfo": {
+            "lastPrice": last_price,
+            "previousClose": previous_close,
+            "intraDayHighLow": {"min": round(last_price * 0.98, 2), "max": round(last_price * 1.02, 2)},
+        },
+    }
+
+
+class FakeNSEServer:
+    """Threaded HTTP server on 127.0.0.1; use as a context manager"""
+
+    def __init__(self, quotes=None, port=0):
+        self.quotes = dict(quotes or {})
+        self.counts = {"home": 0, "quote": 0, "unauthorized": 0}
+        self._cookies = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def expire_cookies(self):
+        """Invalidate every issued cookie, as NSE does after a while"""
+        with self._lock:
+            self._cookies.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=()):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path in ("", "/"):
+                    cookie = secrets.token_hex(8)
+                    with fake._lock:
+                        fake.counts["home"] += 1
+                        fake._cookies.add(cookie)
+                    self._send(200, {}, [("Set-Cookie", f"{COOKIE_NAME}={cookie}; Path=/")])
+                    return
+
+                if parsed.path == "/api/quote-equity":
+                    sent = dict(part.strip().split("=", 1) for part in self.headers.get("Cookie", "").split(";") if "=" in part)
+                    with fake._lock:
+                        authorized = sent.get(COOKIE_NAME) in fake._cookies
+                        fake.counts["quote" if authorized else "unauthorized"] += 1
+                    if not authorized:
+                        self._send(401, {"error": "Unauthorized"})
+                        return
+                    symbol = parse_qs(parsed.query).get("symbol", [""])[0].upper()
+                    quote = fake.quotes.get(symbol)
+                    if quote is None:
+                        self._send(404, {"error": "Not found"})
+                    else:
+                        self._send(200, quote)
+                    return
+
+                self._send(404, {"error": "Not found"})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake NSE quotes for the symbols in EQUITY_L.csv")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    from symbols import load_nse
+
+    quotes = {entry.symbol: sample_quote(entry.symbol) for entry in load_nse()}
+    server = FakeNSEServer(quotes, port=args.port)
+    print(f"Fake NSE serving {len(quotes)} symbols at {server.url}")
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,327 @@
+"""
+Vectorized indicator and scoring engine.
+
+Every indicator is computed along the last axis, so the same call works on a
+single price history (1-D array of bars) or on a stacked tickers x bars
+matrix (2-D). Shorter histories in a matrix are left-padded with NaN.
+Values match finta's TA.SMA / TA.EMA / TA.RSI / TA.MACD / TA.BBANDS, which is
+what analyze() used before; run `python indicators.py` to check parity.
+"""
+import numpy as np
+
+# Default indicator periods and score thresholds (same as analyze())
+DEFAULT_PARAMS = {
+    "sma_fast": 10,
+    "sma_slow": 30,
+    "ema_period": 20,
+    "rsi_period": 14,
+    "macd_fast": 12,
+    "macd_slow": 26,
+    "bb_period": 20,
+    "bb_std": 2.0,
+    "volume_window": 10,
+}
+RSI_BUY = 55
+RSI_SELL = 45
+# Trade plan: stop-loss 2% below and target 3% above the reference price
+STOP_PCT = 0.02
+TARGET_PCT = 0.03
+
+# Bars per closed-form EWM block; keeps decay ** -k far from float64 overflow
+_EWM_BLOCK = 128
+
+
+def _as_float(x):
+    return np.asarray(x, dtype=np.float64)
+
+
+def _rolling_mean(x, period, min_periods=None):
+    """Rolling mean over the last axis, same NaN rules as pandas .rolling().mean()"""
+    min_periods = period if min_periods is None else min_periods
+    valid = ~np.isnan(x)
+    count = np.cumsum(valid, axis=-1)
+    # Centre each row before the cumulative sum to limit cancellation error
+    ref = _row_reference(x, valid)
+    total = np.cumsum(np.where(valid, x - ref, 0.0), axis=-1)
+    count[..., period:] = count[..., period:] - count[..., :-period]
+    total[..., period:] = total[..., period:] - total[..., :-period]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count + ref
+    return np.where(count >= max(min_periods, 1), mean, np.nan)
+
+
+def _rolling_std(x, period):
+    """Rolling sample standard deviation (ddof=1), like pandas .rolling().std()"""
+    valid = ~np.isnan(x)
+    ref = _row_reference(x, valid)
+    centred = np.where(valid, x - ref, 0.0)
+    count = np.cumsum(valid, axis=-1)
+    s1 = np.cumsum(centred, axis=-1)
+    s2 = np.cumsum(centred * centred, axis=-1)
+    for acc in (count, s1, s2):
+        acc[..., period:] = acc[..., period:] - acc[..., :-period]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (s2 - s1 * s1 / count) / (count - 1)
+    var = np.maximum(var, 0.0)
+    return np.where(count >= max(period, 2), np.sqrt(var), np.nan)
+
+
+def _row_reference(x, valid):
+    n = valid.sum(axis=-1, keepdims=True)
+    return np.where(valid, x, 0.0).sum(axis=-1, keepdims=True) / np.maximum(n, 1)
+
+
+def _ewm_mean(x, alpha):
+    """
+    pandas .ewm(alpha=..., adjust=True).mean() over the last axis.
+    Uses the closed form inside fixed-size blocks and carries the weighted
+    numerator/denominator from one block to the next.
+    """
+    decay = 1.0 - alpha
+    valid = ~np.isnan(x)
+    values = np.where(valid, x, 0.0)
+    weights = valid.astype(np.float64)
+    out = np.empty_like(values)
+    num = np.zeros(x.shape[:-1])
+    den = np.zeros(x.shape[:-1])
+    n_bars = x.shape[-1]
+    for start in range(0, n_bars, _EWM_BLOCK):
+        stop = min(start + _EWM_BLOCK, n_bars)
+        k = np.arange(stop - start)
+        grow = decay ** -k
+        shrink = decay ** k
+        block_num = shrink * (decay * num[..., None] + np.cumsum(values[..., start:stop] * grow, axis=-1))
+        block_den = shrink * (decay * den[..., None] + np.cumsum(weights[..., start:stop] * grow, axis=-1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[..., start:stop] = np.where(block_den > 0, block_num / block_den, np.nan)
+        num = block_num[..., -1]
+        den = block_den[..., -1]
+    return out
+
+
+def _ema(x, span):
+    return _ewm_mean(x, 2.0 / (span + 1.0))
+
+
+def _rsi(close, period):
+    delta = np.full_like(close, np.nan)
+    delta[..., 1:] = close[..., 1:] - close[..., :-1]
+    gain = _ewm_mean(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), 1.0 / period)
+    loss = _ewm_mean(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), 1.0 / period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+def compute_indicators(close, volume=None, **params):
+    """
+    Compute every indicator the scorer needs in one pass.
+    close / volume: 1-D (bars) or 2-D (tickers x bars) arrays.
+    Returns a dict of arrays with the same shape as close.
+    """
+    p = dict(DEFAULT_PARAMS, **params)
+    close = _as_float(close)
+
+    sma_fast = _rolling_mean(close, p["sma_fast"])
+    sma_slow = _rolling_mean(close, p["sma_slow"])
+    ema_fast = _ema(close, p["macd_fast"])
+    ema_slow = _ema(close, p["macd_slow"])
+    bb_middle = _rolling_mean(close, p["bb_period"])
+    bb_width = p["bb_std"] * _rolling_std(close, p["bb_period"])
+
+    result = {
+        "close": close,
+        "sma_fast": sma_fast,
+        "sma_slow": sma_slow,
+        "ema": _ema(close, p["ema_period"]),
+        "rsi": _rsi(close, p["rsi_period"]),
+        "macd": ema_fast - ema_slow,
+        "bb_upper": bb_middle + bb_width,
+        "bb_lower": bb_middle - bb_width,
+    }
+    if volume is not None:
+        volume = _as_float(volume)
+        result["volume"] = volume
+        # Same as data['volume'].tail(10).mean(): short histories use what exists
+        result["volume_avg"] = _rolling_mean(volume, p["volume_window"], min_periods=1)
+    return result
+
+
+def latest_values(indicators):
+    """Last bar of every indicator (scalars for 1-D input, per-ticker arrays for 2-D)"""
+    return {name: values[..., -1] for name, values in indicators.items()}
+
+
+def trade_levels(price):
+    """(stop_loss, target) for a reference price, rounded like the trade plan"""
+    return round(price * (1 - STOP_PCT), 2), round(price * (1 + TARGET_PCT), 2)
+
+
+def composite_score(indicators, rsi_buy=RSI_BUY, rsi_sell=RSI_SELL):
+    """
+    Vectorized composite score for every bar, same rules as analyze().
+    Indicator values are rounded to 2 decimals before comparing, like safe_val().
+    """
+    r = {name: np.round(values, 2) for name, values in indicators.items()
+         if name not in ("volume", "volume_avg")}
+    close = r["close"]
+
+    score = np.where(r["sma_fast"] > r["sma_slow"], 1, -1)
+    score += np.where(close > r["ema"], 1, -1)
+    score += (r["rsi"] > rsi_buy).astype(int) - (r["rsi"] < rsi_sell).astype(int)
+    score += (r["macd"] > 0).astype(int) - (r["macd"] <= 0).astype(int)
+    score += (close < r["bb_lower"]).astype(int) - (close > r["bb_upper"]).astype(int)
+    if "volume" in indicators:
+        score += (indicators["volume"] > indicators["volume_avg"]).astype(int)
+    return score
+
+
+def _round_or_none(value):
+    value = float(value)
+    if np.isnan(value):
+        return None
+    return round(value, 2)
+
+
+def score_breakdown(values, rsi_buy=RSI_BUY, rsi_sell=RSI_SELL):
+    """Score plus the human readable indicator lines for one ticker's latest values"""
+    sma10 = _round_or_none(values["sma_fast"])
+    sma30 = _round_or_none(values["sma_slow"])
+    ema20 = _round_or_none(values["ema"])
+    rsi_val = _round_or_none(values["rsi"])
+    macd_val = _round_or_none(values["macd"])
+    close_price = _round_or_none(values["close"])
+    bb_upper = _round_or_none(values["bb_upper"])
+    bb_lower = _round_or_none(values["bb_lower"])
+    volume_check = "volume" in values and bool(values["volume"] > values["volume_avg"])
+
+    score = 0
+    details = []
+
+    if sma10 is not None and sma30 is not None and sma10 > sma30:
+        score += 1
+        details.append("📈 SMA crossover bullish (+1)")
+    else:
+        score -= 1
+        details.append("📉 SMA crossover bearish (-1)")
+
+    if ema20 is not None and close_price is not None and close_price > ema20:
+        score += 1
+        details.append("📈 Price above EMA20 (+1)")
+    else:
+        score -= 1
+        details.append("📉 Price below EMA20 (-1)")
+
+    if rsi_val is not None:
+        if rsi_val > rsi_buy:
+            score += 1
+            details.append(f"💪 RSI {rsi_val} bullish (+1)")
+        elif rsi_val < rsi_sell:
+            score -= 1
+            details.append(f"😓 RSI {rsi_val} bearish (-1)")
+
+    if macd_val is not None and macd_val > 0:
+        score += 1
+        details.append("📈 MACD bullish (+1)")
+    elif macd_val is not None:
+        score -= 1
+        details.append("📉 MACD bearish (-1)")
+
+    if close_price is not None and bb_upper is not None and bb_lower is not None:
+        if close_price > bb_upper:
+            score -= 1
+            details.append("📉 Price above Bollinger upper band (overbought)")
+        elif close_price < bb_lower:
+            score += 1
+            details.append("📈 Price below Bollinger lower band (oversold)")
+
+    if volume_check:
+        score += 1
+        details.append("📊 Volume spike (+1)")
+
+    return score, details
+
+
+def frame_to_arrays(data):
+    """
+    close / volume arrays from a prices.PriceHistory or a yfinance
+    DataFrame. DataFrames may have plain or MultiIndex
+    (Price, Ticker) columns and either 'Close' or 'close' naming.
+    """
+    if not hasattr(data, "columns"):
+        return data.close, data.volume
+
+    def column(name):
+        for key in (name, name.lower()):
+            if key in data.columns:
+                col = data[key]
+                if col.ndim > 1:
+                    col = col.iloc[:, 0]
+                return col.to_numpy(dtype=np.float64)
+        raise KeyError(name)
+
+    return column("Close"), column("Volume")
+
+
+# --- Parity check against finta ---
+def check_parity(data, rtol=1e-9, atol=1e-8):
+    """Compare this engine with finta on one OHLCV frame; returns {name: max abs diff}"""
+    import pandas as pd
+    from finta import TA
+
+    close, volume = frame_to_arrays(data)
+    # finta only reads 'close' here but insists on the full OHLC column set
+    ohlc = pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": volume})
+    ours = compute_indicators(close, volume)
+    bb = TA.BBANDS(ohlc)
+    reference = {
+        "sma_fast": TA.SMA(ohlc, 10),
+        "sma_slow": TA.SMA(ohlc, 30),
+        "ema": TA.EMA(ohlc, 20),
+        "rsi": TA.RSI(ohlc),
+        "macd": TA.MACD(ohlc)["MACD"],
+        "bb_upper": bb["BB_UPPER"],
+        "bb_lower": bb["BB_LOWER"],
+    }
+    diffs = {}
+    for name, expected in reference.items():
+        expected = expected.to_numpy(dtype=np.float64)
+        if not np.allclose(ours[name], expected, rtol=rtol, atol=atol, equal_nan=True):
+            raise AssertionError(f"{name} differs from finta")
+        diff = np.abs(ours[name] - expected)
+        diffs[name] = float(diff[~np.isnan(diff)].max(initial=0.0))
+    return diffs
+
+
+if __name__ == "__main__":
+    import sys
+    import pandas as pd
+
+    if len(sys.argv) > 1:
+        import yfinance as yf
+        frames = {t: yf.download(t, period="6mo", interval="1d", progress=False).dropna() for t in sys.argv[1:]}
+    else:
+        # Offline: random walks of different lengths and price levels
+        rng = np.random.default_rng(7)
+        frames = {}
+        for i, (bars, level) in enumerate([(5, 20.0), (40, 150.0), (125, 2500.0), (2500, 40.0)]):
+            close = level * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+            volume = rng.integers(1_000, 1_000_000, bars)
+            frames[f"RANDOM{i}"] = pd.DataFrame({"Close": close, "Volume": volume})
+
+    for name, frame in frames.items():
+        print(f"{name} → max abs diff vs finta:")
+        for indicator, diff in check_parity(frame).items():
+            print(f"    {indicator:<9} {diff:.2e}")
+
+    # 2-D call must give the same rows as per-ticker calls
+    closes = [frame_to_arrays(f)[0] for f in frames.values()]
+    width = max(len(c) for c in closes)
+    matrix = np.full((len(closes), width), np.nan)
+    for row, c in enumerate(closes):
+        matrix[row, width - len(c):] = c
+    stacked = compute_indicators(matrix)
+    for row, c in enumerate(closes):
+        single = compute_indicators(c)
+        for indicator in single:
+            assert np.allclose(stacked[indicator][row, width - len(c):], single[indicator], equal_nan=True), indicator
+    print("✅ 2-D results match per-ticker results")
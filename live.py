@@ -0,0 +1,216 @@
+"""
+Live price / score fan-out.
+
+One poller per ticker runs on the async_fetch background loop while anyone
+is watching it. It fetches the 1-minute intraday bars once per interval and
+scores the still-forming daily bar incrementally with
+streaming.IndicatorState.preview(). It pushes each change to every
+subscriber queue. Upstream calls scale with distinct tickers, not viewers.
+
+    hub = LiveHub(fetch_intraday, fetch_daily)
+    sub = hub.subscribe("SBIN.NS")      # /live/stream (SSE) reads sub.get()
+    hub.latest("SBIN.NS")               # /live_price shares the same poller
+
+A poller stops once it has had no subscribers and no latest() calls for
+idle_timeout seconds. Listeners added with add_listener() see every
+published event, e.g. the alert engine.
+"""
+import asyncio
+import queue
+import threading
+import time
+
+import numpy as np
+
+from async_fetch import get_loop
+from indicators import frame_to_arrays
+from scanner import verdict_label
+from streaming import IndicatorState
+
+POLL_INTERVAL = 15    # seconds between upstream polls per ticker
+IDLE_TIMEOUT = 60     # keep polling this long after the last viewer leaves
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    """One viewer's event queue; the oldest event is dropped if the viewer falls behind"""
+
+    def __init__(self, hub, feed):
+        self._hub = hub
+        self._feed = feed
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+    def put(self, event):
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Next event, or None after `timeout` seconds (time for a keepalive)"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._hub._unsubscribe(self._feed, self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Feed:
+    def __init__(self, ticker):
+        self.ticker = ticker
+        self.subscribers = set()
+        self.touched = time.monotonic()
+        self.last = None            # last published event
+        self.ready = threading.Event()
+        self.state = None           # IndicatorState over completed daily bars
+        self.day = None             # session date of the forming bar
+        self.bar = None             # (close, volume) of the forming bar
+        self.polls = 0
+
+
+class LiveHub:
+    def __init__(self, fetch_intraday, fetch_daily=None, interval=POLL_INTERVAL, idle_timeout=IDLE_TIMEOUT):
+        """
+        fetch_intraday(ticker) -> today's 1m bars as a DataFrame (Close, Volume)
+        fetch_daily(ticker) -> daily prices.PriceHistory used to seed the score
+        """
+        self.fetch_intraday = fetch_intraday
+        self.fetch_daily = fetch_daily
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._feeds = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def subscribe(self, ticker):
+        with self._lock:
+            feed = self._feed(ticker)
+            sub = Subscription(self, feed)
+            feed.subscribers.add(sub)
+        if feed.last is not None:
+            sub.put(feed.last)  # late joiners start from the current value
+        return sub
+
+    def latest(self, ticker, wait=10):
+        """Most recent event for a ticker, polling it if nobody is yet; None if nothing arrived in `wait` s"""
+        with self._lock:
+            feed = self._feed(ticker)
+            feed.touched = time.monotonic()
+        feed.ready.wait(wait)
+        return feed.last
+
+    def add_listener(self, callback):
+        """callback(event) runs on the async_fetch loop for each published event: it must not block (no I/O)"""
+        self._listeners.append(callback)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "feeds": len(self._feeds),
+                "subscribers": sum(len(f.subscribers) for f in self._feeds.values()),
+                "polls": sum(f.polls for f in self._feeds.values()),
+            }
+
+    # --- Internals ---
+    def _feed(self, ticker):
+        """Existing feed or a new one with its poller started (caller holds the lock)"""
+        feed = self._feeds.get(ticker)
+        if feed is None:
+            feed = self._feeds[ticker] = _Feed(ticker)
+            asyncio.run_coroutine_threadsafe(self._run(feed), get_loop())
+        return feed
+
+    def _unsubscribe(self, feed, sub):
+        with self._lock:
+            feed.subscribers.discard(sub)
+            feed.touched = time.monotonic()
+
+    def _idle(self, feed):
+        with self._lock:
+            if feed.subscribers or time.monotonic() - feed.touched < self.idle_timeout:
+                return False
+            self._feeds.pop(feed.ticker, None)
+            return True
+
+    async def _run(self, feed):
+        try:
+            while not self._idle(feed):
+                try:
+                    event = await asyncio.to_thread(self._poll, feed)
+                except Exception as e:
+                    print(f"❌ Live poll failed for {feed.ticker}: {e}")
+                    event = None
+                feed.ready.set()
+                if event is not None and _changed(feed.last, event):
+                    feed.last = event
+                    with self._lock:
+                        subscribers = list(feed.subscribers)
+                    for sub in subscribers:
+                        sub.put(event)
+                    for callback in self._listeners:
+                        try:
+                            callback(event)
+                        except Exception as e:
+                            print(f"❌ Live listener failed for {feed.ticker}: {e}")
+                await asyncio.sleep(self.interval)
+        finally:
+            with self._lock:
+                if self._feeds.get(feed.ticker) is feed:
+                    del self._feeds[feed.ticker]
+
+    def _poll(self, feed):
+        """One upstream fetch -> event dict (runs in a worker thread)"""
+        feed.polls += 1
+        intraday = self.fetch_intraday(feed.ticker)
+        if intraday is None or intraday.empty:
+            return None
+        close, volume = frame_to_arrays(intraday.dropna())
+        if len(close) == 0:
+            return None
+        day = intraday.index[-1].date()
+        bar = (float(close[-1]), float(np.nansum(volume)))
+
+        if feed.state is None and self.fetch_daily is not None:
+            feed.state = self._seed(feed.ticker, day)
+        elif feed.state is not None and feed.day is not None and day > feed.day and feed.bar is not None:
+            # A new session started: the previous forming bar is final now
+            feed.state.update(feed.bar)
+        feed.day, feed.bar = day, bar
+
+        score = int(feed.state.preview(bar)) if feed.state is not None and feed.state.bars else None
+        return {
+            "ticker": feed.ticker,
+            "current_price": round(bar[0], 2),
+            "score": score,
+            "verdict": verdict_label(score) if score is not None else None,
+            "as_of": intraday.index[-1].isoformat(),
+        }
+
+    def _seed(self, ticker, day):
+        """IndicatorState over the daily bars (a PriceHistory) before `day`; None if there is no history"""
+        daily = self.fetch_daily(ticker)
+        if daily is None or daily.empty:
+            return None
+        close, volume = frame_to_arrays(daily.before(day))
+        if len(close) == 0:
+            return None
+        return IndicatorState.from_history(close, volume)
+
+
+def _changed(previous, event):
+    if previous is None:
+        return True
+    return previous["current_price"] != event["current_price"] or previous["score"] != event["score"]
@@ -0,0 +1,165 @@
+"""
+Lightweight metrics: counters, latency histograms and timing spans,
+rendered in the Prometheus text format for the /metrics endpoint.
+
+    with span("nse_quote"):
+        ...
+
+Every span feeds the stage latency histogram. While a request profile is
+active (?profile=1) the spans are also collected for that request only,
+so they can be returned as a Server-Timing header.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "stockanalyzer_"
+# Seconds; covers cache hits (~µs) up to retry-heavy downloads (~30 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_profile = contextvars.ContextVar("profile", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        metric = Counter(PREFIX + name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(PREFIX + name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """fn() -> [(name, type, help, {labels tuple: value})], read at scrape time (e.g. cache stats)"""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            try:
+                families = fn()
+            except Exception as e:
+                lines.append(f"# collector {fn.__name__} failed: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {PREFIX}{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                for labels, value in samples.items():
+                    lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+stage_seconds = registry.histogram("stage_seconds", "Latency of pipeline stages in seconds")
+upstream_requests = registry.counter("upstream_requests_total", "Upstream calls by upstream and outcome")
+retries = registry.counter("retries_total", "Upstream retries after a failed or empty response")
+nse_fallbacks = registry.counter("nse_fallback_total", "NSE quote failures that fell back to Yahoo")
+http_seconds = registry.histogram("http_request_seconds", "Request latency by endpoint in seconds")
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a block into stage_seconds (and the active request profile, if any)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage, **labels)
+        profile = _profile.get()
+        if profile is not None:
+            name = stage + "".join(f".{v}" for _, v in _label_key(labels))
+            profile.append((name, elapsed))
+
+
+def start_profile():
+    """Collect spans for the current request; returns the token for stop_profile()"""
+    return _profile.set([])
+
+
+def stop_profile(token):
+    spans = _profile.get() or []
+    _profile.reset(token)
+    return spans
+
+
+def server_timing(spans):
+    """Server-Timing header value, e.g. 'nse_quote;dur=12.30, indicators;dur=0.41'"""
+    return ", ".join(f"{name.replace(' ', '_')};dur={seconds * 1000:.2f}" for name, seconds in spans)
@@ -0,0 +1,125 @@
+"""
+Long-lived NSE quote client.
+
+One requests.Session per thread (Session is not thread-safe), each with a
+pooled HTTPAdapter, so quotes reuse TCP/TLS connections. The sessions share
+one cookie jar: the homepage is fetched once to prime NSE's cookies and
+again only when the API answers 401/403, by whichever thread sees it first.
+Quotes are kept for a few seconds, failures (NSE down, unknown symbol) for
+failure_ttl so callers don't wait out the timeout on every request, and
+quotes() fetches many symbols in parallel.
+
+NSE_BASE_URL points the client at another host, e.g. fake_nse.py locally.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import TTLCache
+
+NSE_BASE_URL = os.environ.get("NSE_BASE_URL", "https://www.nseindia.com")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "application/json",
+    "Referer": "https://www.nseindia.com/",
+}
+
+
+class NSEClient:
+    def __init__(self, base_url=NSE_BASE_URL, timeout=10, pool_size=10, quote_ttl=15, workers=8, failure_ttl=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.workers = workers
+        self.pool_size = pool_size
+        self.cookies = requests.cookies.RequestsCookieJar()
+        self._local = threading.local()
+        self._sessions = []
+        self._quotes = TTLCache(maxsize=4096, ttl=quote_ttl)
+        self._failures = TTLCache(maxsize=4096, ttl=failure_ttl)
+        self._prime_lock = threading.Lock()
+        self._generation = 0     # bumped by every prime; 0 = never primed
+        self.stats = {"requests": 0, "primes": 0, "reprimes": 0, "errors": 0, "failures_cached": 0}
+
+    @property
+    def session(self):
+        """This thread's session (created on first use); cookies are shared"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.cookies = self.cookies
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+            with self._prime_lock:
+                self._sessions.append(session)
+        return session
+
+    def prime(self, stale=None):
+        """
+        Fetch the homepage so the shared jar holds NSE's cookies: once, or
+        again if the cookies of generation `stale` were rejected and no other
+        thread has re-primed since. Returns the current generation.
+        """
+        session = self.session
+        with self._prime_lock:
+            if self._generation and self._generation != stale:
+                return self._generation
+            self.stats["primes"] += 1
+            if stale is not None:
+                self.stats["reprimes"] += 1
+            session.get(self.base_url, timeout=self.timeout)
+            self._generation += 1
+            return self._generation
+
+    def _get_quote(self, symbol):
+        url = f"{self.base_url}/api/quote-equity"
+        for attempt in range(2):
+            generation = self.prime()
+            self.stats["requests"] += 1
+            resp = self.session.get(url, params={"symbol": symbol}, timeout=self.timeout)
+            if resp.status_code in (401, 403) and attempt == 0:
+                # Cookies expired: re-prime once (shared with other threads) and retry
+                self.prime(stale=generation)
+                continue
+            if resp.status_code == 200:
+                return resp.json()
+            return None
+        return None
+
+    def quote(self, symbol):
+        """NSE quote JSON for one symbol, or None (remembered for failure_ttl)"""
+        if self._failures.get(symbol):
+            self.stats["failures_cached"] += 1
+            return None
+        try:
+            quote = self._quotes.get_or_load(symbol, lambda: self._get_quote(symbol))
+        except Exception:
+            self.stats["errors"] += 1
+            quote = None
+        if quote is None:
+            self._failures.set(symbol, True)
+        return quote
+
+    def quotes(self, symbols):
+        """{symbol: quote JSON or None} for many symbols over the shared connection pool"""
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        try:
+            self.prime()
+        except Exception:
+            self.stats["errors"] += 1
+            return {symbol: None for symbol in symbols}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(symbols))) as pool:
+            return dict(zip(symbols, pool.map(self.quote, symbols)))
+
+    def close(self):
+        with self._prime_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
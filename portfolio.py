@@ -0,0 +1,246 @@
+"""
+Watchlists and portfolios, analyzed as one batch.
+
+Lists are stored locally in SQLite (one row per user and list name,
+holdings as JSON), so two users may each keep a list called "core". A
+watchlist is a list of symbols; a portfolio adds a quantity and optional
+entry price per holding. analyze_lists() scores the union of every
+requested list once: symbols shared between lists are deduplicated, the
+histories are stacked into one tickers x bars matrix and the indicator
+engine runs a single vectorized pass (see scanner.score_histories). Each
+list then gets its rows plus aggregates:
+
+- weighted_score: position-value weighted (portfolio) or mean (watchlist)
+- risk_at_stop:   loss from today's value if every holding hit its stop-loss
+                  (the trade-plan stop of its entry price, or of today's
+                  price when no entry was given; 0 once a stop is breached)
+- unrealized_pnl: against the entry prices that were given
+
+    store = PortfolioStore()
+    store.save("core", [{"symbol": "SBIN", "quantity": 100, "entry": 790}], kind="portfolio")
+    python portfolio.py --source synthetic core       # offline
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from indicators import compute_indicators, composite_score, latest_values, trade_levels
+from scanner import stack_histories, verdict_label
+
+PORTFOLIOS_PATH = os.environ.get("PORTFOLIOS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "portfolios.db"))
+KINDS = ("watchlist", "portfolio")
+RESERVED_NAMES = {"analyze"}    # /portfolios/analyze is a route, not a list
+MAX_SYMBOLS = 500
+
+
+def normalize_holdings(items):
+    """[{symbol, quantity, entry}] from symbol strings or dicts; duplicates are merged"""
+    holdings = {}
+    for item in items or ():
+        if isinstance(item, str):
+            item = {"symbol": item}
+        if not isinstance(item, dict):
+            raise ValueError(f"Holding must be a symbol or an object, got {item!r}")
+        symbol = str(item.get("symbol") or "").strip().upper().replace(" ", "")
+        if not symbol:
+            raise ValueError("Holding without a symbol")
+        quantity = item.get("quantity")
+        entry = item.get("entry")
+        quantity = None if quantity in (None, "") else float(quantity)
+        entry = None if entry in (None, "") else float(entry)
+        if quantity is not None and quantity < 0:
+            raise ValueError(f"Negative quantity for {symbol}")
+        held = holdings.get(symbol)
+        if held is None:
+            holdings[symbol] = {"symbol": symbol, "quantity": quantity, "entry": entry}
+        elif quantity is not None:
+            # Two lots of one symbol: add the quantities, average the entries
+            total = (held["quantity"] or 0) + quantity
+            if held["entry"] is not None and entry is not None and total:
+                held["entry"] = round(((held["quantity"] or 0) * held["entry"] + quantity * entry) / total, 4)
+            held["quantity"] = total
+    if len(holdings) > MAX_SYMBOLS:
+        raise ValueError(f"At most {MAX_SYMBOLS} symbols per list")
+    return list(holdings.values())
+
+
+class PortfolioStore:
+    """Named watchlists / portfolios per user as JSON rows in one SQLite table (user '' = no user)"""
+
+    def __init__(self, path=PORTFOLIOS_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS user_lists (user TEXT, name TEXT, kind TEXT, updated REAL, "
+                         "holdings TEXT, PRIMARY KEY (user, name))")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, name, holdings, kind="watchlist", user=None):
+        """Create or replace a list; returns it"""
+        name = str(name or "").strip()
+        if not name:
+            raise ValueError("A list needs a name")
+        if name.lower() in RESERVED_NAMES:
+            raise ValueError(f"{name!r} is a reserved name")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind {kind!r}; expected one of {', '.join(KINDS)}")
+        holdings = normalize_holdings(holdings)
+        if kind == "portfolio" and any(h["quantity"] is None for h in holdings):
+            raise ValueError("Every portfolio holding needs a quantity")
+        entry = {"name": name, "kind": kind, "user": user, "updated": time.time(), "holdings": holdings}
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO user_lists (user, name, kind, updated, holdings) VALUES (?, ?, ?, ?, ?)",
+                         (user or "", name, kind, entry["updated"], json.dumps(holdings)))
+        return entry
+
+    def get(self, name, user=None):
+        row = self._connect().execute("SELECT name, kind, user, updated, holdings FROM user_lists "
+                                      "WHERE user = ? AND name = ?", (user or "", name)).fetchone()
+        return _entry(row) if row else None
+
+    def lists(self, user=None):
+        """Every list (without holdings) for a user, or all users"""
+        query = "SELECT name, kind, user, updated, holdings FROM user_lists"
+        rows = self._connect().execute(query + (" WHERE user = ? ORDER BY name" if user else " ORDER BY user, name"),
+                                       (user,) if user else ()).fetchall()
+        summaries = []
+        for row in rows:
+            entry = _entry(row)
+            entry["symbols"] = len(entry.pop("holdings"))
+            summaries.append(entry)
+        return summaries
+
+    def delete(self, name, user=None):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM user_lists WHERE user = ? AND name = ?", (user or "", name)).rowcount > 0
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM user_lists").fetchone()[0]
+
+
+def _entry(row):
+    name, kind, user, updated, holdings = row
+    return {"name": name, "kind": kind, "user": user or None, "updated": updated, "holdings": json.loads(holdings)}
+
+
+# --- Batch analysis ---
+def score_rows(histories):
+    """{key: row} for a {key: (close, volume)} dict, scored in one stacked indicator pass"""
+    if not histories:
+        return {}
+    keys = list(histories)
+    closes, volumes = stack_histories([histories[k] for k in keys])
+    indicators = compute_indicators(closes, volumes)
+    scores = composite_score(indicators)[:, -1]
+    latest = latest_values(indicators)
+
+    rows = {}
+    for i, key in enumerate(keys):
+        price = round(float(latest["close"][i]), 2)
+        score = int(scores[i])
+        rsi = float(latest["rsi"][i])
+        stop_loss, target = trade_levels(price)
+        rows[key] = {
+            "price": price,
+            "score": score,
+            "verdict": verdict_label(score),
+            "rsi": None if rsi != rsi else round(rsi, 2),
+            "stop_loss": stop_loss,
+            "target": target,
+            "bars": int(len(histories[key][0])),
+        }
+    return rows
+
+
+def summarize(entry, rows):
+    """Holding rows plus aggregates for one list; rows is {symbol: score_rows() row}"""
+    holdings, missing = [], []
+    value_total = risk_total = pnl_total = weighted = 0.0
+    scores = []
+    verdicts = {}
+    for holding in entry["holdings"]:
+        row = rows.get(holding["symbol"])
+        if row is None:
+            missing.append(holding["symbol"])
+            continue
+        result = {**holding, **row}
+        if holding["entry"] is not None:
+            # The plan was made at the entry: its stop and target, not ones trailing today's price
+            result["stop_loss"], result["target"] = trade_levels(holding["entry"])
+        scores.append(row["score"])
+        verdicts[row["verdict"]] = verdicts.get(row["verdict"], 0) + 1
+        quantity = holding["quantity"]
+        if quantity is not None:
+            value = quantity * row["price"]
+            result["value"] = round(value, 2)
+            result["risk_at_stop"] = round(quantity * max(row["price"] - result["stop_loss"], 0.0), 2)
+            value_total += value
+            risk_total += result["risk_at_stop"]
+            weighted += value * row["score"]
+            if holding["entry"] is not None:
+                result["unrealized_pnl"] = round(quantity * (row["price"] - holding["entry"]), 2)
+                pnl_total += result["unrealized_pnl"]
+        holdings.append(result)
+
+    summary = {
+        "symbols": len(entry["holdings"]),
+        "analyzed": len(holdings),
+        "missing": missing,
+        "verdicts": verdicts,
+        "average_score": round(float(np.mean(scores)), 2) if scores else None,
+    }
+    if entry["kind"] == "portfolio":
+        summary["market_value"] = round(value_total, 2)
+        summary["weighted_score"] = round(weighted / value_total, 2) if value_total else None
+        summary["risk_at_stop"] = round(risk_total, 2)
+        summary["risk_pct"] = round(100 * risk_total / value_total, 2) if value_total else None
+        summary["unrealized_pnl"] = round(pnl_total, 2)
+    else:
+        summary["weighted_score"] = summary["average_score"]
+    return {"name": entry["name"], "kind": entry["kind"], "summary": summary, "holdings": holdings}
+
+
+def analyze_lists(entries, histories):
+    """
+    entries: list dicts; histories: {symbol: (close, volume)} covering their
+    union (symbols without history are reported as missing). Every symbol is
+    scored once however many lists hold it.
+    """
+    wanted = dict.fromkeys(h["symbol"] for entry in entries for h in entry["holdings"])
+    rows = score_rows({s: histories[s] for s in wanted if s in histories})
+    return [summarize(entry, rows) for entry in entries]
+
+
+if __name__ == "__main__":
+    from scanner import make_source
+
+    parser = argparse.ArgumentParser(description="Analyze stored watchlists / portfolios")
+    parser.add_argument("names", nargs="*", help="lists to analyze (default: all)")
+    parser.add_argument("--user", help="owner of the lists (default: lists saved without a user)")
+    parser.add_argument("--source", default="yahoo", help="yahoo, synthetic or a CSV directory")
+    args = parser.parse_args()
+
+    store = PortfolioStore()
+    entries = [store.get(name, args.user) for name in args.names or [e["name"] for e in store.lists() if e["user"] == args.user]]
+    entries = [e for e in entries if e]
+    if not entries:
+        raise SystemExit("No lists stored")
+    symbols = list(dict.fromkeys(h["symbol"] for e in entries for h in e["holdings"]))
+    start = time.perf_counter()
+    results = analyze_lists(entries, make_source(args.source).fetch(symbols))
+    print(f"✅ {len(entries)} lists, {len(symbols)} unique symbols in {time.perf_counter() - start:.2f}s")
+    for result in results:
+        print(json.dumps({"name": result["name"], **result["summary"]}, ensure_ascii=False))
@@ -0,0 +1,110 @@
+"""
+Compact per-symbol OHLCV container.
+
+PriceHistory replaces cached yfinance DataFrames: one fixed-dtype NumPy
+array per column and no index object or per-column overhead.
+- days: int32 days since 1970-01-01
+- open/high/low/close: float64, exactly the values Yahoo returned (float32
+  cannot hold a paisa above ~65,000, e.g. MRF, and would shift indicators)
+- volume: uint32, or int64 when a day's volume does not fit
+
+Bars with a missing close are dropped once, at construction. Slicing
+(tail(), since(), before()) returns views, and indicators.frame_to_arrays()
+hands the close column to the engine without a copy. A 6-month history
+takes ~5 KB; the whole ~2,200-symbol universe fits in about 11 MB per worker.
+"""
+import numpy as np
+
+PRICE_DTYPE = np.float64
+DAY_DTYPE = np.int32
+_UINT32_MAX = np.iinfo(np.uint32).max
+_FIELDS = ("days", "open", "high", "low", "close", "volume")
+
+
+def _volume_array(volume):
+    volume = np.nan_to_num(np.asarray(volume, dtype=np.float64), nan=0.0)
+    dtype = np.uint32 if len(volume) == 0 or (volume.min() >= 0 and volume.max() <= _UINT32_MAX) else np.int64
+    return np.round(volume).astype(dtype)
+
+
+class PriceHistory:
+    """Daily OHLCV bars for one symbol as parallel fixed-dtype arrays"""
+
+    __slots__ = _FIELDS
+
+    def __init__(self, days=(), open=(), high=(), low=(), close=(), volume=()):
+        self.days = np.asarray(days, dtype=DAY_DTYPE)
+        self.open = np.asarray(open, dtype=PRICE_DTYPE)
+        self.high = np.asarray(high, dtype=PRICE_DTYPE)
+        self.low = np.asarray(low, dtype=PRICE_DTYPE)
+        self.close = np.asarray(close, dtype=PRICE_DTYPE)
+        self.volume = volume if isinstance(volume, np.ndarray) and volume.dtype in (np.uint32, np.int64) else _volume_array(volume)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """From store.py columns ({date (epoch s), open, high, low, close, volume}); NaN closes dropped"""
+        close = np.asarray(columns["close"], dtype=np.float64)
+        keep = ~np.isnan(close)
+        days = np.asarray(columns["date"], dtype=np.float64)[keep] // 86400
+        return cls(days, *(np.asarray(columns[name], dtype=np.float64)[keep] for name in ("open", "high", "low")),
+                   close[keep], np.asarray(columns["volume"], dtype=np.float64)[keep])
+
+    @classmethod
+    def from_frame(cls, data):
+        """From a yfinance DataFrame (plain or MultiIndex columns)"""
+        from store import frame_columns
+
+        if data is None or data.empty:
+            return cls()
+        return cls.from_columns(frame_columns(data))
+
+    def _view(self, index):
+        view = PriceHistory.__new__(PriceHistory)
+        for name in _FIELDS:
+            setattr(view, name, getattr(self, name)[index])
+        return view
+
+    def tail(self, bars):
+        """Last `bars` bars as a view"""
+        return self._view(slice(max(len(self) - bars, 0), None))
+
+    def since(self, day):
+        """Bars on or after a day ordinal (or datetime64 / date) as a view"""
+        if not isinstance(day, (int, np.integer)):
+            day = int(np.datetime64(day, "D").astype(np.int64))
+        return self._view(slice(int(np.searchsorted(self.days, day, side="left")), None))
+
+    def before(self, day):
+        """Bars strictly before a day ordinal (or datetime64 / date) as a view"""
+        if not isinstance(day, (int, np.integer)):
+            day = int(np.datetime64(day, "D").astype(np.int64))
+        return self._view(slice(0, int(np.searchsorted(self.days, day, side="left"))))
+
+    def dates(self):
+        return self.days.astype("datetime64[D]")
+
+    @property
+    def last_date(self):
+        """'YYYY-MM-DD' of the newest bar, or None"""
+        return str(self.days[-1:].astype("datetime64[D]")[0]) if len(self) else None
+
+    @property
+    def empty(self):
+        return len(self.days) == 0
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in _FIELDS)
+
+    def __len__(self):
+        return len(self.days)
+
+    def __repr__(self):
+        return f"PriceHistory({len(self)} bars, last {self.last_date}, {self.nbytes} bytes)"
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in _FIELDS)
+
+    def __setstate__(self, state):
+        for name, value in zip(_FIELDS, state):
+            setattr(self, name, value)
@@ -0,0 +1,257 @@
+"""
+Bulk universe scanner.
+
+Scores many symbols at once with the same rules as analyze(): history is
+fetched in batched multi-ticker downloads on a bounded worker pool, each
+batch is stacked into a tickers x bars matrix and scored in one vectorized
+pass by the indicator engine.
+
+CLI:
+    python scanner.py --min-score 3 --top 25
+    python scanner.py --source synthetic --workers 8 SBIN TCS INFY
+"""
+import argparse
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from indicators import compute_indicators, composite_score, latest_values, trade_levels
+
+BATCH_SIZE = 100
+MAX_WORKERS = 4
+
+
+# --- Verdict labels (same thresholds as analyze()) ---
+def verdict_label(score):
+    if score >= 3:
+        return "Strong Buy"
+    if score <= -3:
+        return "Strong Sell"
+    return "Neutral"
+
+
+# --- Data sources: fetch(symbols) -> {symbol: (close, volume)} ---
+class YahooSource:
+    """
+    Batched multi-ticker yfinance downloads (symbols get the .NS suffix).
+    With a limiter (an async_fetch.TokenBucket, e.g. the app's upstream one)
+    every attempt takes a token from it; without one, retries back off with
+    their own sleep.
+    """
+
+    def __init__(self, period="6mo", interval="1d", suffix=".NS", retries=2, wait=3, limiter=None):
+        self.period = period
+        self.interval = interval
+        self.suffix = suffix
+        self.retries = retries
+        self.wait = wait
+        self.limiter = limiter
+
+    def fetch(self, symbols):
+        import yfinance as yf
+
+        tickers = [s + self.suffix for s in symbols]
+        for attempt in range(self.retries):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                data = yf.download(tickers, period=self.period, interval=self.interval,
+                                   group_by="ticker", threads=False, progress=False)
+                if not data.empty:
+                    return split_download(data, symbols, tickers)
+            except Exception as e:
+                print(f"❌ Batch download failed ({len(tickers)} tickers): {e}")
+            if attempt < self.retries - 1 and self.limiter is None:
+                time.sleep(self.wait + 2 ** attempt)
+        return {}
+
+
+def split_download(data, symbols, tickers):
+    """Per-symbol (close, volume) arrays from a group_by='ticker' yfinance frame"""
+    result = {}
+    available = set(data.columns.get_level_values(0))
+    for symbol, ticker in zip(symbols, tickers):
+        if ticker not in available:
+            continue
+        frame = data[ticker].dropna()
+        if frame.empty:
+            continue
+        result[symbol] = (frame["Close"].to_numpy(dtype=np.float64),
+                          frame["Volume"].to_numpy(dtype=np.float64))
+    return result
+
+
+class SyntheticSource:
+    """
+    Offline stand-in: a deterministic random walk per symbol.
+    The same symbol always gets the same history, so runs are repeatable.
+    """
+
+    def __init__(self, bars=125, seed=0):
+        self.bars = bars
+        self.seed = seed
+
+    def history(self, symbol):
+        rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+        level = rng.uniform(20, 3000)
+        close = level * np.exp(np.cumsum(rng.normal(0.0003, 0.02, self.bars)))
+        volume = rng.integers(10_000, 5_000_000, self.bars).astype(np.float64)
+        return close, volume
+
+    def fetch(self, symbols):
+        return {s: self.history(s) for s in symbols}
+
+
+class CsvDirSource:
+    """Offline source reading <SYMBOL>.csv files (Date,Open,High,Low,Close,Volume) from a directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, symbols):
+        import os
+
+        result = {}
+        for symbol in symbols:
+            path = os.path.join(self.directory, f"{symbol}.csv")
+            if not os.path.exists(path):
+                continue
+            data = np.genfromtxt(path, delimiter=",", names=True, usecols=("Close", "Volume"))
+            data = data[~np.isnan(data["Close"])]
+            if len(data):
+                result[symbol] = (data["Close"].astype(np.float64), data["Volume"].astype(np.float64))
+        return result
+
+
+def make_source(name, limiter=None):
+    """'yahoo', 'synthetic' or a directory of CSV files (limiter: shared rate limit for Yahoo)"""
+    if name in (None, "", "yahoo"):
+        return YahooSource(limiter=limiter)
+    if name == "synthetic":
+        return SyntheticSource()
+    return CsvDirSource(name)
+
+
+# --- Scoring ---
+def stack_histories(histories):
+    """Left-pad (close, volume) pairs with NaN into two tickers x bars matrices"""
+    width = max(len(close) for close, _ in histories)
+    closes = np.full((len(histories), width), np.nan)
+    volumes = np.full((len(histories), width), np.nan)
+    for row, (close, volume) in enumerate(histories):
+        closes[row, width - len(close):] = close
+        volumes[row, width - len(volume):] = volume
+    return closes, volumes
+
+
+def score_histories(histories):
+    """Score a {symbol: (close, volume)} dict in one vectorized pass; returns table rows"""
+    if not histories:
+        return []
+    symbols = list(histories)
+    closes, volumes = stack_histories([histories[s] for s in symbols])
+    indicators = compute_indicators(closes, volumes)
+    scores = composite_score(indicators)[:, -1]
+    latest = latest_values(indicators)
+
+    rows = []
+    for i, symbol in enumerate(symbols):
+        close = round(float(latest["close"][i]), 2)
+        score = int(scores[i])
+        stop_loss, target = trade_levels(close)
+        rows.append({
+            "symbol": symbol,
+            "close": close,
+            "score": score,
+            "verdict": verdict_label(score),
+            "rsi": None if np.isnan(latest["rsi"][i]) else round(float(latest["rsi"][i]), 2),
+            "stop_loss": stop_loss,
+            "target": target,
+            "bars": len(histories[symbol][0]),
+        })
+    return rows
+
+
+def scan(symbols, source=None, batch_size=BATCH_SIZE, workers=MAX_WORKERS):
+    """
+    Fetch and score every symbol. Returns the ranked rows (best score first)
+    plus counts and throughput in symbols per second.
+    """
+    source = source or YahooSource()
+    symbols = list(dict.fromkeys(symbols))
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+    def run(batch):
+        try:
+            return score_histories(source.fetch(batch))
+        except Exception as e:
+            print(f"❌ Scan batch failed: {e}")
+            return []
+
+    start = time.perf_counter()
+    rows = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for batch_rows in pool.map(run, batches):
+            rows.extend(batch_rows)
+    elapsed = time.perf_counter() - start
+
+    rows.sort(key=lambda r: (-r["score"], r["symbol"]))
+    return {
+        "rows": rows,
+        "requested": len(symbols),
+        "scored": len(rows),
+        "failed": len(symbols) - len(rows),
+        "seconds": round(elapsed, 3),
+        "symbols_per_sec": round(len(symbols) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def filter_rows(rows, min_score=None, max_score=None, verdict=None):
+    if min_score is not None:
+        rows = [r for r in rows if r["score"] >= min_score]
+    if max_score is not None:
+        rows = [r for r in rows if r["score"] <= max_score]
+    if verdict:
+        rows = [r for r in rows if r["verdict"].lower() == verdict.lower()]
+    return rows
+
+
+def paginate(rows, page=1, per_page=50):
+    page = max(1, page)
+    per_page = max(1, per_page)
+    start = (page - 1) * per_page
+    return {
+        "page": page,
+        "per_page": per_page,
+        "total": len(rows),
+        "pages": (len(rows) + per_page - 1) // per_page,
+        "rows": rows[start:start + per_page],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score NSE symbols in bulk")
+    parser.add_argument("symbols", nargs="*", help="symbols to scan (default: all of EQUITY_L.csv)")
+    parser.add_argument("--source", default="yahoo", help="yahoo, synthetic or a directory of CSV files")
+    parser.add_argument("--min-score", type=int)
+    parser.add_argument("--max-score", type=int)
+    parser.add_argument("--verdict")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    from symbols import nse_symbol_list
+
+    symbols = [s.upper() for s in args.symbols] or nse_symbol_list()
+    result = scan(symbols, make_source(args.source), args.batch_size, args.workers)
+    rows = filter_rows(result["rows"], args.min_score, args.max_score, args.verdict)
+
+    print(f"{'SYMBOL':<14}{'CLOSE':>10}{'SCORE':>7}  VERDICT")
+    for r in rows[:args.top]:
+        print(f"{r['symbol']:<14}{r['close']:>10}{r['score']:>7}  {r['verdict']}")
+    print("-" * 50)
+    print(f"Scored {result['scored']}/{result['requested']} symbols in {result['seconds']}s "
+          f"({result['symbols_per_sec']} symbols/sec), {len(rows)} matched filters")
@@ -0,0 +1,183 @@
+"""
+End-of-day analysis snapshot.
+
+After the NSE close a batch job builds the full analyze() result for every
+symbol in EQUITY_L.csv and stores it in SQLite, keyed by ticker and trading
+session. Until the next session opens, analyze() answers from this table
+with one primary-key lookup instead of downloading history and recomputing
+indicators. Served results carry a "Snapshot" marker (session, build time,
+stale flag). If a live fetch fails, the latest snapshot is served as stale
+instead of an error.
+
+Run it from cron once the session has closed, e.g. 16:15 IST on weekdays:
+
+    15 16 * * 1-5  cd /app && python snapshot.py
+    python snapshot.py --source synthetic SBIN TCS     # offline
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "snapshot.db"))
+IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+MARKET_OPEN = datetime.time(9, 15)
+MARKET_CLOSE = datetime.time(15, 30)
+BATCH_SIZE = 100
+
+
+# --- Trading sessions (weekdays; exchange holidays are not modelled) ---
+def market_open(now=None):
+    now = datetime.datetime.fromtimestamp(now or time.time(), IST)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def last_closed_session(now=None):
+    """'YYYY-MM-DD' of the most recent weekday whose 15:30 IST close has passed"""
+    now = datetime.datetime.fromtimestamp(now or time.time(), IST)
+    day = now.date()
+    if now.time() < MARKET_CLOSE:
+        day -= datetime.timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= datetime.timedelta(days=1)
+    return day.isoformat()
+
+
+class SnapshotStore:
+    """analysis dicts as JSON in one SQLite table, primary key (ticker, session)"""
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS snapshots (ticker TEXT, session TEXT, created REAL, "
+                         "analysis TEXT, PRIMARY KEY (ticker, session)) WITHOUT ROWID")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put_many(self, session, analyses, created=None):
+        """analyses: {ticker: analysis dict}"""
+        created = created or time.time()
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO snapshots (ticker, session, created, analysis) VALUES (?, ?, ?, ?)",
+                             [(ticker, session, created, json.dumps(a, ensure_ascii=False)) for ticker, a in analyses.items()])
+
+    def get(self, ticker, session=None):
+        """(session, created, analysis) for that session, or the latest one; None if absent"""
+        if session is None:
+            row = self._connect().execute("SELECT session, created, analysis FROM snapshots WHERE ticker = ? "
+                                          "ORDER BY session DESC LIMIT 1", (ticker,)).fetchone()
+        else:
+            row = self._connect().execute("SELECT session, created, analysis FROM snapshots WHERE ticker = ? AND session = ?",
+                                          (ticker, session)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def serve(self, ticker, now=None):
+        """The snapshot for the last closed session while the market is shut, else None"""
+        if market_open(now):
+            return None
+        found = self.get(ticker, last_closed_session(now))
+        return None if found is None else _marked(found, stale=False)
+
+    def latest(self, ticker):
+        """Most recent snapshot of any session, marked stale (fallback when live data fails)"""
+        found = self.get(ticker)
+        return None if found is None else _marked(found, stale=True)
+
+    def prune(self, keep_sessions=5):
+        """Drop all but the newest keep_sessions sessions"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM snapshots WHERE session NOT IN "
+                         "(SELECT DISTINCT session FROM snapshots ORDER BY session DESC LIMIT ?)", (keep_sessions,))
+
+    def sessions(self):
+        return [row[0] for row in self._connect().execute("SELECT DISTINCT session FROM snapshots ORDER BY session DESC")]
+
+
+def _marked(found, stale):
+    session, created, analysis = found
+    analysis["Snapshot"] = {
+        "session": session,
+        "built_at": datetime.datetime.fromtimestamp(created, IST).strftime("%Y-%m-%d %H:%M IST"),
+        "stale": stale,
+    }
+    return analysis
+
+
+# --- Batch job ---
+def build(symbols, source_name="yahoo", use_nse=True, store=None, session=None):
+    """
+    Compute analyze()'s result for every symbol and store it under `session`.
+    Quotes come from the NSE client like analyze(); symbols without one use
+    batched history downloads and the indicator engine.
+    """
+    import scanner
+    from analysis import history_analysis, nse_analysis
+    from nse_client import NSEClient
+
+    store = store or SnapshotStore()
+    nse_client = NSEClient() if use_nse else None
+    session = session or last_closed_session()
+    source = scanner.make_source(source_name)
+    start = time.perf_counter()
+    built, failed = 0, []
+
+    for i in range(0, len(symbols), BATCH_SIZE):
+        batch = symbols[i:i + BATCH_SIZE]
+        analyses = {}
+        quotes = nse_client.quotes(batch) if use_nse else {}
+        missing = [s for s in batch if not quotes.get(s)]
+        histories = source.fetch(missing) if missing else {}
+        for symbol in batch:
+            try:
+                if quotes.get(symbol):
+                    analyses[symbol + ".NS"] = nse_analysis(symbol, quotes[symbol])
+                elif symbol in histories:
+                    close, volume = histories[symbol]
+                    analyses[symbol + ".NS"] = history_analysis(symbol, close, volume)
+                else:
+                    failed.append(symbol)
+            except Exception as e:
+                print(f"❌ Snapshot failed for {symbol}: {e}")
+                failed.append(symbol)
+        store.put_many(session, analyses)
+        built += len(analyses)
+        print(f"⏳ {min(i + BATCH_SIZE, len(symbols))}/{len(symbols)} symbols processed")
+
+    if nse_client is not None:
+        nse_client.close()
+    return {"session": session, "built": built, "failed": failed, "seconds": round(time.perf_counter() - start, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the end-of-day analysis snapshot")
+    parser.add_argument("symbols", nargs="*", help="symbols to snapshot (default: all of EQUITY_L.csv)")
+    parser.add_argument("--source", default="yahoo", help="history source: yahoo, synthetic or a CSV directory")
+    parser.add_argument("--no-nse", action="store_true", help="skip NSE quotes and score every symbol from history")
+    parser.add_argument("--session", help="session date to file results under (default: last closed session)")
+    parser.add_argument("--keep", type=int, default=5, help="sessions to keep")
+    args = parser.parse_args()
+
+    if market_open() and not args.session:
+        # Intraday prices would be filed under the previous session
+        raise SystemExit("❌ The market is open; run after the close or pass --session")
+
+    from symbols import nse_symbol_list
+
+    symbols = [s.upper() for s in args.symbols] or nse_symbol_list()
+    store = SnapshotStore()
+    result = build(symbols, args.source, not args.no_nse, store, args.session)
+    store.prune(args.keep)
+    print(f"✅ Snapshot {result['session']}: {result['built']} symbols in {result['seconds']}s, {len(result['failed'])} failed")
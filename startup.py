@@ -0,0 +1,130 @@
+"""
+Startup timing and lazy imports.
+
+app.py imports this module first. Heavy modules that are only needed inside
+request handlers (yfinance pulls in pandas, plus the analytics modules)
+are bound to LazyModule stand-ins and imported on first attribute access,
+so a cold instance can answer its first request sooner. report() lists
+the start-up phases, the total import time of app.py, and what each lazy
+import cost when it finally ran. It is served at /startup and exported to
+/metrics.
+
+Per-module import cost for CI tracking (wraps `python -X importtime`):
+
+    python startup.py                   # table by top-level package
+    python startup.py --json > startup.json
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STARTED = time.perf_counter()
+_phases = []      # (phase, seconds) recorded while app.py loads
+_lazy = {}        # module -> seconds its deferred import took
+_ready = None     # seconds from this module's import to ready()
+_lock = threading.RLock()
+
+
+@contextmanager
+def phase(name):
+    """Time one start-up step"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - start))
+
+
+def ready():
+    """Mark the end of app.py's import"""
+    global _ready
+    _ready = time.perf_counter() - STARTED
+
+
+class LazyModule:
+    """Stands in for a module and imports it the first time an attribute is read"""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_module"]
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    _lazy[self._name] = time.perf_counter() - start
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy(name):
+    return LazyModule(name)
+
+
+def report():
+    return {
+        "import_ms": None if _ready is None else round(_ready * 1000, 1),
+        "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in _phases},
+        "lazy_imports_ms": {name: round(seconds * 1000, 1) for name, seconds in _lazy.items()},
+        "modules_loaded": len(sys.modules),
+    }
+
+
+# --- Per-module import cost ---
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def import_costs(target="app"):
+    """{top-level package: self-time ms} for `import target` in a fresh interpreter, plus its total"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {target}"],
+                          cwd=here, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    costs, total = {}, 0
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        package = name.split(".")[0]
+        costs[package] = costs.get(package, 0) + int(self_us)
+        if len(indent) == 1 and name == target:
+            total = int(cumulative_us)
+    return {k: round(v / 1000, 1) for k, v in sorted(costs.items(), key=lambda kv: -kv[1])}, round(total / 1000, 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import cost of app.py by top-level package")
+    parser.add_argument("module", nargs="?", default="app")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print {package: ms} as JSON")
+    args = parser.parse_args()
+
+    costs, total = import_costs(args.module)
+    if args.json:
+        print(json.dumps({"module": args.module, "total_ms": total, "packages_ms": costs}, indent=2))
+    else:
+        print(f"{'PACKAGE':<28}{'SELF MS':>10}")
+        for package, ms in list(costs.items())[:args.top]:
+            print(f"{package:<28}{ms:>10}")
+        print("-" * 38)
+        print(f"import {args.module}: {total} ms")
@@ -0,0 +1,140 @@
+"""
+Persistent on-disk OHLCV store.
+
+Each symbol is one .npy file holding a (6, bars) float64 matrix whose rows
+are the columns date (epoch seconds), open, high, low, close and volume, so
+every column is contiguous on disk. Files are opened memory-mapped and
+readers get zero-copy views. Writes go to a temp file and are swapped in with
+os.replace, so readers in other workers never see a half-written file.
+
+fetch_data_with_retry() keeps history here across restarts and only asks
+Yahoo for bars newer than the last stored date.
+"""
+import json
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+COLUMNS = ("date", "open", "high", "low", "close", "volume")
+# Ticker characters Yahoo uses (M&M.NS, ^NSEI, BRK-B, EURUSD=X); no path separators
+_SAFE_SYMBOL = re.compile(r"[A-Za-z0-9&^=_-][A-Za-z0-9&^=_.-]*")
+STORE_DIR = os.environ.get("OHLCV_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ohlcv"))
+
+
+def frame_columns(data):
+    """{column: array} from a yfinance DataFrame (plain or MultiIndex columns)"""
+    def column(name):
+        for key in (name.capitalize(), name):
+            if key in data.columns:
+                col = data[key]
+                if col.ndim > 1:
+                    col = col.iloc[:, 0]
+                return col.to_numpy(dtype=np.float64)
+        raise KeyError(name)
+
+    index = data.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    dates = index.values.astype("datetime64[s]").astype(np.int64).astype(np.float64)
+    columns = {"date": dates}
+    for name in COLUMNS[1:]:
+        columns[name] = column(name)
+    return columns
+
+
+class OHLCVStore:
+    """Per-symbol memory-mapped column files with append/merge writes"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, symbol):
+        if not _SAFE_SYMBOL.fullmatch(symbol):
+            raise ValueError(f"Unsupported symbol for the store: {symbol!r}")
+        return os.path.join(self.root, f"{symbol}.npy")
+
+    def _meta_path(self, symbol):
+        return self._path(symbol)[:-4] + ".json"
+
+    def symbols(self):
+        return sorted(name[:-4] for name in os.listdir(self.root) if name.endswith(".npy"))
+
+    def read(self, symbol, since=None):
+        """
+        Memory-mapped columns for a symbol as {column: view}, or None.
+        since: only bars at/after this epoch-seconds timestamp.
+        """
+        try:
+            matrix = np.load(self._path(symbol), mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+        start = 0
+        if since is not None:
+            start = int(np.searchsorted(matrix[0], since, side="left"))
+        return {name: matrix[i, start:] for i, name in enumerate(COLUMNS)}
+
+    def last_date(self, symbol):
+        columns = self.read(symbol)
+        if columns is None or len(columns["date"]) == 0:
+            return None
+        return float(columns["date"][-1])
+
+    def write(self, symbol, columns):
+        """
+        Merge new bars into the stored history. Stored bars at or after the
+        first new date are replaced, so a still-forming bar gets overwritten
+        by its final version. Returns the number of bars written.
+        """
+        new = np.vstack([np.asarray(columns[name], dtype=np.float64) for name in COLUMNS])
+        if new.shape[1] == 0:
+            return 0
+        new = new[:, np.argsort(new[0], kind="stable")]
+        old = self.read(symbol)
+        if old is not None:
+            keep = int(np.searchsorted(old["date"], new[0, 0], side="left"))
+            new = np.hstack([np.vstack([old[name][:keep] for name in COLUMNS]), new])
+
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, new)
+            os.replace(tmp, self._path(symbol))
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.mark_checked(symbol)
+        return new.shape[1] - (keep if old is not None else 0)
+
+    # --- Freshness marker: when upstream was last asked for new bars ---
+    def checked_at(self, symbol):
+        try:
+            with open(self._meta_path(symbol)) as f:
+                return json.load(f).get("checked_at")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def mark_checked(self, symbol):
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"checked_at": time.time()}, f)
+            os.replace(tmp, self._meta_path(symbol))
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def frame(self, symbol, since=None):
+        """Stored history as a yfinance-style DataFrame (Open/High/Low/Close/Volume)"""
+        import pandas as pd
+
+        columns = self.read(symbol, since=since)
+        if columns is None or len(columns["date"]) == 0:
+            return pd.DataFrame()
+        index = pd.to_datetime(np.asarray(columns["date"]).astype(np.int64), unit="s")
+        return pd.DataFrame({name.capitalize(): columns[name] for name in COLUMNS[1:]}, index=index, copy=False)
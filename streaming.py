@@ -0,0 +1,258 @@
+"""
+Incremental indicator state.
+
+IndicatorState keeps rolling sums, EMA carries, Wilder RSI averages and a
+sliding Bollinger variance so each new bar refreshes the indicators and the
+composite score in O(1), instead of recomputing the whole history with
+compute_indicators(). Values match indicators.compute_indicators().
+
+One state can track a single ticker (scalar bars) or many tickers at once
+(1-D arrays of closes / volumes, one lane per ticker). A NaN close leaves
+that lane untouched, so lanes may start at different bars.
+"""
+import numpy as np
+
+from indicators import DEFAULT_PARAMS, RSI_BUY, RSI_SELL, composite_score, score_breakdown
+
+# Rolling sums are rebuilt from the ring buffer this often to stop float drift
+RESYNC_EVERY = 500
+
+
+def _bar_values(bar):
+    """(close, volume) from a mapping with close/volume keys or a (close, volume) pair"""
+    if hasattr(bar, "get"):
+        close = bar.get("close", bar.get("Close"))
+        volume = bar.get("volume", bar.get("Volume", np.nan))
+        return close, volume
+    close, volume = bar
+    return close, volume
+
+
+class IndicatorState:
+    """Streaming SMA/EMA/RSI/MACD/Bollinger/volume state for one or many tickers"""
+
+    def __init__(self, lanes=None, rsi_buy=RSI_BUY, rsi_sell=RSI_SELL, **params):
+        self.params = dict(DEFAULT_PARAMS, **params)
+        self.rsi_buy = rsi_buy
+        self.rsi_sell = rsi_sell
+        self._scalar = lanes is None
+        n = 1 if lanes is None else int(lanes)
+        p = self.params
+
+        self._lanes = np.arange(n)
+        self._count = np.zeros(n, dtype=np.int64)
+        self._size = max(p["sma_fast"], p["sma_slow"], p["bb_period"])
+        self._closes = np.zeros((self._size, n))
+        self._volumes = np.zeros((p["volume_window"], n))
+        self._updates = 0
+
+        # Rolling sums for the two SMAs and the volume average
+        self._sma_fast_sum = np.zeros(n)
+        self._sma_slow_sum = np.zeros(n)
+        self._volume_sum = np.zeros(n)
+        # Bollinger window mean and sum of squared deviations (sliding Welford)
+        self._bb_mean = np.zeros(n)
+        self._bb_m2 = np.zeros(n)
+        # EMA carries as (weighted sum, weight total), i.e. pandas adjust=True
+        self._ema = {key: [np.zeros(n), np.zeros(n)] for key in ("ema", "macd_fast", "macd_slow")}
+        # Wilder averages of gains and losses share one weight total
+        self._gain = np.zeros(n)
+        self._loss = np.zeros(n)
+        self._rsi_weight = np.zeros(n)
+        self._prev_close = np.full(n, np.nan)
+        self._last_volume = np.full(n, np.nan)
+
+    @classmethod
+    def from_history(cls, close, volume, **kwargs):
+        """Seed a state by replaying history (1-D bars, or 2-D tickers x bars)"""
+        close = np.asarray(close, dtype=np.float64)
+        volume = np.asarray(volume, dtype=np.float64)
+        lanes = None if close.ndim == 1 else close.shape[0]
+        state = cls(lanes=lanes, **kwargs)
+        for i in range(close.shape[-1]):
+            state.update((close[..., i], volume[..., i]))
+        return state
+
+    # --- Public API ---
+    def update(self, bar):
+        """Append one bar and return the refreshed composite score"""
+        close, volume = self._inputs(bar)
+        self._commit(close, volume, self._advance(close, volume))
+        return self.score()
+
+    def preview(self, bar):
+        """Score as if `bar` were appended, without changing the state (e.g. a still-forming daily bar)"""
+        close, volume = self._inputs(bar)
+        return self._score(self._values(self._advance(close, volume), close, volume))
+
+    def values(self):
+        """Latest indicator values, same keys as indicators.latest_values()"""
+        return self._unwrap(self._values_raw())
+
+    def score(self):
+        return self._score(self._values_raw())
+
+    def breakdown(self):
+        """(score, detail lines) for a single-ticker state, as shown by analyze()"""
+        return score_breakdown(self.values(), self.rsi_buy, self.rsi_sell)
+
+    @property
+    def bars(self):
+        return int(self._count[0]) if self._scalar else self._count.copy()
+
+    # --- Internals ---
+    def _inputs(self, bar):
+        close, volume = _bar_values(bar)
+        close = np.broadcast_to(np.asarray(close, dtype=np.float64), self._count.shape)
+        volume = np.broadcast_to(np.asarray(volume, dtype=np.float64), self._count.shape)
+        return close, volume
+
+    def _old(self, buf, window, valid):
+        """Value leaving a `window`-bar rolling sum (0 while the window is still filling)"""
+        full = self._count >= window
+        old = buf[(self._count - window) % buf.shape[0], self._lanes]
+        return np.where(full & valid, old, 0.0), full
+
+    def _advance(self, close, volume):
+        """New accumulator values after appending (close, volume); nothing is mutated"""
+        p = self.params
+        valid = ~np.isnan(close)
+        x = np.where(valid, close, 0.0)
+        count = self._count + valid
+
+        old_fast, _ = self._old(self._closes, p["sma_fast"], valid)
+        old_slow, _ = self._old(self._closes, p["sma_slow"], valid)
+        old_bb, bb_full = self._old(self._closes, p["bb_period"], valid)
+        old_volume, _ = self._old(self._volumes, p["volume_window"], valid)
+        v = np.where(valid, np.nan_to_num(volume), 0.0)
+
+        # Bollinger: Welford while filling, replace-oldest once the window is full
+        n_bb = np.minimum(count, p["bb_period"])
+        filling = valid & ~bb_full
+        sliding = valid & bb_full
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_fill = self._bb_mean + (x - self._bb_mean) / np.maximum(n_bb, 1)
+        m2_fill = self._bb_m2 + (x - self._bb_mean) * (x - mean_fill)
+        mean_slide = self._bb_mean + (x - old_bb) / p["bb_period"]
+        m2_slide = self._bb_m2 + (x - old_bb) * (x - mean_slide + old_bb - self._bb_mean)
+        bb_mean = np.where(filling, mean_fill, np.where(sliding, mean_slide, self._bb_mean))
+        bb_m2 = np.where(filling, m2_fill, np.where(sliding, m2_slide, self._bb_m2))
+
+        ema = {}
+        for key, span in (("ema", p["ema_period"]), ("macd_fast", p["macd_fast"]), ("macd_slow", p["macd_slow"])):
+            decay = 1.0 - 2.0 / (span + 1.0)
+            num, den = self._ema[key]
+            ema[key] = [np.where(valid, decay * num + x, num), np.where(valid, decay * den + 1.0, den)]
+
+        # RSI starts with the first price change, like close.diff() in finta
+        has_delta = valid & ~np.isnan(self._prev_close)
+        delta = np.where(has_delta, x - np.nan_to_num(self._prev_close), 0.0)
+        decay = 1.0 - 1.0 / p["rsi_period"]
+        gain = np.where(has_delta, decay * self._gain + np.maximum(delta, 0.0), self._gain)
+        loss = np.where(has_delta, decay * self._loss + np.maximum(-delta, 0.0), self._loss)
+        rsi_weight = np.where(has_delta, decay * self._rsi_weight + 1.0, self._rsi_weight)
+
+        return {
+            "valid": valid,
+            "count": count,
+            "sma_fast": self._sma_fast_sum + x - old_fast,
+            "sma_slow": self._sma_slow_sum + x - old_slow,
+            "volume_sum": self._volume_sum + v - old_volume,
+            "bb_mean": bb_mean,
+            "bb_m2": bb_m2,
+            "ema": ema,
+            "gain": gain,
+            "loss": loss,
+            "rsi_weight": rsi_weight,
+        }
+
+    def _commit(self, close, volume, new):
+        valid = new["valid"]
+        lanes = self._lanes[valid]
+        self._closes[self._count[valid] % self._closes.shape[0], lanes] = close[valid]
+        self._volumes[self._count[valid] % self._volumes.shape[0], lanes] = np.nan_to_num(volume[valid])
+        self._count = new["count"]
+        self._sma_fast_sum = new["sma_fast"]
+        self._sma_slow_sum = new["sma_slow"]
+        self._volume_sum = new["volume_sum"]
+        self._bb_mean = new["bb_mean"]
+        self._bb_m2 = new["bb_m2"]
+        self._ema = new["ema"]
+        self._gain = new["gain"]
+        self._loss = new["loss"]
+        self._rsi_weight = new["rsi_weight"]
+        self._prev_close = np.where(valid, close, self._prev_close)
+        self._last_volume = np.where(valid, volume, self._last_volume)
+
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self._resync()
+
+    def _window(self, buf, window):
+        """Last `window` buffered values per lane and a mask of which ones exist"""
+        back = np.arange(window)[:, None]
+        values = buf[(self._count[None, :] - 1 - back) % buf.shape[0], self._lanes[None, :]]
+        return values, back < self._count[None, :]
+
+    def _resync(self):
+        """Rebuild the rolling accumulators exactly from the ring buffers"""
+        p = self.params
+        for attr, buf, window in (("_sma_fast_sum", self._closes, p["sma_fast"]),
+                                  ("_sma_slow_sum", self._closes, p["sma_slow"]),
+                                  ("_volume_sum", self._volumes, p["volume_window"])):
+            values, present = self._window(buf, window)
+            setattr(self, attr, np.where(present, values, 0.0).sum(axis=0))
+        values, present = self._window(self._closes, p["bb_period"])
+        n = np.maximum(present.sum(axis=0), 1)
+        self._bb_mean = np.where(present, values, 0.0).sum(axis=0) / n
+        self._bb_m2 = np.where(present, (values - self._bb_mean) ** 2, 0.0).sum(axis=0)
+
+    def _values_raw(self):
+        current = {
+            "count": self._count,
+            "sma_fast": self._sma_fast_sum,
+            "sma_slow": self._sma_slow_sum,
+            "volume_sum": self._volume_sum,
+            "bb_mean": self._bb_mean,
+            "bb_m2": self._bb_m2,
+            "ema": self._ema,
+            "gain": self._gain,
+            "loss": self._loss,
+            "rsi_weight": self._rsi_weight,
+        }
+        return self._values(current, self._prev_close, self._last_volume)
+
+    def _values(self, acc, close, volume):
+        """Indicator values from a set of accumulators"""
+        p = self.params
+        count = acc["count"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ema = {key: num / den for key, (num, den) in acc["ema"].items()}
+            bb_std = np.sqrt(np.maximum(acc["bb_m2"], 0.0) / (p["bb_period"] - 1))
+            bb_ready = count >= max(p["bb_period"], 2)
+            bb_width = p["bb_std"] * np.where(bb_ready, bb_std, np.nan)
+            bb_mean = np.where(bb_ready, acc["bb_mean"], np.nan)
+            rsi = 100.0 - 100.0 / (1.0 + acc["gain"] / acc["loss"])
+            rsi = np.where(acc["rsi_weight"] > 0, rsi, np.nan)
+            volume_avg = acc["volume_sum"] / np.minimum(count, p["volume_window"])
+        return {
+            "close": np.where(count > 0, close, np.nan),
+            "sma_fast": np.where(count >= p["sma_fast"], acc["sma_fast"] / p["sma_fast"], np.nan),
+            "sma_slow": np.where(count >= p["sma_slow"], acc["sma_slow"] / p["sma_slow"], np.nan),
+            "ema": ema["ema"],
+            "rsi": rsi,
+            "macd": ema["macd_fast"] - ema["macd_slow"],
+            "bb_upper": bb_mean + bb_width,
+            "bb_lower": bb_mean - bb_width,
+            "volume": volume,
+            "volume_avg": np.where(count > 0, volume_avg, np.nan),
+        }
+
+    def _score(self, values):
+        score = composite_score(values, self.rsi_buy, self.rsi_sell)
+        return int(score[0]) if self._scalar else score
+
+    def _unwrap(self, values):
+        if not self._scalar:
+            return values
+        return {name: float(v[0]) for name, v in values.items()}
@@ -0,0 +1,271 @@
+"""
+Parameter sweep runner for the composite score.
+
+Runs backtest.py over a grid (or a random sample) of indicator periods,
+RSI thresholds, the Strong Buy score cut-off and the trade-plan levels,
+spread over a process pool. Price matrices are written once as .npy files
+and memory-mapped by every worker, so no price data is pickled per task.
+Each finished parameter set is appended to a JSONL checkpoint right away,
+and a rerun with the same data skips what is already done.
+
+    python sweep.py --synthetic 500 --years 10
+    python sweep.py --grid sma_fast=5,10,20 rsi_buy=55,60 --workers 8
+    python sweep.py --random 200 --seed 7 --checkpoint sweep.jsonl   # rerun to resume
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import backtest
+
+# Values tried for each parameter; the first is the current analyze() setting
+DEFAULT_GRID = {
+    "sma_fast": [10, 5, 20],
+    "sma_slow": [30, 50],
+    "ema_period": [20, 50],
+    "rsi_buy": [55, 60],
+    "rsi_sell": [45, 40],
+    "volume_window": [10, 20],
+    "buy_threshold": [3, 4],
+}
+# Wider ranges random search draws from
+RANDOM_SPACE = {
+    "sma_fast": [5, 8, 10, 12, 15, 20],
+    "sma_slow": [20, 30, 40, 50, 100],
+    "ema_period": [10, 20, 30, 50],
+    "rsi_period": [7, 14, 21],
+    "rsi_buy": [50, 55, 60, 65],
+    "rsi_sell": [35, 40, 45, 50],
+    "bb_period": [20],
+    "bb_std": [1.5, 2.0, 2.5],
+    "volume_window": [5, 10, 20],
+    "buy_threshold": [2, 3, 4, 5],
+    "stop_pct": [0.02],
+    "target_pct": [0.03],
+}
+INT_PARAMS = {"sma_fast", "sma_slow", "ema_period", "rsi_period", "macd_fast", "macd_slow",
+              "bb_period", "volume_window", "buy_threshold", "horizon"}
+RANK_FIELDS = ("avg_return", "win_rate", "target_rate", "max_drawdown", "trades")
+MIN_TRADES = 100
+
+_shared = {}  # per-worker memory-mapped price matrices
+
+
+# --- Parameter sets ---
+def grid_params(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def random_params(space, count, seed=0):
+    rng = random.Random(seed)
+    seen, sets = set(), []
+    for _ in range(count * 20):
+        if len(sets) >= count:
+            break
+        params = {key: rng.choice(values) for key, values in space.items()}
+        key = params_key(params)
+        if key not in seen and is_valid(params):
+            seen.add(key)
+            sets.append(params)
+    return sets
+
+
+def is_valid(params):
+    return (params.get("sma_fast", 10) < params.get("sma_slow", 30)
+            and params.get("rsi_sell", 45) <= params.get("rsi_buy", 55))
+
+
+def params_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def parse_grid(items):
+    """['sma_fast=5,10', 'bb_std=2.5'] -> {'sma_fast': [5, 10], 'bb_std': [2.5]} over DEFAULT_GRID"""
+    grid = dict(DEFAULT_GRID)
+    for item in items:
+        name, _, values = item.partition("=")
+        grid[name] = [int(v) if name in INT_PARAMS or v.lstrip("-").isdigit() else float(v)
+                      for v in values.split(",") if v]
+    return grid
+
+
+# --- Shared price data ---
+def share_arrays(arrays, directory):
+    """Write each matrix to <directory>/<column>.npy once; workers memory-map them"""
+    os.makedirs(directory, exist_ok=True)
+    for name, matrix in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(matrix))
+    return directory
+
+
+def fingerprint(arrays):
+    """Identifies the price data so a checkpoint is only resumed against the same history"""
+    digest = hashlib.sha1()
+    digest.update(str(arrays["close"].shape).encode())
+    digest.update(np.nan_to_num(arrays["close"][:, -5:]).tobytes())
+    digest.update(np.nan_to_num(arrays["date"][:, -1]).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _init_worker(directory):
+    for name in ("date",) + backtest.OHLCV:
+        _shared[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+
+def evaluate(params):
+    """Backtest one parameter set against the shared matrices (runs in a worker)"""
+    options = dict(params)
+    buy_threshold = options.pop("buy_threshold", 3)
+    start = time.perf_counter()
+    stats = backtest.backtest_arrays(_shared, **options)
+    result = {"params": params, "seconds": round(time.perf_counter() - start, 3)}
+    result["strong_buy"] = stats.summary(min_score=buy_threshold)
+    result["all"] = stats.summary()
+    return result
+
+
+# --- Checkpoint ---
+def load_checkpoint(path, data_id):
+    """{params key: result} from an earlier run over the same data"""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if record.get("data") == data_id:
+                done[params_key(record["params"])] = record
+    return done
+
+
+def rank(results, by="avg_return", min_trades=MIN_TRADES):
+    """Rows sorted best first on the Strong Buy bucket; sets with too few trades go last"""
+    rows = []
+    for result in results:
+        stats = result.get("strong_buy") or {}
+        row = dict(result["params"])
+        for field in RANK_FIELDS:
+            row[field] = stats.get(field)
+        row["seconds"] = result.get("seconds")
+        rows.append(row)
+    enough = [r for r in rows if (r["trades"] or 0) >= min_trades]
+    few = [r for r in rows if (r["trades"] or 0) < min_trades]
+    # Drawdowns are negative, so higher is better for every rank field
+    enough.sort(key=lambda r: r[by], reverse=True)
+    return enough + few
+
+
+def write_table(rows, path):
+    fields = []
+    for row in rows:
+        fields.extend(k for k in row if k not in fields)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def sweep(arrays, param_sets, workers=None, checkpoint=None, data_dir=None):
+    """
+    Evaluate every parameter set over a process pool; finished sets are
+    appended to `checkpoint` as they complete and skipped on a rerun.
+    Returns all results, resumed ones included.
+    """
+    data_id = fingerprint(arrays)
+    done = load_checkpoint(checkpoint, data_id)
+    todo = [p for p in param_sets if params_key(p) not in done]
+    results = [done[params_key(p)] for p in param_sets if params_key(p) in done]
+    print(f"🔁 {len(results)} parameter sets resumed from checkpoint, {len(todo)} to run")
+    if not todo:
+        return results
+
+    own_dir = data_dir is None
+    directory = share_arrays(arrays, data_dir or tempfile.mkdtemp(prefix="sweep-"))
+    out = open(checkpoint, "a") if checkpoint else None
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(directory,)) as pool:
+            futures = {pool.submit(evaluate, p): p for p in todo}
+            for n, future in enumerate(as_completed(futures), 1):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ {params_key(futures[future])} failed: {e}")
+                    continue
+                result["data"] = data_id
+                results.append(result)
+                if out:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                if n % 10 == 0 or n == len(todo):
+                    print(f"⏳ {n}/{len(todo)} done ({time.perf_counter() - start:.1f}s)")
+    finally:
+        if out:
+            out.close()
+        if own_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep score parameters over historical data")
+    parser.add_argument("symbols", nargs="*", help="symbols to test (default: everything available)")
+    parser.add_argument("--store", help="OHLCV store directory")
+    parser.add_argument("--csv-dir", help="directory of <SYMBOL>.csv files instead of the store")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="use N synthetic symbols instead")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--grid", nargs="*", default=[], metavar="NAME=V1,V2", help="override grid values")
+    parser.add_argument("--random", type=int, metavar="N", help="random search with N sets instead of the grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--checkpoint", default="sweep_checkpoint.jsonl")
+    parser.add_argument("--data-dir", help="keep the shared .npy matrices here instead of a temp dir")
+    parser.add_argument("--output", default="sweep_results.csv")
+    parser.add_argument("--rank-by", default="avg_return", choices=RANK_FIELDS)
+    parser.add_argument("--min-trades", type=int, default=MIN_TRADES)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    symbols = [s.upper() for s in args.symbols]
+    if args.synthetic:
+        histories = backtest.synthetic_histories(args.synthetic, args.years)
+    elif args.csv_dir:
+        histories = backtest.load_csv_dir(args.csv_dir, symbols)
+    else:
+        histories = backtest.load_store(symbols, args.store)
+    if not histories:
+        raise SystemExit("❌ No history found; pass --store, --csv-dir or --synthetic")
+    _, arrays = backtest.stack_ohlcv(histories)
+
+    if args.random:
+        param_sets = random_params(RANDOM_SPACE, args.random, args.seed)
+    else:
+        param_sets = [p for p in grid_params(parse_grid(args.grid)) if is_valid(p)]
+    print(f"Sweeping {len(param_sets)} parameter sets over {len(histories)} symbols with {args.workers} workers")
+
+    results = sweep(arrays, param_sets, args.workers, args.checkpoint, args.data_dir)
+    rows = rank(results, args.rank_by, args.min_trades)
+    write_table(rows, args.output)
+
+    keys = [k for k in rows[0] if k not in RANK_FIELDS and k != "seconds"] if rows else []
+    print(f"\n{'  '.join(f'{k[:10]:>10}' for k in keys)}{'AVG RET':>10}{'WIN':>8}{'MAX DD':>9}{'TRADES':>10}")
+    for row in rows[:args.top]:
+        avg = f"{row['avg_return']:.2%}" if row["avg_return"] is not None else "-"
+        win = f"{row['win_rate']:.1%}" if row["win_rate"] is not None else "-"
+        dd = f"{row['max_drawdown']:.1%}" if row["max_drawdown"] is not None else "-"
+        print(f"{'  '.join(f'{str(row[k]):>10}' for k in keys)}{avg:>10}{win:>8}{dd:>9}{row['trades'] or 0:>10}")
+    print(f"\nRanked table written to {args.output}")
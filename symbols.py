@@ -0,0 +1,327 @@
+"""
+Symbol resolution index.
+
+Built once from EQUITY_L.csv (and a BSE equity list if one is supplied) so
+analyze() can map what the user typed to exactly one exchange-qualified
+Yahoo ticker with a single dict lookup, before any network call. Accepted
+inputs: NSE symbol, BSE security id / code, ISIN or full company name, with
+or without a .NS / .BO suffix. An unambiguous company-name prefix is only a
+last resort (resolve_prefix()), tried after exact matches and the bare /
+.NS / .BO race have failed, so it never shadows a real ticker like AMD.
+
+search() backs the /symbols/search typeahead: sorted-key prefix matches on
+symbols, names and name words, topped up with trigram fuzzy matches.
+
+Building the index from the CSVs takes ~150 ms, so deploys prebuild it once:
+
+    python symbols.py --build        # writes data/symbol_index.pkl
+
+load() unpickles that artifact (a few ms) when it was built from the same
+list files, and otherwise rebuilds from the CSVs.
+"""
+import argparse
+import bisect
+import csv
+import gc
+import os
+import pickle
+import re
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+NSE_LIST_PATH = "EQUITY_L.csv"
+BSE_LIST_PATH = os.environ.get("BSE_LIST_PATH", "EQUITY_BSE.csv")
+INDEX_PATH = os.environ.get("SYMBOL_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "symbol_index.pkl"))
+INDEX_VERSION = 2
+FALLBACK_SYMBOLS = ["SBIN", "TCS", "INFY", "RELIANCE", "HDFCBANK"]
+MIN_PREFIX = 3
+MAX_MISSES = 10000
+SEARCH_LIMIT = 10
+
+Resolution = namedtuple("Resolution", ["symbol", "exchange", "ticker", "name", "isin"])
+
+_SUFFIXES = {".NS": "NSE", ".BO": "BSE"}
+_NAME_NOISE = re.compile(r"(LIMITED|LTD)$")
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+
+
+def normalize_name(name):
+    """'State Bank of India Ltd.' -> 'STATEBANKOFINDIA' (matches sanitize_ticker() output)"""
+    key = _NON_ALNUM.sub("", str(name).upper())
+    return _NAME_NOISE.sub("", key) or key
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _split_suffix(key):
+    """('SBIN', 'BSE') for 'SBIN.BO'; (key, None) without an exchange suffix"""
+    for suffix, exchange in _SUFFIXES.items():
+        if key.endswith(suffix):
+            return key[:-len(suffix)], exchange
+    return key, None
+
+
+def _on_exchange(entry, exchange):
+    if exchange and exchange != entry.exchange:
+        # Explicit suffix wins: SBIN.BO stays on BSE
+        return entry._replace(exchange=exchange, ticker=entry.symbol + (".NS" if exchange == "NSE" else ".BO"))
+    return entry
+
+
+def _read_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            # EQUITY_L.csv headers carry a leading space (" SERIES", " ISIN NUMBER")
+            yield {str(k).strip().upper(): (v or "").strip() for k, v in row.items() if k}
+
+
+def load_nse(path=NSE_LIST_PATH):
+    entries = []
+    for row in _read_rows(path):
+        if row.get("SYMBOL"):
+            symbol = row["SYMBOL"].upper()
+            entries.append(Resolution(symbol, "NSE", symbol + ".NS", row.get("NAME OF COMPANY", symbol),
+                                      row.get("ISIN NUMBER", "")))
+    return entries
+
+
+def nse_symbol_list(path=NSE_LIST_PATH):
+    """Symbols from load_nse(); FALLBACK_SYMBOLS if the list can't be read"""
+    try:
+        return [entry.symbol for entry in load_nse(path)]
+    except Exception as e:
+        print(f"⚠️ Could not read {path}: {e}")
+        return list(FALLBACK_SYMBOLS)
+
+
+def load_bse(path=BSE_LIST_PATH):
+    """
+    BSE 'List of Scrips' export (Security Code, Security Id, Security Name /
+    Issuer Name, ISIN No). Returns (entries, {security code: security id}).
+    """
+    entries, codes = [], {}
+    for row in _read_rows(path):
+        security_id = row.get("SECURITY ID", "").upper()
+        code = row.get("SECURITY CODE", "")
+        symbol = security_id or code
+        if not symbol:
+            continue
+        name = row.get("SECURITY NAME") or row.get("ISSUER NAME") or symbol
+        entries.append(Resolution(symbol, "BSE", symbol + ".BO", name, row.get("ISIN NO", "")))
+        if code and code != symbol:
+            codes[code] = symbol
+    return entries, codes
+
+
+class SymbolIndex:
+    """O(1) input -> Resolution lookups with a bounded negative cache"""
+
+    def __init__(self, nse_entries, bse_entries=(), bse_codes=None):
+        self.nse = list(nse_entries)
+        self.bse = list(bse_entries)
+        self._lookup = {}
+        self._misses = OrderedDict()
+        self._build(bse_codes or {})
+        self._build_search()
+        self.search = lru_cache(maxsize=4096)(self._search)
+
+    @classmethod
+    def load(cls, nse_path=NSE_LIST_PATH, bse_path=BSE_LIST_PATH, index_path=INDEX_PATH):
+        """The prebuilt artifact if it matches the list files, else a fresh build from them"""
+        prebuilt = cls.load_prebuilt(index_path, _sources(nse_path, bse_path))
+        if prebuilt is not None:
+            return prebuilt
+        return cls.build(nse_path, bse_path)
+
+    @classmethod
+    def build(cls, nse_path=NSE_LIST_PATH, bse_path=BSE_LIST_PATH):
+        try:
+            nse = load_nse(nse_path)
+        except Exception as e:
+            print(f"⚠️ Could not read {nse_path}: {e}")
+            nse = [Resolution(s, "NSE", s + ".NS", s, "") for s in FALLBACK_SYMBOLS]
+        bse, codes = [], {}
+        if bse_path and os.path.exists(bse_path):
+            try:
+                bse, codes = load_bse(bse_path)
+            except Exception as e:
+                print(f"⚠️ Could not read {bse_path}: {e}")
+        return cls(nse, bse, codes)
+
+    @classmethod
+    def load_prebuilt(cls, path=INDEX_PATH, sources=None):
+        """Unpickled index, or None if missing, unreadable or built from other list files"""
+        # The index is ~100k small objects; cyclic GC passes during the load would nearly double its cost
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(path, "rb") as f:
+                version, built_from, index = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Ignoring symbol index {path}: {e}")
+            return None
+        finally:
+            if enabled:
+                gc.enable()
+        if version != INDEX_VERSION or (sources is not None and built_from != sources):
+            return None
+        return index
+
+    def save(self, path=INDEX_PATH, nse_path=NSE_LIST_PATH, bse_path=BSE_LIST_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((INDEX_VERSION, _sources(nse_path, bse_path), self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def __getstate__(self):
+        # The search memo and the miss cache are per process
+        state = dict(self.__dict__)
+        state.pop("search", None)
+        state["_misses"] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.search = lru_cache(maxsize=4096)(self._search)
+
+    def _build(self, bse_codes):
+        # Companies listed on both exchanges share an ISIN; NSE wins
+        companies = OrderedDict()
+        for entry in self.nse + self.bse:
+            companies.setdefault(entry.isin or f"{entry.exchange}:{entry.symbol}", entry)
+
+        # Name prefixes go in their own table; in the exact lookup later (more specific) keys win
+        owners = {}
+        for key, entry in companies.items():
+            name = normalize_name(entry.name)
+            for end in range(MIN_PREFIX, len(name) + 1):
+                owners.setdefault(name[:end], set()).add(key)
+        self._prefixes = {prefix: companies[next(iter(keys))] for prefix, keys in owners.items() if len(keys) == 1}
+        lookup = {}
+        for entry in companies.values():
+            lookup[normalize_name(entry.name)] = entry
+        for entry in companies.values():
+            if entry.isin:
+                lookup[entry.isin.upper()] = entry
+        bse_by_symbol = {entry.symbol: entry for entry in self.bse}
+        for code, security_id in bse_codes.items():
+            if security_id in bse_by_symbol:
+                lookup[code] = bse_by_symbol[security_id]
+        lookup.update(bse_by_symbol)
+        for entry in self.nse:
+            lookup[entry.symbol] = entry
+        self._lookup = lookup
+
+    def resolve(self, raw_input):
+        """Exact symbol / code / ISIN / company-name match, or None (misses are cached)"""
+        key = str(raw_input or "").strip().upper()
+        if not key or key in self._misses:
+            return None
+
+        key, exchange = _split_suffix(key)
+        entry = self._lookup.get(key) or self._lookup.get(normalize_name(key))
+        if entry is None:
+            self._misses[str(raw_input).strip().upper()] = True
+            if len(self._misses) > MAX_MISSES:
+                self._misses.popitem(last=False)
+            return None
+        return _on_exchange(entry, exchange)
+
+    def resolve_prefix(self, raw_input):
+        """The one company whose name starts with the input, or None; a fallback only"""
+        key, exchange = _split_suffix(str(raw_input or "").strip().upper())
+        entry = self._prefixes.get(normalize_name(key)) if key else None
+        return _on_exchange(entry, exchange) if entry else None
+
+    # --- Typeahead search ---
+    def _build_search(self):
+        """Sorted (key, rank, entry id) triples for prefix search plus a trigram index for fuzzy matches"""
+        self._entries = self.nse + [e for e in self.bse if e.isin not in {n.isin for n in self.nse} or not e.isin]
+        keys = []
+        self._trigrams = {}
+        for i, entry in enumerate(self._entries):
+            name = normalize_name(entry.name)
+            keys.append((_NON_ALNUM.sub("", entry.symbol), 0, i))
+            keys.append((name, 1, i))
+            words = [w for w in _NON_ALNUM.sub(" ", entry.name.upper()).split()]
+            for w in range(1, len(words)):
+                keys.append(("".join(words[w:]), 2, i))
+            for text in {_NON_ALNUM.sub("", entry.symbol), name}:
+                for gram in _trigrams(text):
+                    self._trigrams.setdefault(gram, set()).add(i)
+        keys.sort()
+        self._search_keys = keys
+        self._search_strings = [k for k, _, _ in keys]
+
+    def _search(self, query, limit=SEARCH_LIMIT):
+        """Tuple of entries matching a typed prefix, best first; fuzzy matches fill the rest"""
+        q = _NON_ALNUM.sub("", str(query).upper())
+        if not q:
+            return ()
+        found = {}
+        start = bisect.bisect_left(self._search_strings, q)
+        for key, rank, i in self._search_keys[start:]:
+            if not key.startswith(q):
+                break
+            score = (-1 if rank == 0 and key == q else rank, len(key))
+            if i not in found or score < found[i]:
+                found[i] = score
+        ranked = sorted(found, key=lambda i: (found[i], self._entries[i].symbol))
+
+        if len(ranked) < limit and len(q) >= 3:
+            grams = _trigrams(q)
+            counts = {}
+            for gram in grams:
+                for i in self._trigrams.get(gram, ()):
+                    if i not in found:
+                        counts[i] = counts.get(i, 0) + 1
+            # Keep candidates sharing at least half of the query's trigrams
+            fuzzy = [i for i, n in counts.items() if n * 2 >= len(grams)]
+            fuzzy.sort(key=lambda i: (-counts[i], self._entries[i].symbol))
+            ranked.extend(fuzzy)
+        return tuple(self._entries[i] for i in ranked[:limit])
+
+    def nse_symbols(self):
+        return [entry.symbol for entry in self.nse]
+
+    def __len__(self):
+        return len(self._lookup)
+
+
+def _sources(*paths):
+    """(path, size, mtime) of each list file that exists; a prebuilt index is only valid for these"""
+    found = []
+    for path in paths:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            found.append((os.path.basename(path), stat.st_size, int(stat.st_mtime)))
+    return tuple(found)
+
+
+if __name__ == "__main__":
+    import time
+
+    # Pickle against the importable module, not __main__, so app.py can load the artifact
+    from symbols import SymbolIndex
+
+    parser = argparse.ArgumentParser(description="Prebuild the symbol index artifact")
+    parser.add_argument("--build", action="store_true", help="build from the list files and save the artifact")
+    parser.add_argument("--output", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = SymbolIndex.build() if args.build else SymbolIndex.load(index_path=args.output)
+    built = time.perf_counter() - start
+    if args.build:
+        index.save(args.output)
+        print(f"✅ {len(index.nse)} NSE / {len(index.bse)} BSE symbols indexed in {built * 1000:.0f} ms -> {args.output}")
+    start = time.perf_counter()
+    loaded = SymbolIndex.load_prebuilt(args.output)
+    if loaded is not None:
+        print(f"Prebuilt index loads in {(time.perf_counter() - start) * 1000:.1f} ms ({os.path.getsize(args.output) // 1024} KB)")
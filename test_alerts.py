@@ -0,0 +1,120 @@
+"""AlertEngine rule crossings, persistence and multi-worker claims: python -m pytest test_alerts.py"""
+import threading
+
+from alerts import AlertEngine, MemorySink, hold_leader_lock
+
+
+class ThreadSink(MemorySink):
+    """MemorySink that also records which thread sent each alert"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def send(self, alert):
+        self.threads.append(threading.current_thread())
+        super().send(alert)
+
+
+def fire(engine, ticker, *values, field="price", source="live"):
+    fired = []
+    for i, value in enumerate(values):
+        fired += engine.on_values(ticker, {field: value}, as_of=f"{source}-{i}", source=source)
+    engine.flush()
+    return fired
+
+
+def test_above_and_below_fire_on_crossing_only():
+    sink = MemorySink()
+    engine = AlertEngine([sink])
+    up = engine.add("SBIN.NS", "price", "above", 800)
+    down = engine.add("SBIN.NS", "price", "below", 780)
+    assert fire(engine, "SBIN.NS", 805) == []            # first value is only the baseline
+    fired = fire(engine, "SBIN.NS", 790, 779, 801)
+    assert [a["id"] for a in fired] == [down["id"], up["id"]]
+    assert fired[0]["previous"] == 790 and fired[0]["value"] == 779
+    assert [a["id"] for a in sink.recent()] == [up["id"], down["id"]]
+
+
+def test_change_fires_on_large_moves():
+    engine = AlertEngine()
+    rule = engine.add("TCS.NS", "rsi", "change", 10, once=False)
+    fired = fire(engine, "TCS.NS", 50, 55, 66, 54, field="rsi")
+    assert [a["value"] for a in fired] == [66, 54]
+    assert all(a["id"] == rule["id"] for a in fired)
+
+
+def test_once_rules_are_removed_and_repeating_rules_stay():
+    engine = AlertEngine()
+    once = engine.add("INFY.NS", "score", "above", 3)
+    repeat = engine.add("INFY.NS", "score", "above", 2, once=False)
+    fired = fire(engine, "INFY.NS", 0, 4, 0, 4, field="score")
+    assert sorted(a["id"] for a in fired) == [once["id"], repeat["id"], repeat["id"]]
+    assert [r["id"] for r in engine.rules()] == [repeat["id"]]
+
+
+def test_sources_keep_separate_baselines():
+    engine = AlertEngine()
+    engine.add("SBIN.NS", "price", "above", 800, once=False)
+    fire(engine, "SBIN.NS", 805, source="live")
+    # A lower daily close must not make the next live tick look like a crossing
+    assert fire(engine, "SBIN.NS", 790, source="session") == []
+    assert fire(engine, "SBIN.NS", 806, source="live") == []
+
+
+def test_sinks_run_off_the_calling_thread():
+    sink = ThreadSink()
+    engine = AlertEngine([sink])
+    engine.add("SBIN.NS", "price", "above", 800)
+    fire(engine, "SBIN.NS", 790, 810)
+    assert len(sink.threads) == 1 and sink.threads[0] is not threading.current_thread()
+
+
+def test_rules_persist_across_restarts(tmp_path):
+    path = str(tmp_path / "alerts.db")
+    engine = AlertEngine(path=path)
+    first = engine.add("SBIN.NS", "price", "below", 780, user="a", note="stop")
+    engine.add_trade_plan("TCS.NS", 4000)
+    engine.remove(first["id"])
+
+    reloaded = AlertEngine(path=path)
+    assert {(r["ticker"], r["op"], r["threshold"]) for r in reloaded.rules()} == {
+        ("TCS.NS", "below", 3920.0), ("TCS.NS", "above", 4120.0)}
+    assert reloaded.add("SBIN.NS", "price", "above", 900)["id"] > first["id"] + 2   # ids are never reused
+
+
+def test_workers_share_ids_deletes_and_firings(tmp_path):
+    path = str(tmp_path / "alerts.db")
+    sink_a, sink_b = MemorySink(), MemorySink()
+    a, b = AlertEngine([sink_a], path=path), AlertEngine([sink_b], path=path)
+    rule_a = a.add("SBIN.NS", "price", "above", 800)
+    rule_b = b.add("SBIN.NS", "price", "above", 800)
+    assert rule_a["id"] != rule_b["id"]
+    assert a.sync(force=True) and b.sync(force=True)
+    assert {r["id"] for r in b.rules()} == {rule_a["id"], rule_b["id"]}
+
+    # Both workers see the same tick: each once-rule is sent by exactly one of them
+    for engine in (a, b):
+        engine.on_values("SBIN.NS", {"price": 790}, "t0")
+        engine.on_values("SBIN.NS", {"price": 810}, "t1")
+        engine.flush()
+    sent = [alert["id"] for alert in list(sink_a.alerts) + list(sink_b.alerts)]
+    assert sorted(sent) == sorted([rule_a["id"], rule_b["id"]])
+    assert a.stats["duplicates"] + b.stats["duplicates"] == 2
+    assert sorted(alert["id"] for alert in a.recent()) == sorted(sent)
+
+    # A delete in one worker reaches the other on its next sync
+    keep = a.add("TCS.NS", "price", "below", 3900, once=False)
+    b.sync(force=True)
+    a.remove(keep["id"])
+    b.sync(force=True)
+    assert b.rules() == []
+
+
+def test_leader_lock_is_taken_over_when_released(tmp_path):
+    path = str(tmp_path / "alerts.lock")
+    leader = hold_leader_lock(path)
+    assert leader
+    assert hold_leader_lock(path) is None      # another worker keeps retrying
+    leader.close()                             # leader exits or is recycled
+    assert hold_leader_lock(path)
@@ -0,0 +1,89 @@
+"""JSON API through the Flask test client, Yahoo stubbed out: python -m pytest test_api.py"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+_data_dir = tempfile.mkdtemp()
+os.environ.update(
+    OHLCV_STORE_DIR=os.path.join(_data_dir, "ohlcv"),
+    SNAPSHOT_PATH=os.path.join(_data_dir, "snapshots.db"),
+    ALERTS_PATH=os.path.join(_data_dir, "alerts.db"),
+    ALERT_LOG=os.path.join(_data_dir, "alerts.jsonl"),
+    PORTFOLIOS_PATH=os.path.join(_data_dir, "portfolios.db"),
+    ALERT_POLL_INTERVAL="0",
+    UPSTREAM_RATE="1000",
+    UPSTREAM_BURST="1000",
+)
+
+import app  # noqa: E402  (reads the paths above at import)
+
+
+def daily_frame(seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 125)))
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close,
+                         "Volume": rng.integers(1_000, 9_000, 125)},
+                        index=pd.date_range("2026-04-01", periods=125, freq="B"))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    downloads = []
+
+    def download(tickers, **kwargs):
+        downloads.append(tickers)
+        if str(tickers).startswith("NOPE"):
+            return pd.DataFrame()
+        return daily_frame(sum(map(ord, str(tickers))))
+
+    monkeypatch.setattr(app.yf, "download", download)
+    monkeypatch.setattr(app.time, "sleep", lambda seconds: None)
+    # One attempt per candidate: an empty symbol fails at once instead of backing off
+    download_async = app.download_history_async
+    monkeypatch.setattr(app, "download_history_async", lambda ticker, retries, wait: download_async(ticker, 1, 0))
+    app.data_cache.clear()
+    app.api_results.clear()
+    client = app.app.test_client()
+    client.downloads = downloads
+    return client
+
+
+def test_conditional_get_returns_304_without_recomputing(client):
+    first = client.get("/api/analyze?ticker=SBIN")
+    assert first.status_code == 200
+    assert first.json["symbol"] == "SBIN" and isinstance(first.json["score"], int)
+    etag = first.headers["ETag"]
+    loads = app.api_results.stats()["loads"]
+
+    again = client.get("/api/analyze?ticker=SBIN", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+    assert app.api_results.stats()["loads"] == loads     # no indicators computed for a 304
+    assert len(client.downloads) == 1                    # history served from the cache
+
+    stale = client.get("/api/analyze?ticker=SBIN", headers={"If-None-Match": '"other"'})
+    assert stale.status_code == 200 and stale.json == first.json
+
+
+def test_batch_returns_results_in_input_order(client):
+    response = client.post("/api/analyze/batch", json={"symbols": ["SBIN", "TCS", "NOPEX", "sbin"]})
+    assert response.status_code == 200
+    body = response.json
+    assert body["count"] == 3                            # "sbin" is the same symbol as "SBIN"
+    assert [r["symbol"] for r in body["results"]] == ["SBIN", "TCS", "NOPEX"]
+    assert body["results"][2] == {"symbol": "NOPEX", "error": "No data found"}
+    single = client.get("/api/analyze?ticker=TCS").json
+    assert body["results"][1] == single
+
+    again = client.get("/api/analyze/batch?symbols=SBIN,TCS,NOPEX", headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_batch_rejects_empty_and_oversized_requests(client):
+    assert client.get("/api/analyze/batch").status_code == 400
+    symbols = ",".join(f"S{i}" for i in range(app.API_BATCH_MAX + 1))
+    assert client.get(f"/api/analyze/batch?symbols={symbols}").status_code == 400
@@ -0,0 +1,33 @@
+"""TTLCache shared SQLite backend: python -m pytest test_cache.py"""
+import time
+
+from cache import SQLiteBackend, TTLCache
+
+
+def test_backend_drops_expired_rows_and_keeps_entry_limit(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_entries=10, purge_every=5)
+    now = time.time()
+    backend.set("old", 1, now - 1)
+    for i in range(40):
+        backend.set(f"k{i}", i, now + 60 + i)
+    assert len(backend) <= 10 + backend.purge_every
+    backend.purge()
+    assert len(backend) == 10
+    assert backend.get("k39") == (39, now + 99)      # the latest-expiring entries stay
+    assert backend.get("k0") is None
+
+
+def test_backend_keeps_byte_limit(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_bytes=10_000, purge_every=1)
+    for i in range(20):
+        backend.set(f"k{i}", b"x" * 1000, time.time() + 60 + i)
+    assert len(backend) < 10
+
+
+def test_cache_writes_through_to_bounded_backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_entries=3, purge_every=1)
+    cache = TTLCache(maxsize=3, ttl=60, backend=backend)
+    for i in range(10):
+        cache.set(f"k{i}", i)
+    assert len(backend) == 3
+    assert TTLCache(maxsize=3, ttl=60, backend=backend).get("k9") == 9
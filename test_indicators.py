@@ -0,0 +1,40 @@
+"""Indicator engine against finta on synthetic frames: python -m pytest test_indicators.py"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import check_parity, compute_indicators, frame_to_arrays
+
+
+def random_walk(bars, level, seed):
+    rng = np.random.default_rng(seed)
+    close = level * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    volume = rng.integers(1_000, 1_000_000, bars)
+    return pd.DataFrame({"Close": close, "Volume": volume})
+
+
+@pytest.mark.parametrize("bars, level", [(5, 20.0), (40, 150.0), (125, 2500.0), (2500, 40.0)])
+def test_matches_finta(bars, level):
+    diffs = check_parity(random_walk(bars, level, seed=bars))  # raises beyond rtol=1e-9, atol=1e-8
+    assert set(diffs) == {"sma_fast", "sma_slow", "ema", "rsi", "macd", "bb_upper", "bb_lower"}
+    assert max(diffs.values()) < 1e-8 * level
+
+
+def test_check_parity_rejects_a_wrong_engine(monkeypatch):
+    import indicators
+
+    real = indicators.compute_indicators
+    monkeypatch.setattr(indicators, "compute_indicators", lambda c, v: {**real(c, v), "rsi": real(c, v)["rsi"] + 1e-3})
+    with pytest.raises(AssertionError, match="rsi"):
+        check_parity(random_walk(125, 100.0, seed=1))
+
+
+def test_stacked_rows_match_single_ticker_calls():
+    closes = [frame_to_arrays(random_walk(bars, 100.0, seed=bars))[0] for bars in (40, 125, 300)]
+    matrix = np.full((len(closes), 300), np.nan)
+    for row, close in enumerate(closes):
+        matrix[row, 300 - len(close):] = close
+    stacked = compute_indicators(matrix)
+    for row, close in enumerate(closes):
+        for name, values in compute_indicators(close).items():
+            np.testing.assert_allclose(stacked[name][row, 300 - len(close):], values, rtol=1e-9, atol=1e-8)
@@ -0,0 +1,55 @@
+"""NSEClient against fake_nse.py (no network): python -m pytest test_nse_client.py"""
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_nse import FakeNSEServer, sample_quote
+from nse_client import NSEClient
+
+SYMBOLS = ["SBIN", "TCS", "INFY", "RELIANCE"]
+
+
+def make_server():
+    return FakeNSEServer({s: sample_quote(s) for s in SYMBOLS})
+
+
+def test_primes_once_and_reuses_cookies():
+    with make_server() as server:
+        client = NSEClient(server.url, quote_ttl=0)
+        for symbol in SYMBOLS:
+            assert client.quote(symbol)["info"]["symbol"] == symbol
+        assert server.counts["home"] == 1
+        assert server.counts["unauthorized"] == 0
+
+
+def test_expired_cookies_reprime_once():
+    with make_server() as server:
+        client = NSEClient(server.url, quote_ttl=0)
+        assert client.quote("SBIN") is not None
+        server.expire_cookies()
+
+        # Every thread's first request is rejected, but only one re-primes
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            quotes = list(pool.map(client.quote, SYMBOLS))
+        assert all(q is not None for q in quotes)
+        assert server.counts["home"] == 2
+        assert client.stats["reprimes"] == 1
+
+
+def test_failures_are_cached_briefly():
+    with make_server() as server:
+        client = NSEClient(server.url, failure_ttl=30)
+        assert client.quote("NOSUCH") is None
+        assert client.quote("NOSUCH") is None
+        assert server.counts["quote"] == 1
+        assert client.stats["failures_cached"] == 1
+
+
+def test_unreachable_host_fails_fast_after_first_timeout():
+    server = make_server()
+    url = server.url
+    server._server.server_close()   # nothing listens on the port any more
+    client = NSEClient(url, timeout=1)
+    assert client.quote("SBIN") is None
+    assert client.stats["errors"] == 1
+    assert client.quote("SBIN") is None
+    assert client.stats["errors"] == 1
+    assert client.stats["failures_cached"] == 1
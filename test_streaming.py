@@ -0,0 +1,55 @@
+"""IndicatorState against the batch engine: python -m pytest test_streaming.py"""
+import numpy as np
+import pytest
+
+from indicators import composite_score, compute_indicators, latest_values
+from streaming import IndicatorState
+
+
+def random_walk(bars, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 500 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    volume = rng.integers(1_000, 1_000_000, bars).astype(np.float64)
+    return close, volume
+
+
+@pytest.mark.parametrize("bars", [3, 40, 700])
+def test_streaming_matches_batch(bars):
+    close, volume = random_walk(bars)
+    state = IndicatorState.from_history(close, volume)
+    assert state.bars == bars
+    assert state.score() == int(composite_score(compute_indicators(close, volume))[-1])
+    batch = latest_values(compute_indicators(close, volume))
+    streamed = state.values()
+    for name, value in batch.items():
+        np.testing.assert_allclose(streamed[name], value, rtol=1e-9, atol=1e-8, err_msg=name)
+
+
+def test_every_bar_scores_like_batch():
+    close, volume = random_walk(700)
+    expected = composite_score(compute_indicators(close, volume))
+    state = IndicatorState()
+    scores = [state.update((c, v)) for c, v in zip(close, volume)]
+    assert np.array_equal(scores, expected)
+
+
+def test_preview_leaves_state_unchanged():
+    close, volume = random_walk(41)
+    state = IndicatorState.from_history(close[:40], volume[:40])
+    before = state.values()
+    assert state.preview((close[40], volume[40])) == int(composite_score(compute_indicators(close, volume))[-1])
+    assert state.bars == 40
+    for name, value in before.items():
+        np.testing.assert_array_equal(state.values()[name], value)
+
+
+def test_lanes_with_different_starts_match_single_tickers():
+    histories = [random_walk(bars, seed=bars) for bars in (3, 40, 700)]
+    closes = np.full((3, 700), np.nan)
+    volumes = np.full((3, 700), np.nan)
+    for row, (close, volume) in enumerate(histories):
+        closes[row, 700 - len(close):] = close
+        volumes[row, 700 - len(volume):] = volume
+    state = IndicatorState.from_history(closes, volumes)
+    for row, (close, volume) in enumerate(histories):
+        assert state.score()[row] == int(composite_score(compute_indicators(close, volume))[-1])
@@ -0,0 +1,179 @@
+"""
+Multi-timeframe bars and scores.
+
+One 1-minute intraday download per ticker feeds every intraday timeframe:
+an IntradayBook folds each new 1-minute bar into 5m / 15m / 1h aggregates
+in O(1), so nothing is downloaded per timeframe and nothing is re-resampled
+when a poll brings one more minute. NSE buckets are aligned to the 09:15 IST
+open (the 1h bars end at 10:15, 11:15, ... and a short 15:15-15:30 bar).
+Weekly bars are resampled from the cached daily PriceHistory.
+
+    book = IntradayBook()
+    book.extend(yf.download("SBIN.NS", period="7d", interval="1m"))
+    series = {tf: book.series(tf) for tf in INTRADAY_MINUTES}
+    series["1d"] = frame_to_arrays(daily)
+    series["1w"] = frame_to_arrays(weekly(daily))
+    scores = score_timeframes(series)       # one indicator pass for all of them
+"""
+import threading
+import time
+
+import numpy as np
+
+from indicators import compute_indicators, latest_values, score_breakdown
+from prices import PriceHistory
+from scanner import stack_histories, verdict_label
+from store import frame_columns
+
+INTRADAY_MINUTES = {"5m": 5, "15m": 15, "1h": 60}
+TIMEFRAMES = ("5m", "15m", "1h", "1d", "1w")
+IST_OFFSET = 19800               # seconds east of UTC
+SESSION_START = 9 * 60 + 15      # 09:15 IST, minutes after midnight
+
+
+def bucket_key(ts, minutes):
+    """Session-aligned bucket of a UTC epoch second for a `minutes` timeframe"""
+    minute = (int(ts) + IST_OFFSET) // 60
+    day, of_day = divmod(minute, 1440)
+    return day * 1440 + max(of_day - SESSION_START, 0) // minutes
+
+
+class BarAggregator:
+    """OHLCV bars of one intraday timeframe, built one 1-minute bar at a time"""
+
+    def __init__(self, minutes):
+        self.minutes = minutes
+        self.keys, self.open, self.high, self.low, self.close, self.volume = [], [], [], [], [], []
+        self._undo = None       # last bucket before the newest minute went in (None: that minute opened it)
+        self._arrays = None     # cached (close, volume) float64 arrays
+
+    def add(self, ts, o, h, l, c, v, revise=False):
+        """Fold in one 1-minute bar; revise=True replaces the newest minute (a re-sent forming bar)"""
+        if revise and self.keys:
+            if self._undo is None:
+                for column in (self.keys, self.open, self.high, self.low, self.close, self.volume):
+                    column.pop()
+            else:
+                self.open[-1], self.high[-1], self.low[-1], self.close[-1], self.volume[-1] = self._undo
+        key = bucket_key(ts, self.minutes)
+        if self.keys and self.keys[-1] == key:
+            self._undo = (self.open[-1], self.high[-1], self.low[-1], self.close[-1], self.volume[-1])
+            self.high[-1] = max(self.high[-1], h)
+            self.low[-1] = min(self.low[-1], l)
+            self.close[-1] = c
+            self.volume[-1] += v
+        else:
+            self._undo = None
+            self.keys.append(key)
+            self.open.append(o)
+            self.high.append(h)
+            self.low.append(l)
+            self.close.append(c)
+            self.volume.append(v)
+        self._arrays = None
+
+    def series(self):
+        """(close, volume) float64 arrays, rebuilt only after a change"""
+        if self._arrays is None:
+            self._arrays = (np.array(self.close, dtype=np.float64), np.array(self.volume, dtype=np.float64))
+        return self._arrays
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class IntradayBook:
+    """All intraday timeframes of one ticker, fed from 1-minute bar frames"""
+
+    def __init__(self, minutes=INTRADAY_MINUTES):
+        self.frames = {tf: BarAggregator(m) for tf, m in minutes.items()}
+        self.last_ts = None
+        self.updated = 0.0
+        self._lock = threading.Lock()
+
+    def extend(self, frame):
+        """Fold in the bars of a 1-minute frame that are not in yet; returns how many were"""
+        self.updated = time.time()
+        if frame is None or frame.empty:
+            return 0
+        columns = frame_columns(frame)
+        ts = _epoch_seconds(frame.index)
+        added = 0
+        with self._lock:
+            for i in range(len(ts)):
+                if np.isnan(columns["close"][i]) or (self.last_ts is not None and ts[i] < self.last_ts):
+                    continue
+                bar = [float(columns[name][i]) for name in ("open", "high", "low", "close", "volume")]
+                # Yahoo sometimes leaves O/H/L or volume empty on a minute that has a close
+                bar = [bar[3] if x != x else x for x in bar[:4]] + [0.0 if bar[4] != bar[4] else bar[4]]
+                revise = ts[i] == self.last_ts
+                for aggregator in self.frames.values():
+                    aggregator.add(ts[i], *bar, revise=revise)
+                self.last_ts = int(ts[i])
+                added += not revise
+        return added
+
+    def series(self, timeframe):
+        with self._lock:
+            return self.frames[timeframe].series()
+
+    @property
+    def empty(self):
+        return self.last_ts is None
+
+    @property
+    def nbytes(self):
+        # Six Python floats / ints per bar per timeframe
+        return sum(len(a) for a in self.frames.values()) * 6 * 32
+
+
+def _epoch_seconds(index):
+    """UTC epoch seconds of a DatetimeIndex (naive indexes are taken as UTC)"""
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.values.astype("datetime64[s]").astype(np.int64)
+
+
+def weekly(history):
+    """Weekly (Monday-Friday) PriceHistory resampled from a daily one; each bar is dated by its last day"""
+    if history.empty:
+        return PriceHistory()
+    week = (history.days.astype(np.int64) + 3) // 7     # day 0 was a Thursday
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(week)) + 1))
+    ends = np.concatenate((starts[1:], [len(week)])) - 1
+    return PriceHistory(
+        history.days[ends],
+        history.open[starts],
+        np.maximum.reduceat(history.high, starts),
+        np.minimum.reduceat(history.low, starts),
+        history.close[ends],
+        np.add.reduceat(history.volume.astype(np.int64), starts),
+    )
+
+
+def score_timeframes(series):
+    """
+    {timeframe: (close, volume)} -> {timeframe: result} from one indicator
+    pass over the stacked series. Each result has bars, price, score,
+    verdict, details and the latest indicator values.
+    """
+    series = {tf: pair for tf, pair in series.items() if len(pair[0])}
+    if not series:
+        return {}
+    names = list(series)
+    closes, volumes = stack_histories([series[tf] for tf in names])
+    latest = latest_values(compute_indicators(closes, volumes))
+
+    results = {}
+    for i, tf in enumerate(names):
+        values = {name: float(v[i]) for name, v in latest.items()}
+        score, details = score_breakdown(values)
+        results[tf] = {
+            "bars": len(series[tf][0]),
+            "price": round(float(series[tf][0][-1]), 2),
+            "score": int(score),
+            "verdict": verdict_label(score),
+            "details": details,
+            "values": values,
+        }
+    return results